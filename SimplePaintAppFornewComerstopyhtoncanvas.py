@@ -1,8 +1,66 @@
+import time
+STARTUP_TIME = time.perf_counter() # When the app started loading, for --bench-startup
+
+import argparse
+import importlib
 import tkinter as tk
-from tkinter import colorchooser # Imports the color chooser dialog
+
+from paint_document import (Document, StrokeEngine, FREEHAND_KINDS,
+                            KIND_LINE, KIND_OVAL, KIND_RECTANGLE, shapes_bounds) # Headless drawing model
+import paint_format # Binary drawing files for Save Drawing and Open Drawing
+from paint_input import InputPipeline # Batches pointer events onto a fixed frame tick
+from paint_replay import InputLog, Recorder, replay # Records and replays input sessions
+from paint_simplify import StrokeSimplifier, spline_steps # Drops redundant stroke samples and picks smoothing steps
+from paint_spatial import Eraser, GridIndex # Finds the shapes under the eraser
+# Dialogs (tkinter.colorchooser, filedialog, messagebox) and the NumPy modules below are imported on first use,
+# so starting the app does not wait for code most sessions never run
+OPTIONAL_MODULES = {} # Maps each optional module name to the module, or None if NumPy is missing
+
+
+def optional_module(name):
+    """Imports paint_raster, paint_tiles or paint_export on first use and returns it, or None without NumPy."""
+    if name not in OPTIONAL_MODULES:
+        try:
+            OPTIONAL_MODULES[name] = importlib.import_module(name)
+        except ImportError:
+            OPTIONAL_MODULES[name] = None
+    return OPTIONAL_MODULES[name]
+
+# Freehand stroke modes: how 'draw' and 'erase' strokes are turned into canvas items
+STROKE_MODE_SEGMENTS = "segments" # One two-point line item per motion event (the original behaviour)
+STROKE_MODE_POLYLINE = "polyline" # One live line item per stroke, extended point by point with canvas.coords
+
+# Render backends: how committed strokes and shapes are kept on screen
+RENDER_BACKEND_VECTOR = "vector" # Every shape stays a Tk canvas item
+RENDER_BACKEND_RASTER = "raster" # Shapes are baked into one NumPy bitmap shown as a single image item (needs NumPy)
+RENDER_BACKEND_TILED = "tiled"   # Shapes are baked into cached tiles; only visible tiles are shown, at any zoom (needs NumPy)
+RASTER_WIDTH = 1100  # Smallest size of the raster bitmap, which covers the canvas in the default window
+RASTER_HEIGHT = 750  # The bitmap grows with the window and moves with the view, so it always covers the canvas
+DEFAULT_TILE_CACHE_BYTES = 128 * 1024 * 1024 # Memory the tiled backend's tile cache may use
+
+# PNG export: bands are rendered on a process pool while the UI polls for progress
+EXPORT_POLL_MS = 50 # How often the UI checks on a running export
+
+# View navigation: the middle button or the wheel pans; Ctrl+wheel zooms (tiled backend only)
+SCROLL_STEP = 60 # Pixels the view moves per mouse wheel notch
+
+# Undo history budget: older steps are flattened so long sessions stay within a fixed footprint
+DEFAULT_HISTORY_STEPS = 100              # Most actions that can be undone
+DEFAULT_HISTORY_BYTES = 32 * 1024 * 1024 # Most memory the undo history may keep alive
+
+# Input pacing: motion events are queued and drawn once per frame instead of once per event
+DEFAULT_INPUT_RATE = 120        # Frames per second; None handles every event as soon as it arrives
+DEFAULT_INPUT_QUEUE_DEPTH = 256 # Queued motion events that force a frame early
+
+# Stroke simplification: samples that add nothing to a stroke's shape are dropped while it is drawn
+DEFAULT_SIMPLIFY_TOLERANCE = 1.0 # Pixels a dropped sample may be off the stroke; 0 keeps every sample
 
 class PaintApp:
-    def __init__(self, root):
+    def __init__(self, root, stroke_mode=STROKE_MODE_POLYLINE, render_backend=RENDER_BACKEND_VECTOR,
+                 history_steps=DEFAULT_HISTORY_STEPS, history_bytes=DEFAULT_HISTORY_BYTES,
+                 input_rate=DEFAULT_INPUT_RATE, input_queue_depth=DEFAULT_INPUT_QUEUE_DEPTH,
+                 simplify_tolerance=DEFAULT_SIMPLIFY_TOLERANCE, tile_cache_bytes=DEFAULT_TILE_CACHE_BYTES,
+                 export_workers=None):
         self.root = root
         self.root.title("Simple Paint App for Code in Place Final Project") # Sets the title of the application window
         self.root.geometry("1100x750") # Defines the initial size of the application window
@@ -10,18 +68,35 @@ class PaintApp:
         # Drawing configuration settings
         self.drawing_color = "black"  # Stores the currently selected drawing color
         self.brush_size = 3           # Stores the current brush thickness
-        self.old_x = None             # Stores the previous X coordinate for continuous drawing
-        self.old_y = None             # Stores the previous Y coordinate for continuous drawing
         # Defines the current drawing mode: 'draw', 'erase', 'rectangle', 'circle', or 'line'
         self.drawing_mode = "draw"    # Sets the default drawing mode to free draw
-
-        # History management for Undo/Redo functionality
-        self.history = []            # A list to store item IDs for each completed drawing stroke or shape
-        self.history_idx = -1        # An index indicating the current position in the history list
+        self.stroke_mode = stroke_mode # Chooses between one item per stroke and one item per segment
+
+        # Document model: holds every stroke and shape plus the Undo/Redo history, independent of the canvas
+        self.document = Document(background="white", index=GridIndex(), # Indexes visible shapes by position
+                                 max_steps=history_steps, max_bytes=history_bytes) # Bounds the undo history
+        self.document.on_bake = self.forget_baked_step # Frees canvas items once a step can no longer be undone
+        self.simplifier = StrokeSimplifier(simplify_tolerance) # Counts the samples received and the points kept
+        self.engine = StrokeEngine(self.document, eraser=Eraser(self.document), # Turns mouse input into shapes
+                                   simplifier=self.simplifier)
+        self.shape_items = {}        # Maps each committed shape to the list of canvas item IDs that draw it
         self.current_stroke_items = [] # A temporary list to collect item IDs during a single drawing stroke
+        self.erased_shapes = []      # Shapes removed by the eraser during the current drag
         self.eraser_indicator_id = None # Stores the ID of the visual indicator for the eraser size
-        self.temp_shape_id = None    # Stores the ID of the temporary shape drawn for preview during dragging
-        self.shape_popup = None      # Stores a reference to the shape selection pop-up window
+        self.indicator_visible = False # Whether the eraser indicator is currently shown
+        self.temp_shape_id = None    # Stores the ID of the preview item in use while a shape is being dragged
+        self.preview_items = {}      # Maps each shape kind to its persistent preview item, reused from drag to drag
+        self.live_stroke_id = None   # Stores the ID of the single line item grown during a polyline stroke
+        self.live_stroke_steps = 1   # The splinesteps the live polyline item is drawn with
+        self.shape_popup = None      # The shape selection pop-up window, built the first time it is opened
+        self.shape_popup_shown = False # Whether the pop-up is showing; it is hidden rather than destroyed
+        self.zoom = 1.0              # Screen pixels per drawing pixel
+        self.view_x = 0              # Canvas coordinates of the window's top-left corner, which move as the view pans
+        self.view_y = 0
+        self.export_workers = export_workers # Processes used for PNG export; None uses one per CPU
+        self.export_pool = None      # The process pool, started by the first export
+        self.export_job = None       # The ExportJob in progress, if any
+        self.export_path = None      # Where the running export will be written
 
         # Main frame acts as a container for the canvas and control panel
         self.main_frame = tk.Frame(root)
@@ -32,11 +107,53 @@ class PaintApp:
         # Positions the canvas to the left within the main frame, allowing it to expand
         self.canvas.pack(side="left", fill="both", expand=True, padx=20, pady=20)
 
+        # Raster backend: bakes finished shapes into a bitmap so redraw cost does not grow with the drawing
+        self.render_backend = render_backend
+        self.raster = None           # The RasterCanvas holding baked shapes, when the raster backend is used
+        self.raster_photo = None     # The PhotoImage that shows the raster on the canvas
+        self.raster_image_id = None  # The canvas image item displaying raster_photo
+        self.tiles = None            # The TileCache holding baked shapes, when the tiled backend is used
+        self.tile_items = {}         # Maps the key of each visible tile to the canvas image item showing it
+        self.bakes_shapes = render_backend in (RENDER_BACKEND_RASTER, RENDER_BACKEND_TILED) # Finished shapes leave the canvas
+        if render_backend == RENDER_BACKEND_TILED:
+            paint_tiles = optional_module("paint_tiles")
+            if paint_tiles is None:
+                raise RuntimeError("The tiled backend needs NumPy: pip install numpy")
+            self.tiles = paint_tiles.TileCache(self.document.shapes_in_box, background=self.canvas["bg"],
+                                               max_bytes=tile_cache_bytes)
+            self.canvas.bind("<Configure>", lambda event: self.view_changed()) # Shows the tiles a resize uncovers
+        elif render_backend == RENDER_BACKEND_RASTER:
+            paint_raster = optional_module("paint_raster")
+            if paint_raster is None:
+                raise RuntimeError("The raster backend needs NumPy: pip install numpy")
+            self.raster = paint_raster.RasterCanvas(RASTER_WIDTH, RASTER_HEIGHT, background=self.canvas["bg"])
+            self.raster_photo = tk.PhotoImage(width=RASTER_WIDTH, height=RASTER_HEIGHT)
+            self.create_raster_image()
+            self.canvas.bind("<Configure>", lambda event: self.view_changed()) # Grows the bitmap with the window
+
         # Binds mouse events to the canvas for interactive drawing
-        self.canvas.bind("<Button-1>", self.start_action)       # Triggers when the left mouse button is pressed
-        self.canvas.bind("<B1-Motion>", self.perform_action)    # Triggers when the mouse is dragged with left button pressed
-        self.canvas.bind("<ButtonRelease-1>", self.stop_action) # Triggers when the left mouse button is released
-        self.canvas.bind("<Motion>", self.update_indicator) # Triggers on any mouse movement over the canvas
+        self.input_pipeline = None # Queues motion events for the frame tick, unless input pacing is turned off
+        if input_rate:
+            self.input_pipeline = InputPipeline(root, self.late_bound("start_action"), self.late_bound("perform_batch"),
+                                                self.late_bound("stop_action"), self.late_bound("update_indicator"),
+                                                rate_hz=input_rate, max_depth=input_queue_depth)
+            self.canvas.bind("<Button-1>", self.input_pipeline.press)       # Triggers when the left mouse button is pressed
+            self.canvas.bind("<B1-Motion>", self.input_pipeline.drag)       # Queued until the next frame
+            self.canvas.bind("<ButtonRelease-1>", self.input_pipeline.release) # Triggers when the left mouse button is released
+            self.canvas.bind("<Motion>", self.input_pipeline.hover)         # Only the latest position per frame is shown
+        else:
+            self.canvas.bind("<Button-1>", self.late_bound("start_action"))       # Triggers when the left mouse button is pressed
+            self.canvas.bind("<B1-Motion>", self.late_bound("perform_action"))    # Triggers when the mouse is dragged with left button pressed
+            self.canvas.bind("<ButtonRelease-1>", self.late_bound("stop_action")) # Triggers when the left mouse button is released
+            self.canvas.bind("<Motion>", self.late_bound("update_indicator")) # Triggers on any mouse movement over the canvas
+        self.canvas.bind("<ButtonPress-2>", self.start_pan)     # Grabs the drawing with the middle button
+        self.canvas.bind("<B2-Motion>", self.drag_pan)          # Pans the view while the middle button is held
+        self.canvas.bind("<MouseWheel>", self.wheel)            # Scrolls on Windows and macOS
+        self.canvas.bind("<Shift-MouseWheel>", self.wheel)
+        self.canvas.bind("<Control-MouseWheel>", self.wheel)
+        for button in ("4", "5"): # Scrolls on X11, which reports the wheel as buttons 4 and 5
+            for modifier in ("", "Shift-", "Control-"):
+                self.canvas.bind(f"<{modifier}Button-{button}>", self.wheel)
 
         # Control Frame: Contains all the tool buttons and sliders
         self.control_frame = tk.Frame(self.main_frame, bd=2, relief="ridge", padx=10, pady=10)
@@ -71,143 +188,479 @@ class PaintApp:
         self.shape_tool_button.grid(row=5, column=0, padx=5, pady=10) # Positions the shapes button
 
         # Undo Button: Reverts the last drawing action
-        self.undo_button = tk.Button(self.control_frame, text="Undo", command=self.undo_action,
+        self.undo_button = tk.Button(self.control_frame, text="Undo", command=self.late_bound("undo_action"),
                                       width=15, height=2, relief="raised", state="disabled") # Disabled by default
         self.undo_button.grid(row=6, column=0, padx=5, pady=10) # Positions the undo button
 
         # Redo Button: Reapplies a previously undone drawing action
-        self.redo_button = tk.Button(self.control_frame, text="Redo", command=self.redo_action,
+        self.redo_button = tk.Button(self.control_frame, text="Redo", command=self.late_bound("redo_action"),
                                       width=15, height=2, relief="raised", state="disabled") # Disabled by default
         self.redo_button.grid(row=7, column=0, padx=5, pady=5) # Positions the redo button
 
         # Clear Canvas Button: Removes all drawings from the canvas
-        self.clear_button = tk.Button(self.control_frame, text="Clear Canvas", command=self.clear_canvas,
+        self.clear_button = tk.Button(self.control_frame, text="Clear Canvas", command=self.late_bound("clear_canvas"),
                                        bg="red", fg="white", width=15, height=2, relief="raised")
         self.clear_button.grid(row=8, column=0, padx=5, pady=10) # Positions the clear canvas button
 
+        # Save PNG Button: Exports the drawing as a PNG image
+        self.save_button = tk.Button(self.control_frame, text="Save PNG", command=self.save_png,
+                                      width=15, height=2, relief="raised")
+        self.save_button.grid(row=9, column=0, padx=5, pady=5) # Positions the save button
+
+        # Save Drawing Button: Stores the drawing in a file so it can be opened and edited later
+        self.save_drawing_button = tk.Button(self.control_frame, text="Save Drawing", command=self.save_drawing,
+                                              width=15, height=2, relief="raised")
+        self.save_drawing_button.grid(row=10, column=0, padx=5, pady=5) # Positions the save drawing button
+
+        # Open Drawing Button: Replaces the canvas with a previously saved drawing
+        self.open_drawing_button = tk.Button(self.control_frame, text="Open Drawing", command=self.open_drawing,
+                                              width=15, height=2, relief="raised")
+        self.open_drawing_button.grid(row=11, column=0, padx=5, pady=5) # Positions the open drawing button
+
         # Signature Label: Displays author information
         self.signature_label = tk.Label(self.control_frame, text="by Yusuf Mert Tuna", font=("Arial", 8, "italic"), fg="gray")
-        self.signature_label.grid(row=9, column=0, padx=5, pady=(20, 5), sticky="s") # Positions the signature at the bottom
+        self.signature_label.grid(row=12, column=0, padx=5, pady=(20, 5), sticky="s") # Positions the signature at the bottom
 
         self.update_undo_redo_buttons() # Initializes the states of the Undo/Redo buttons
 
+    def late_bound(self, name):
+        """Returns a callback that looks the named handler up on every call.
+
+        Bindings and button commands use these, so a handler replaced on the instance
+        later on (for example by the input Recorder) is the one that gets called.
+        """
+        return lambda *args: getattr(self, name)(*args)
+
     # Mouse Event Handlers: Functions that respond to specific mouse interactions on the canvas
     def start_action(self, event):
-        """Records the starting coordinates of a drawing stroke or shape when the mouse button is pressed."""
+        """Starts a new stroke or shape in the document when the mouse button is pressed."""
         # If the user is in an 'undone' state and starts drawing, future undone actions are discarded
-        if self.history_idx < len(self.history) - 1:
-            # Deletes items that would be overwritten by new history
-            for i in range(self.history_idx + 1, len(self.history)):
-                for item_id in self.history[i]:
-                    self.canvas.delete(item_id)
-            self.history = self.history[:self.history_idx + 1]
+        x, y = self.to_document(event.x, event.y)
+        discarded_steps = self.engine.press(self.drawing_mode, x, y, self.drawing_color, self.brush_size)
+        for step in discarded_steps:
+            self.delete_step_items(step) # Deletes items that would be overwritten by new history
 
         self.current_stroke_items = [] # Clears the list for items in the new stroke/shape
-        self.old_x = event.x # Stores the starting X coordinate
-        self.old_y = event.y # Stores the starting Y coordinate
+        self.erased_shapes = []
+        self.live_stroke_id = None # A new stroke always starts a new polyline item
         self.clear_indicator() # Hides any active eraser indicator
 
     def perform_action(self, event):
-        """Draws continuously or previews shapes as the mouse is dragged."""
-        if self.old_x is not None and self.old_y is not None: # Ensures a valid starting point exists
-            # Clears any previous temporary shape preview
-            if self.temp_shape_id:
-                self.canvas.delete(self.temp_shape_id)
-                self.temp_shape_id = None
-
-            current_color = self.drawing_color
-            # Handles free drawing or erasing logic
-            if self.drawing_mode == "draw" or self.drawing_mode == "erase":
-                if self.drawing_mode == "erase":
-                    current_color = self.canvas["bg"] # Eraser draws with the canvas's background color
-
+        """Draws continuously, erases, or previews shapes as the mouse is dragged."""
+        self.perform_batch([(event.x, event.y)])
+
+    def perform_batch(self, points):
+        """Applies a batch of (x, y) drag positions to the document, then updates the canvas once."""
+        if self.zoom != 1 or self.view_x or self.view_y: # The view was panned or zoomed
+            points = [self.to_document(x, y) for x, y in points]
+        # Handles erasing: removes or splits the shapes under the brush instead of painting over them
+        if self.engine.erasing is not None:
+            changes = []
+            for x, y in points:
+                changes.extend(self.engine.erase_to(x, y))
+            self.apply_erase(changes)
+            return
+
+        shape = None
+        for x, y in points:
+            shape = self.engine.drag(x, y) # Adds the new point to the shape in the document
+            if shape is None: # Ensures a stroke or shape was started
+                return
+            if shape.kind in FREEHAND_KINDS and self.stroke_mode == STROKE_MODE_SEGMENTS:
+                if not self.engine.extended: # The simplifier moved the stroke's end instead of adding a point
+                    self.canvas.coords(self.current_stroke_items[-1], self.view_coords(shape.points[-4:]))
+                    continue
                 # Creates a line segment from the previous point to the current mouse position
-                item_id = self.canvas.create_line(self.old_x, self.old_y, event.x, event.y,
-                                        width=self.brush_size,
-                                        fill=current_color,
-                                        capstyle=tk.ROUND,  # Renders line ends with a round cap
-                                        smooth=tk.TRUE,     # Attempts to smooth out the drawn line
-                                        splinesteps=12      # Defines the degree of smoothing
-                                       )
+                item_id = self.canvas.create_line(self.view_coords(shape.points[-4:]),
+                                        width=shape.width * self.zoom,
+                                        fill=shape.color,
+                                        capstyle=tk.ROUND   # Renders line ends with a round cap
+                                       ) # A two-point line has nothing to smooth, so it needs no spline steps
                 self.current_stroke_items.append(item_id) # Adds the created line segment ID to the current stroke list
+        if shape is None:
+            return
+
+        # Handles free drawing logic
+        if shape.kind in FREEHAND_KINDS:
+            if self.stroke_mode == STROKE_MODE_POLYLINE:
+                self.extend_live_stroke(shape) # Grows the stroke's single line item by the whole batch
 
-                # Updates the 'old' coordinates to the current mouse position for the next segment
-                self.old_x = event.x
-                self.old_y = event.y
-            
-            # Handles shape preview logic for rectangles, circles, and lines
-            elif self.drawing_mode == "rectangle":
-                self.temp_shape_id = self.canvas.create_rectangle(self.old_x, self.old_y, event.x, event.y,
-                                                                   outline=current_color, width=self.brush_size)
-            elif self.drawing_mode == "circle":
-                self.temp_shape_id = self.canvas.create_oval(self.old_x, self.old_y, event.x, event.y,
-                                                              outline=current_color, width=self.brush_size)
-            elif self.drawing_mode == "line":
-                self.temp_shape_id = self.canvas.create_line(self.old_x, self.old_y, event.x, event.y,
-                                                              fill=current_color, width=self.brush_size,
-                                                              capstyle=tk.ROUND, smooth=tk.TRUE)
+        # Handles shape preview logic for rectangles, circles, and lines
+        else:
+            self.update_shape_preview(shape)
+
+    def update_shape_preview(self, shape):
+        """Moves the persistent preview item for the shape's kind to the shape, creating it on first use."""
+        item_id = self.preview_items.get(shape.kind)
+        if item_id is None:
+            item_id = self.create_shape_item(shape)
+            self.preview_items[shape.kind] = item_id
+        else:
+            self.canvas.coords(item_id, self.view_coords(shape.points)) # Updates the existing preview in place
+            if self.temp_shape_id != item_id: # First drag of a new shape: restyles and shows the idle preview
+                self.canvas.itemconfigure(item_id, state="normal", width=shape.width * self.zoom,
+                                          **self.shape_color_option(shape))
+                self.canvas.tag_raise(item_id) # Puts it above anything drawn since it was last used
+        self.temp_shape_id = item_id
+
+    def promote_preview(self, shape):
+        """Turns the preview item into the permanent item for a finished shape and returns its ID."""
+        item_id = self.preview_items.pop(shape.kind, None) # The next shape of this kind gets a new preview
+        self.temp_shape_id = None
+        if item_id is None:
+            return self.create_shape_item(shape)
+        self.canvas.coords(item_id, self.view_coords(shape.points)) # Moves it to the release point
+        return item_id
+
+    def extend_live_stroke(self, shape):
+        """Shows the stroke's latest point by updating its single polyline item, creating it on first use."""
+        if self.live_stroke_id is None:
+            self.live_stroke_steps = self.simplifier.steps
+            self.live_stroke_id = self.create_shape_item(shape, steps=self.live_stroke_steps)
+            self.current_stroke_items.append(self.live_stroke_id) # The whole stroke is tracked by this one ID
+        else:
+            self.canvas.coords(self.live_stroke_id, self.view_coords(shape.points)) # Updates the existing item in place
+            if self.simplifier.steps != self.live_stroke_steps: # A sharper turn needs finer smoothing
+                self.live_stroke_steps = self.simplifier.steps
+                self.canvas.itemconfigure(self.live_stroke_id, splinesteps=self.live_stroke_steps)
 
     def stop_action(self, event):
         """Finalizes the drawing stroke or shape when the mouse button is released."""
-        # Finalizes the shape if currently in a shape drawing mode
-        if self.temp_shape_id:
-            self.canvas.delete(self.temp_shape_id) # Deletes the temporary preview shape
-            self.temp_shape_id = None # Clears the reference to the temporary shape
-
-            final_item_id = None
-            # Creates the permanent shape based on the drawing mode
-            if self.drawing_mode == "rectangle":
-                final_item_id = self.canvas.create_rectangle(self.old_x, self.old_y, event.x, event.y,
-                                                              outline=self.drawing_color, width=self.brush_size)
-            elif self.drawing_mode == "circle":
-                final_item_id = self.canvas.create_oval(self.old_x, self.old_y, event.x, event.y,
-                                                         outline=self.drawing_color, width=self.brush_size)
-            elif self.drawing_mode == "line":
-                final_item_id = self.canvas.create_line(self.old_x, self.old_y, event.x, event.y,
-                                                         fill=self.drawing_color, width=self.brush_size,
-                                                         capstyle=tk.ROUND, smooth=tk.TRUE)
-            
-            if final_item_id:
-                self.current_stroke_items.append(final_item_id) # Adds the final shape's ID to the current stroke
-
-        if self.current_stroke_items: # Adds the completed stroke/shape to the history if items were drawn
-            self.history.append(self.current_stroke_items)
-            self.history_idx = len(self.history) - 1
-        
-        self.old_x = None # Resets the starting coordinates for the next action
-        self.old_y = None
+        erasing = self.engine.erasing is not None
+        step = self.engine.release(*self.to_document(event.x, event.y)) # Commits the finished action to the document history
+        if erasing:
+            self.finish_erase(step)
+        elif step is not None:
+            shape = step.added[0]
+            if shape.kind not in FREEHAND_KINDS:
+                self.current_stroke_items.append(self.promote_preview(shape)) # The preview becomes the permanent shape
+            self.shape_items[shape] = self.current_stroke_items # Remembers which canvas items show this shape
+            if self.bakes_shapes:
+                self.bake_shape(shape) # Moves the finished shape from vector items into the bitmap
+
+        if self.temp_shape_id: # A preview that was not promoted is hidden until the next drag reuses it
+            self.canvas.itemconfigure(self.temp_shape_id, state="hidden")
+            self.temp_shape_id = None
+
+        self.current_stroke_items = []
+        self.live_stroke_id = None # The polyline is finished; the next stroke gets its own item
         self.update_undo_redo_buttons() # Updates the state of Undo/Redo buttons
         self.update_indicator(event) # Shows the eraser indicator if still in eraser mode
 
+    # Canvas View Helpers: Functions that mirror document shapes as canvas items
+    def shape_color_option(self, shape):
+        """Returns the item option that carries a shape's color: outline for rectangles and ovals, fill otherwise."""
+        if shape.kind in (KIND_RECTANGLE, KIND_OVAL):
+            return {"outline": shape.color}
+        return {"fill": shape.color}
+
+    def create_shape_item(self, shape, steps=None):
+        """Creates one canvas item that draws the given document shape and returns its ID.
+
+        Freehand strokes are smoothed with the given number of spline steps, or as
+        many as their sharpest turn needs when steps is None.
+        """
+        coords = self.view_coords(shape.points)
+        width = shape.width * self.zoom
+        if shape.kind == KIND_RECTANGLE:
+            return self.canvas.create_rectangle(*coords, outline=shape.color, width=width)
+        if shape.kind == KIND_OVAL:
+            return self.canvas.create_oval(*coords, outline=shape.color, width=width)
+        if shape.kind == KIND_LINE:
+            return self.canvas.create_line(*coords, fill=shape.color, width=width,
+                                           capstyle=tk.ROUND, smooth=tk.TRUE)
+        return self.canvas.create_line(*coords,
+                                       width=width,
+                                       fill=shape.color,
+                                       capstyle=tk.ROUND,    # Renders line ends with a round cap
+                                       joinstyle=tk.ROUND,   # Keeps sharp turns as smooth as separate segments
+                                       smooth=tk.TRUE,       # Attempts to smooth out the drawn line
+                                       splinesteps=steps or spline_steps(shape.points)) # Fewer sub-steps where the line barely bends
+
+    # Raster Backend Helpers: Functions used only when shapes are baked into a bitmap
+    def create_raster_image(self):
+        """Creates the canvas image item that shows the raster bitmap below all other items."""
+        self.raster_image_id = self.canvas.create_image(*self.raster.origin, image=self.raster_photo, anchor="nw")
+        self.canvas.tag_lower(self.raster_image_id) # Keeps live strokes and previews drawn on top
+        self.refresh_raster()
+
+    def refresh_raster(self, box=None):
+        """Copies the raster (or just the part inside box) into the PhotoImage shown on the canvas."""
+        left, top = (box[0], box[1]) if box else (0, 0)
+        self.raster_photo.tk.call(self.raster_photo, "put", self.raster.to_ppm(box),
+                                  "-format", "ppm", "-to", left, top) # Only the changed pixels are copied
+
+    def bake_shape(self, shape):
+        """Draws a committed shape into the raster (or tiles) and deletes its now redundant canvas items."""
+        for item_id in self.shape_items[shape]:
+            self.canvas.delete(item_id)
+        self.shape_items[shape] = []
+        if self.tiles is not None:
+            self.tiles.draw(shape) # Only the cached tiles under the shape change
+            self.refresh_tiles()
+            return
+        self.raster.draw_shape(shape)
+        box = self.raster_box(shape.bounds())
+        if box is not None:
+            self.refresh_raster(box)
+
+    def raster_box(self, bounds):
+        """Returns the part of a drawing-coordinate box that the raster covers, in bitmap pixels, or None."""
+        left, top = self.raster.origin
+        x1, y1, x2, y2 = bounds
+        return self.raster.clip_box(x1 - left, y1 - top, x2 - left, y2 - top)
+
+    def redraw_raster_box(self, box):
+        """Clears and redraws a box of the raster, given in bitmap pixels, from the shapes the spatial index finds there."""
+        left, top = self.raster.origin
+        self.raster.redraw_region(box, self.document.shapes_in_box(box[0] + left, box[1] + top,
+                                                                   box[2] + left, box[3] + top))
+
+    def place_raster(self):
+        """Keeps the raster under the canvas window after a pan or resize, drawing only what it did not cover before."""
+        left, top = round(self.view_x), round(self.view_y)
+        width = max(RASTER_WIDTH, self.canvas.winfo_width())
+        height = max(RASTER_HEIGHT, self.canvas.winfo_height())
+        if width > self.raster.width or height > self.raster.height: # The window grew past the bitmap
+            self.raster = optional_module("paint_raster").RasterCanvas(width, height, background=self.canvas["bg"])
+            self.raster.origin = (left, top)
+            self.redraw_raster_box((0, 0, width, height))
+            self.raster_photo = tk.PhotoImage(width=width, height=height)
+            self.canvas.itemconfigure(self.raster_image_id, image=self.raster_photo)
+        elif (left, top) != self.raster.origin:
+            old_left, old_top = self.raster.origin
+            for box in self.raster.shift(left - old_left, top - old_top): # Keeps the pixels still in view
+                self.redraw_raster_box(box)
+        else:
+            return
+        self.canvas.coords(self.raster_image_id, left, top)
+        self.refresh_raster()
+
+    def redraw_raster(self, bounds=None):
+        """Re-renders the raster from the visible shapes in the document, e.g. after Undo or Redo.
+
+        When bounds is given, only that dirty rectangle is cleared and redrawn from the
+        shapes the spatial index finds there. With the tiled backend, the tiles there
+        are marked dirty and the visible ones rendered again.
+        """
+        if self.tiles is not None:
+            self.tiles.invalidate(bounds)
+            self.refresh_tiles()
+            return
+        if bounds is None:
+            self.redraw_raster_box((0, 0, self.raster.width, self.raster.height))
+            self.refresh_raster()
+            return
+        box = self.raster_box(bounds)
+        if box is not None:
+            self.redraw_raster_box(box)
+            self.refresh_raster(box)
+
+    # Tiled Backend Helpers: Functions used only when shapes are baked into cached tiles
+    def refresh_tiles(self):
+        """Shows exactly the tiles covering the window, rendering the ones that are missing or out of date."""
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        keys = self.tiles.visible_keys(self.zoom, self.view_x, self.view_y,
+                                       self.view_x + width, self.view_y + height)
+        size = self.tiles.tile_size
+        for key in keys:
+            tile = self.tiles.get(key)
+            if tile.image is None:
+                tile.image = tk.PhotoImage(width=size, height=size)
+            if tile.stale: # Copies the tile's pixels into its image only when they changed
+                tile.image.tk.call(tile.image, "put", tile.raster.to_ppm(), "-format", "ppm")
+                tile.stale = False
+            if key not in self.tile_items:
+                zoom, column, row = key
+                item_id = self.canvas.create_image(column * size, row * size, image=tile.image,
+                                                   anchor="nw", tags="tile")
+                self.canvas.tag_lower(item_id) # Keeps live strokes, previews and the indicator drawn on top
+                self.tile_items[key] = item_id
+        visible = set(keys)
+        for key in [key for key in self.tile_items if key not in visible]: # Only visible tiles stay on the canvas
+            self.canvas.delete(self.tile_items.pop(key))
+        self.tiles.trim(keep=visible) # Drops old tiles over the memory cap; they have no items any more
+
+    def tile_stats(self):
+        """Returns the tile cache's size and counters, or None when the tiled backend is not used."""
+        if self.tiles is None:
+            return None
+        return self.tiles.stats()
+
+    # View Navigation: Functions that pan and zoom the canvas
+    def to_document(self, x, y):
+        """Converts a position in the canvas window to drawing coordinates."""
+        return round((x + self.view_x) / self.zoom), round((y + self.view_y) / self.zoom)
+
+    def view_coords(self, points):
+        """Returns a flat point buffer in drawing coordinates as a list of canvas coordinates at the current zoom."""
+        if self.zoom == 1:
+            return points.tolist()
+        return [value * self.zoom for value in points]
+
+    def start_pan(self, event):
+        self.canvas.scan_mark(event.x, event.y)
+
+    def drag_pan(self, event):
+        self.canvas.scan_dragto(event.x, event.y, gain=1) # Tk moves the view without touching any item
+        self.view_changed()
+
+    def scroll_view(self, dx, dy):
+        """Moves the view right by dx and down by dy screen pixels."""
+        self.canvas.scan_mark(0, 0)
+        self.canvas.scan_dragto(-round(dx), -round(dy), gain=1)
+        self.view_changed()
+
+    def wheel(self, event):
+        """Scrolls with the mouse wheel, sideways with Shift held, or zooms with Control held."""
+        if event.num in (4, 5): # X11 wheel buttons
+            notches = 1 if event.num == 4 else -1
+        else:
+            notches = 1 if event.delta > 0 else -1
+        if event.state & 0x0004: # Control
+            self.zoom_at(event.x, event.y, notches)
+        elif event.state & 0x0001: # Shift
+            self.scroll_view(-notches * SCROLL_STEP, 0)
+        else:
+            self.scroll_view(0, -notches * SCROLL_STEP)
+
+    def zoom_at(self, x, y, steps):
+        """Moves steps zoom levels in (or out, if negative), keeping the drawing under window position (x, y) in place."""
+        if self.tiles is None or self.engine.active is not None or self.engine.erasing is not None:
+            return # Only the tiled backend can redraw baked shapes at another scale, and never mid-stroke
+        levels = optional_module("paint_tiles").ZOOM_LEVELS
+        index = min(range(len(levels)), key=lambda i: abs(levels[i] - self.zoom)) + steps
+        zoom = levels[max(0, min(len(levels) - 1, index))]
+        if zoom == self.zoom:
+            return
+        anchor_x, anchor_y = (x + self.view_x) / self.zoom, (y + self.view_y) / self.zoom # Drawing point under the mouse
+        for item_id in self.tile_items.values(): # Tiles of the old zoom level leave the canvas but stay cached
+            self.canvas.delete(item_id)
+        self.tile_items = {}
+        for item_id in self.preview_items.values(): # Idle previews are rescaled the next time they are used
+            self.canvas.itemconfigure(item_id, state="hidden")
+        self.clear_indicator()
+        self.zoom = zoom
+        self.scroll_view(anchor_x * zoom - x - self.view_x, anchor_y * zoom - y - self.view_y)
+
+    def view_changed(self):
+        """Records where the view is after a pan, zoom or resize, and shows the tiles or raster it now covers."""
+        self.view_x = self.canvas.canvasx(0)
+        self.view_y = self.canvas.canvasy(0)
+        if self.tiles is not None:
+            self.refresh_tiles()
+        elif self.raster is not None:
+            self.place_raster()
+
+    def set_shapes_state(self, shapes, state):
+        """Shows ('normal') or hides ('hidden') the canvas items of the given shapes."""
+        for shape in shapes:
+            for item_id in self.shape_items.get(shape, ()):
+                self.canvas.itemconfigure(item_id, state=state)
+
+    def delete_step_items(self, step):
+        """Deletes the canvas items of every shape a discarded history step added."""
+        for shape in step.added:
+            for item_id in self.shape_items.pop(shape, ()):
+                self.canvas.delete(item_id)
+
+    def apply_erase(self, changes):
+        """Hides the shapes the eraser removed and shows the pieces that replace them."""
+        for shape, pieces in changes:
+            items = self.shape_items.get(shape, [])
+            for item_id in items:
+                self.canvas.itemconfigure(item_id, state='hidden') # Hidden rather than deleted so Undo can restore it
+            above = items[-1] if items else None
+            for piece in pieces:
+                if self.bakes_shapes:
+                    self.shape_items[piece] = [] # Pieces are drawn into the bitmap below
+                    continue
+                item_id = self.create_shape_item(piece)
+                if above is not None:
+                    self.canvas.tag_raise(item_id, above) # Keeps the piece at the erased shape's stacking position
+                above = item_id
+                self.shape_items[piece] = [item_id]
+            self.erased_shapes.append(shape)
+        if self.bakes_shapes and changes:
+            self.redraw_raster(shapes_bounds([shape for shape, pieces in changes])) # Redraws only the erased area
+
+    def forget_baked_step(self, step):
+        """Frees the canvas items a history step kept only for undoing, once the step is flattened."""
+        for shape in step.removed:
+            for item_id in self.shape_items.pop(shape, ()): # Hidden items that can never be shown again
+                self.canvas.delete(item_id)
+        for shape in step.added:
+            items = self.shape_items.get(shape, [])
+            if len(items) > 1: # Compacts a segment-mode stroke into a single polyline item
+                item_id = self.create_shape_item(shape)
+                # A later step may have erased the stroke, so the new item is shown or hidden like the old ones
+                self.canvas.itemconfigure(item_id, state=self.canvas.itemcget(items[-1], "state") or "normal")
+                self.canvas.tag_raise(item_id, items[-1]) # Keeps the stroke at the same stacking position
+                for old_item_id in items:
+                    self.canvas.delete(old_item_id)
+                self.shape_items[shape] = [item_id]
+
+    def history_memory(self):
+        """Returns a dict describing the memory kept by the undo history, plus the live canvas item count."""
+        usage = self.document.memory_usage()
+        usage["canvas_items"] = len(self.canvas.find_all())
+        return usage
+
+    def finish_erase(self, step):
+        """Deletes the items of pieces that were created and erased again within the same eraser drag."""
+        kept = set(step.removed) if step is not None else set()
+        for shape in self.erased_shapes:
+            if shape not in kept: # Never part of history, so nothing can bring it back
+                for item_id in self.shape_items.pop(shape, ()):
+                    self.canvas.delete(item_id)
+        self.erased_shapes = []
+
     def update_indicator(self, event):
-        """Draws or updates a visual indicator (circle) for the eraser size on mouse motion."""
+        """Moves a visual indicator (circle) for the eraser size to follow the mouse."""
         # The indicator is only shown if the current mode is 'erase' and the mouse is over the canvas
         if self.drawing_mode == "erase" and \
            0 <= event.x <= self.canvas.winfo_width() and \
            0 <= event.y <= self.canvas.winfo_height():
 
-            self.clear_indicator() # Removes any previously drawn indicator
-
             # Calculates coordinates for drawing a circle based on brush size
-            x1 = event.x - self.brush_size
-            y1 = event.y - self.brush_size
-            x2 = event.x + self.brush_size
-            y2 = event.y + self.brush_size
-            # Creates the oval indicator and stores its ID
-            self.eraser_indicator_id = self.canvas.create_oval(x1, y1, x2, y2,
-                                                                outline="gray", width=1)
+            radius = self.brush_size * self.zoom
+            x1 = event.x + self.view_x - radius
+            y1 = event.y + self.view_y - radius
+            x2 = event.x + self.view_x + radius
+            y2 = event.y + self.view_y + radius
+            if self.eraser_indicator_id is None:
+                # Creates the oval indicator once and stores its ID
+                self.eraser_indicator_id = self.canvas.create_oval(x1, y1, x2, y2,
+                                                                    outline="gray", width=1)
+            else:
+                self.canvas.coords(self.eraser_indicator_id, x1, y1, x2, y2) # Moves the existing oval
+            if not self.indicator_visible:
+                self.canvas.itemconfigure(self.eraser_indicator_id, state="normal")
+                self.canvas.tag_raise(self.eraser_indicator_id) # Keeps it above anything drawn while it was hidden
+                self.indicator_visible = True
         else: # Hides the indicator if not in eraser mode or mouse leaves the canvas
             self.clear_indicator()
 
     def clear_indicator(self):
-        """Removes the current eraser size indicator from the canvas."""
-        if self.eraser_indicator_id:
-            self.canvas.delete(self.eraser_indicator_id) # Deletes the oval object
-            self.eraser_indicator_id = None # Clears the ID reference
+        """Hides the eraser size indicator; the oval is kept so it can be moved back into view."""
+        if self.eraser_indicator_id is not None and self.indicator_visible:
+            self.canvas.itemconfigure(self.eraser_indicator_id, state="hidden") # Hides the oval object
+        self.indicator_visible = False
+
+    def input_stats(self):
+        """Returns the input pipeline's rate, queue depth and counters, or None when input pacing is off."""
+        if self.input_pipeline is None:
+            return None
+        return self.input_pipeline.stats()
+
+    def simplify_stats(self):
+        """Returns the stroke simplifier's tolerance and the points kept against the samples received."""
+        return self.simplifier.stats()
 
     # Control Functions: Methods associated with buttons and sliders in the control panel
     def choose_color(self):
         """Opens a color selection dialog and updates the drawing color based on user's choice."""
+        from tkinter import colorchooser # Imports the color chooser dialog the first time it is needed
         color_code = colorchooser.askcolor(title="Choose Color") # Opens the system color picker
         if color_code[1]: # Checks if a color was selected (not canceled)
             self.drawing_color = color_code[1] # Sets the new drawing color
@@ -219,42 +672,48 @@ class PaintApp:
         self.brush_size = int(size)
 
     def open_shape_selection_popup(self):
-        """Creates and displays a small pop-up window for selecting shape tools."""
-        # Destroys any existing popup to ensure only one is open at a time
-        if self.shape_popup:
-            self.shape_popup.destroy()
-            self.shape_popup = None
+        """Shows the small pop-up window for selecting shape tools, or hides it if it is already showing."""
+        if self.shape_popup_shown:
+            self.close_shape_popup()
             return # If clicked again, it closes the popup
 
-        self.shape_popup = tk.Toplevel(self.root) # Creates a new top-level window
-        self.shape_popup.title("Select Shape") # Sets the title of the popup
-        self.shape_popup.transient(self.root) # Makes the popup transient to the main window
-        self.shape_popup.grab_set() # Forces user interaction with the popup
-        self.shape_popup.resizable(False, False) # Prevents resizing of the popup
+        if self.shape_popup is None:
+            self.build_shape_popup() # Built once, then only shown and hidden
 
         # Calculates the position for the popup to appear below the "Shapes" button
         btn_x = self.shape_tool_button.winfo_rootx()
         btn_y = self.shape_tool_button.winfo_rooty()
         btn_height = self.shape_tool_button.winfo_height()
         self.shape_popup.geometry(f"+{btn_x}+{btn_y + btn_height + 5}") # Positions the popup below the button
+        self.shape_popup.deiconify() # Shows the popup
+        self.shape_popup.grab_set() # Forces user interaction with the popup
+        self.shape_popup_shown = True
+
+    def build_shape_popup(self):
+        """Creates the shape selection pop-up window, hidden."""
+        self.shape_popup = tk.Toplevel(self.root) # Creates a new top-level window
+        self.shape_popup.withdraw() # Stays hidden until it is positioned and shown
+        self.shape_popup.title("Select Shape") # Sets the title of the popup
+        self.shape_popup.transient(self.root) # Makes the popup transient to the main window
+        self.shape_popup.resizable(False, False) # Prevents resizing of the popup
 
         # Creates and packs buttons for Rectangle, Circle/Oval, and Straight Line inside the popup
-        tk.Button(self.shape_popup, text="Rectangle", command=lambda: self.set_rectangle_mode(self.shape_popup),
+        tk.Button(self.shape_popup, text="Rectangle", command=self.set_rectangle_mode,
                   width=15, height=2).pack(pady=2, padx=5)
-        tk.Button(self.shape_popup, text="Circle/Oval", command=lambda: self.set_oval_mode(self.shape_popup),
+        tk.Button(self.shape_popup, text="Circle/Oval", command=self.set_oval_mode,
                   width=15, height=2).pack(pady=2, padx=5)
-        tk.Button(self.shape_popup, text="Straight Line", command=lambda: self.set_line_mode(self.shape_popup),
+        tk.Button(self.shape_popup, text="Straight Line", command=self.set_line_mode,
                   width=15, height=2).pack(pady=2, padx=5)
-        
+
         # Binds the close button of the popup to a custom close function
         self.shape_popup.protocol("WM_DELETE_WINDOW", self.close_shape_popup)
 
     def close_shape_popup(self):
-        """Closes the shape selection pop-up window."""
-        if self.shape_popup:
+        """Hides the shape selection pop-up window."""
+        if self.shape_popup_shown:
             self.shape_popup.grab_release() # Releases focus from the popup
-            self.shape_popup.destroy() # Destroys the popup window
-            self.shape_popup = None # Clears the reference
+            self.shape_popup.withdraw() # Hides the popup window, keeping it for the next time
+            self.shape_popup_shown = False
 
     def set_draw_mode(self):
         """Activates the free drawing mode and updates tool button states."""
@@ -269,32 +728,26 @@ class PaintApp:
         self.update_tool_button_states(self.eraser_button) # Sets the 'Eraser' button as active
         self.close_shape_popup() # Closes the shape selection popup if open
 
-    def set_rectangle_mode(self, popup_window=None):
+    def set_rectangle_mode(self):
         """Activates the rectangle drawing mode and updates tool button states."""
         self.drawing_mode = "rectangle"
         self.update_tool_button_states(self.shape_tool_button) # Sets the 'Shapes' button as active
         self.clear_indicator()
-        if popup_window:
-            popup_window.destroy() # Destroys the popup window that called this function
-            self.shape_popup = None # Clears the reference to the popup
+        self.close_shape_popup() # Closes the shape selection popup if open
 
-    def set_oval_mode(self, popup_window=None):
+    def set_oval_mode(self):
         """Activates the circle/oval drawing mode and updates tool button states."""
         self.drawing_mode = "circle"
         self.update_tool_button_states(self.shape_tool_button) # Sets the 'Shapes' button as active
         self.clear_indicator()
-        if popup_window:
-            popup_window.destroy() # Destroys the popup window that called this function
-            self.shape_popup = None # Clears the reference to the popup
+        self.close_shape_popup() # Closes the shape selection popup if open
 
-    def set_line_mode(self, popup_window=None):
+    def set_line_mode(self):
         """Activates the straight line drawing mode and updates tool button states."""
         self.drawing_mode = "line"
         self.update_tool_button_states(self.shape_tool_button) # Sets the 'Shapes' button as active
         self.clear_indicator()
-        if popup_window:
-            popup_window.destroy() # Destroys the popup window that called this function
-            self.shape_popup = None # Clears the reference to the popup
+        self.close_shape_popup() # Closes the shape selection popup if open
 
     def update_tool_button_states(self, active_button):
         """Helper function to visually update the state of all tool buttons (active/inactive)."""
@@ -307,48 +760,226 @@ class PaintApp:
     def clear_canvas(self):
         """Deletes all drawn items from the canvas and resets the history."""
         self.canvas.delete("all") # Removes all drawing objects from the canvas
-        self.history = [] # Clears the history list
-        self.history_idx = -1 # Resets the history index
+        self.document.clear() # Clears every shape and the history list
+        self.shape_items.clear() # Forgets the deleted canvas items
+        self.eraser_indicator_id = None # The indicator was deleted with everything else
+        self.indicator_visible = False
+        self.preview_items = {} # The idle previews were deleted as well
+        if self.raster is not None:
+            self.raster.clear() # Erases the bitmap as well
+            self.create_raster_image() # Puts back the image item removed with everything else
+        if self.tiles is not None:
+            self.tiles.clear() # Every tile is empty now
+            self.tile_items = {} # The tile images were deleted with everything else
+            self.refresh_tiles()
         self.update_undo_redo_buttons() # Updates the state of Undo/Redo buttons
-        self.clear_indicator() # Hides any eraser indicator
         self.close_shape_popup() # Closes the shape selection popup if open
 
     def undo_action(self):
         """Hides the last drawn stroke or shape, moving back in the history."""
-        if self.history_idx >= 0:
-            stroke_items = self.history[self.history_idx] # Gets the items from the last stroke
-            for item_id in stroke_items:
-                self.canvas.itemconfigure(item_id, state='hidden') # Sets the items to be hidden
-            self.history_idx -= 1 # Moves the history index back
+        step = self.document.undo() # Gets the shapes from the last stroke
+        if step is not None:
+            self.set_shapes_state(step.added, 'hidden') # Sets the items to be hidden
+            self.set_shapes_state(step.removed, 'normal') # Brings back anything the step erased
+            if self.bakes_shapes:
+                self.redraw_raster(shapes_bounds(step.added + step.removed)) # Baked shapes are redrawn instead
             self.update_undo_redo_buttons() # Updates the state of Undo/Redo buttons
         self.close_shape_popup() # Closes the shape selection popup if open
 
     def redo_action(self):
         """Reveals the next stroke or shape in the history, moving forward."""
-        if self.history_idx < len(self.history) - 1:
-            self.history_idx += 1 # Moves the history index forward
-            stroke_items = self.history[self.history_idx] # Gets the items from the next stroke
-            for item_id in stroke_items:
-                self.canvas.itemconfigure(item_id, state='normal') # Sets the items to be visible
+        step = self.document.redo() # Gets the shapes from the next stroke
+        if step is not None:
+            self.set_shapes_state(step.removed, 'hidden') # Erases again what the step erased
+            self.set_shapes_state(step.added, 'normal') # Sets the items to be visible
+            if self.bakes_shapes:
+                self.redraw_raster(shapes_bounds(step.added + step.removed)) # Baked shapes are redrawn instead
             self.update_undo_redo_buttons() # Updates the state of Undo/Redo buttons
         self.close_shape_popup() # Closes the shape selection popup if open
 
+    def save_png(self):
+        """Asks for a file name and exports the drawing as a PNG image, with thumbnails, in the background."""
+        from tkinter import filedialog, messagebox # Imports the save-file and error dialogs the first time they are needed
+        if optional_module("paint_export") is None:
+            messagebox.showerror("Save PNG", "Saving PNG images needs NumPy: pip install numpy")
+            return
+        path = filedialog.asksaveasfilename(title="Save Drawing", defaultextension=".png",
+                                            filetypes=[("PNG image", "*.png")]) # Opens the system save dialog
+        if path: # Checks if a file name was chosen (not canceled)
+            self.start_export(path)
+
+    def export_box(self, shapes):
+        """Returns the area a PNG export covers: the canvas window's size from the origin, grown to fit every shape."""
+        left, top, right, bottom = 0, 0, self.canvas.winfo_width(), self.canvas.winfo_height()
+        bounds = shapes_bounds(shapes)
+        if bounds is not None:
+            left, top = min(left, bounds[0]), min(top, bounds[1])
+            right, bottom = max(right, bounds[2] + 1), max(bottom, bounds[3] + 1)
+        return left, top, right, bottom
+
+    def start_export(self, path):
+        """Snapshots the drawing and renders it on the process pool; poll_export finishes the job."""
+        if self.export_job is not None: # One export at a time
+            return
+        paint_export = optional_module("paint_export")
+        if self.export_pool is None:
+            self.export_pool = paint_export.create_pool(self.export_workers)
+        shapes = self.document.visible_shapes()
+        try:
+            self.export_job = paint_export.ExportJob(shapes, self.export_box(shapes), executor=self.export_pool,
+                                                     background=self.canvas["bg"])
+        except paint_export.BrokenExecutor as error:
+            self.export_failed(error)
+            return
+        self.export_path = path
+        self.save_button.config(state="disabled", text="Saving 0%")
+        self.root.after(EXPORT_POLL_MS, self.poll_export)
+
+    def poll_export(self):
+        """Shows the running export's progress and writes the files once every band is done."""
+        job = self.export_job
+        if job is None: # Cancelled when the export pool was closed
+            return
+        if not job.done():
+            self.save_button.config(text=f"Saving {job.progress():.0%}")
+            self.root.after(EXPORT_POLL_MS, self.poll_export)
+            return
+        self.export_job = None
+        self.save_button.config(state="normal", text="Save PNG")
+        paint_export = optional_module("paint_export")
+        try:
+            paint_export.write_export(self.export_path, *job.finish())
+        except (OSError, paint_export.BrokenExecutor) as error:
+            self.export_failed(error)
+
+    def export_failed(self, error):
+        """Reports a failed export; a broken pool is replaced by a fresh one on the next export."""
+        from tkinter import messagebox
+        self.export_job = None
+        if isinstance(error, optional_module("paint_export").BrokenExecutor):
+            self.close_export_pool()
+        messagebox.showerror("Save PNG", f"Could not save the image:\n{error}")
+
+    def close_export_pool(self):
+        """Stops the export worker processes, dropping any export still running."""
+        if self.export_job is not None:
+            self.export_job.cancel() # Bands not yet started are never run
+            self.export_job = None
+        if self.export_pool is not None:
+            self.export_pool.shutdown(wait=False, cancel_futures=True)
+            self.export_pool = None
+
+    def save_drawing(self):
+        """Asks for a file name and saves the drawing so it can be opened again later."""
+        from tkinter import filedialog, messagebox # Imports the save-file and error dialogs the first time they are needed
+        path = filedialog.asksaveasfilename(title="Save Drawing", defaultextension=paint_format.DRAWING_EXTENSION,
+                                            filetypes=[("Simple Paint drawing", "*" + paint_format.DRAWING_EXTENSION)])
+        if path: # Checks if a file name was chosen (not canceled)
+            try:
+                paint_format.save_drawing(path, self.document.visible_shapes())
+            except OSError as error:
+                messagebox.showerror("Save Drawing", f"Could not save the drawing:\n{error}")
+
+    def open_drawing(self):
+        """Asks for a saved drawing and replaces the canvas with it."""
+        from tkinter import filedialog, messagebox # Imports the open-file and error dialogs the first time they are needed
+        path = filedialog.askopenfilename(title="Open Drawing",
+                                          filetypes=[("Simple Paint drawing", "*" + paint_format.DRAWING_EXTENSION)])
+        if path: # Checks if a file was chosen (not canceled)
+            try:
+                self.load_drawing(path)
+            except (OSError, paint_format.DrawingFormatError) as error:
+                messagebox.showerror("Open Drawing", f"Could not open the drawing:\n{error}")
+
+    def load_drawing(self, path):
+        """Replaces the canvas with the drawing in path, as one step that Undo can take back."""
+        shapes = paint_format.load_drawing(path) # Reads everything before touching the current drawing
+        self.clear_canvas()
+        if not shapes:
+            return
+        self.document.commit(shapes) # Rebuilds the history in one step
+        if self.bakes_shapes:
+            for shape in shapes:
+                self.shape_items[shape] = []
+            self.redraw_raster() # Renders the whole drawing into the bitmap at once
+        else:
+            for shape in shapes:
+                self.shape_items[shape] = [self.create_shape_item(shape)]
+        self.update_undo_redo_buttons() # Updates the state of Undo/Redo buttons
+
     def update_undo_redo_buttons(self):
         """Enables or disables Undo/Redo buttons based on the current state of the history."""
         # Enables Undo button if there are actions to undo, otherwise disables it
-        if self.history_idx >= 0:
+        if self.document.can_undo():
             self.undo_button.config(state="normal")
         else:
             self.undo_button.config(state="disabled")
 
         # Enables Redo button if there are actions to redo, otherwise disables it
-        if self.history_idx < len(self.history) - 1:
+        if self.document.can_redo():
             self.redo_button.config(state="normal")
         else:
             self.redo_button.config(state="disabled")
 
 # Application Entry Point: This block runs when the script is executed
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simple Paint App")
+    parser.add_argument("--record", metavar="LOG", help="record the session's input to LOG when the window closes")
+    parser.add_argument("--replay", metavar="LOG", help="replay the input recorded in LOG at full speed on start")
+    parser.add_argument("--simplify-tolerance", type=float, default=DEFAULT_SIMPLIFY_TOLERANCE, metavar="PX",
+                        help="how far in pixels a dropped stroke sample may be off the stroke (0 keeps every sample)")
+    parser.add_argument("--render-backend", choices=[RENDER_BACKEND_VECTOR, RENDER_BACKEND_RASTER, RENDER_BACKEND_TILED],
+                        default=RENDER_BACKEND_VECTOR, help="how finished shapes are kept on screen")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="time the event handlers (F3 shows a HUD) and write the numbers to FILE on exit: "
+                             "JSON for a .json name, otherwise cProfile stats for the whole session")
+    parser.add_argument("--bench-startup", action="store_true",
+                        help="print how long the window took to appear and quit instead of running")
+    args = parser.parse_args()
+    replay_log = None
+    if args.replay:
+        try:
+            replay_log = InputLog.load(args.replay) # Reads and checks the whole log before any window opens
+        except (OSError, ValueError) as error:
+            parser.error(f"cannot replay {args.replay}: {error}")
+
+    started = time.perf_counter() # Imports are done
     root = tk.Tk() # Creates the main Tkinter window (the application's root window)
-    app = PaintApp(root) # Instantiates the PaintApp class, creating the application interface
+    app = PaintApp(root, render_backend=args.render_backend, # Instantiates the PaintApp class, creating the application interface
+                   simplify_tolerance=args.simplify_tolerance)
+    if args.bench_startup:
+        built = time.perf_counter()
+        root.wait_visibility(app.canvas) # Waits for the window to be mapped
+        root.update_idletasks() # Tk draws widgets from idle callbacks, so this finishes the first frame
+        shown = time.perf_counter()
+        print(f"imports {(started - STARTUP_TIME) * 1e3:.1f} ms, window built {(built - started) * 1e3:.1f} ms, "
+              f"first frame {(shown - STARTUP_TIME) * 1e3:.1f} ms") # Python's own startup comes before STARTUP_TIME
+        root.destroy()
+        raise SystemExit
+    profiler = session_profile = None
+    if args.profile:
+        from paint_profile import Profiler # Opt-in handler timers and the F3 HUD
+        profiler = Profiler(app).install() # Installed first, so recording is not timed
+        if not args.profile.endswith(".json"):
+            import cProfile # Profiles the whole session
+            session_profile = cProfile.Profile()
+    recorder = Recorder(app).install() if args.record else None # Starts capturing input before anything is drawn
+    if replay_log is not None:
+        root.after_idle(replay, replay_log, app) # Replays once the window is up
+    if profiler is not None and session_profile is None:
+        def close_window():
+            """Saves the profile while the canvas it reads still exists, then closes the window."""
+            try:
+                profiler.save(args.profile)
+            finally:
+                root.destroy()
+        root.protocol("WM_DELETE_WINDOW", close_window)
+    if session_profile is not None:
+        session_profile.enable()
     root.mainloop() # Starts the Tkinter event loop, which processes events and keeps the window open
+    if session_profile is not None:
+        session_profile.disable()
+        session_profile.dump_stats(args.profile) # Read with python -m pstats FILE
+    app.close_export_pool() # Lets the export worker processes exit with the app
+    if recorder is not None:
+        recorder.log.save(args.record) # Saves the recorded session after the window is closed
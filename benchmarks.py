@@ -0,0 +1,512 @@
+"""Micro-benchmarks for the Simple Paint App.
+
+Run a single benchmark with, for example:
+
+    python benchmarks.py stroke-modes
+
+Benchmarks named "engine-..." use only the headless document model and run
+anywhere. Benchmarks that drive the real PaintApp need a display. On a machine without
+one, pass --xvfb to start a private Xvfb server for the run, or use
+xvfb-run python benchmarks.py ...
+"""
+import argparse
+import atexit
+import json
+import math
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tkinter as tk
+import tracemalloc
+
+import SimplePaintAppFornewComerstopyhtoncanvas as paint_app
+import paint_format
+import paint_replay
+from paint_profile import Profiler
+from paint_document import Document, Shape, StrokeEngine
+from paint_simplify import StrokeSimplifier, spline_steps
+from paint_spatial import Eraser, GridIndex, segment_hits
+
+
+class FakeEvent:
+    """A minimal stand-in for a Tkinter mouse event, carrying only x and y."""
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def synthetic_stroke(num_points, width=1000, height=650):
+    """Returns a list of (x, y) points tracing a wavy spiral that stays inside the canvas."""
+    points = []
+    for i in range(num_points):
+        t = i / num_points
+        angle = t * 40 * math.pi # Winds around the centre many times
+        radius = 50 + 250 * t + 10 * math.sin(t * 400) # Grows outward with a small wobble
+        points.append((int(width / 2 + radius * math.cos(angle)),
+                       int(height / 2 + radius * math.sin(angle))))
+    return points
+
+
+def start_xvfb(display=":99"):
+    """Starts an Xvfb server for this process unless a display is already available."""
+    if os.environ.get("DISPLAY"):
+        return
+    if shutil.which("Xvfb") is None:
+        raise SystemExit("--xvfb needs the Xvfb program; install it or set DISPLAY")
+    server = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    atexit.register(server.terminate)
+    os.environ["DISPLAY"] = display
+    for _ in range(50): # Waits up to five seconds for the server to accept connections
+        try:
+            tk.Tk().destroy()
+            return
+        except tk.TclError:
+            time.sleep(0.1)
+    raise SystemExit(f"Xvfb did not start on {display}")
+
+
+def create_app(visible=False, **app_options):
+    """Creates a PaintApp; it stays withdrawn unless visible is True, in which case redraws are real."""
+    root = tk.Tk()
+    if not visible:
+        root.withdraw() # Keeps the window off screen while still creating real canvas items
+    app = paint_app.PaintApp(root, **app_options)
+    root.update() # Maps the window and lays out the canvas before anything is measured
+    return root, app
+
+
+def drive_stroke(app, points):
+    """Feeds one stroke through the event handlers and returns the per-motion-event times in seconds."""
+    app.start_action(FakeEvent(*points[0]))
+    timings = []
+    for x, y in points[1:]:
+        start = time.perf_counter()
+        app.perform_action(FakeEvent(x, y))
+        timings.append(time.perf_counter() - start)
+    app.stop_action(FakeEvent(*points[-1]))
+    return timings
+
+
+def bench_stroke_modes(args):
+    """Compares canvas item count and per-event cost of segment and polyline strokes."""
+    points = synthetic_stroke(args.points)
+    print(f"Synthetic stroke: {len(points)} points")
+    print(f"{'mode':<10} {'items':>8} {'mean us':>10} {'p99 us':>10} {'update ms':>10}")
+    for mode in (paint_app.STROKE_MODE_SEGMENTS, paint_app.STROKE_MODE_POLYLINE):
+        root, app = create_app(stroke_mode=mode, simplify_tolerance=0) # Every sample kept, as the modes were compared
+        timings = drive_stroke(app, points)
+        start = time.perf_counter()
+        root.update() # Includes one full redraw of the finished stroke
+        redraw = time.perf_counter() - start
+        item_count = len(app.canvas.find_all())
+        timings.sort()
+        mean = sum(timings) / len(timings)
+        p99 = timings[int(len(timings) * 0.99)]
+        print(f"{mode:<10} {item_count:>8} {mean * 1e6:>10.1f} {p99 * 1e6:>10.1f} {redraw * 1e3:>10.1f}")
+        root.destroy()
+
+
+def bench_engine_strokes(args):
+    """Measures the headless stroke engine on many synthetic strokes, with no display."""
+    points = synthetic_stroke(args.points)
+    document = Document()
+    engine = StrokeEngine(document)
+    start = time.perf_counter()
+    for _ in range(args.strokes):
+        engine.press("draw", points[0][0], points[0][1], "black", 3)
+        for x, y in points[1:]:
+            engine.drag(x, y)
+        engine.release(*points[-1])
+    elapsed = time.perf_counter() - start
+    events = args.strokes * len(points)
+    total_points = sum(shape.point_count() for shape in document.visible_shapes())
+    print(f"{args.strokes} strokes x {len(points)} points: {elapsed * 1e3:.1f} ms, "
+          f"{events / elapsed:,.0f} events/s, {total_points:,} points stored")
+
+
+def bench_stroke_simplify(args):
+    """Compares points kept, spline steps and Tk's tessellated vertices across simplifier tolerances."""
+    rng = random.Random(1)
+    strokes = [[(x + rng.randint(-1, 1), y + rng.randint(-1, 1)) for x, y in synthetic_stroke(args.points)]
+               for _ in range(args.strokes)] # One pixel of jitter, like a real pointer
+    received = sum(len(points) for points in strokes)
+    print(f"{args.strokes} strokes x {args.points} samples, {received:,} samples in total")
+    print(f"{'tolerance':>9} {'kept':>9} {'kept %':>7} {'steps':>6} {'vertices':>10} {'ms/stroke':>10}")
+    for tolerance in (0, 0.5, 1, 2, 4):
+        simplifier = StrokeSimplifier(tolerance)
+        document = Document()
+        engine = StrokeEngine(document, simplifier=simplifier)
+        start = time.perf_counter()
+        for points in strokes:
+            engine.press("draw", points[0][0], points[0][1], "black", 3)
+            for x, y in points[1:]:
+                engine.drag(x, y)
+            engine.release(*points[-1])
+        elapsed = time.perf_counter() - start
+        shapes = document.visible_shapes()
+        steps = [spline_steps(shape.points) for shape in shapes]
+        vertices = sum((shape.point_count() - 1) * step for shape, step in zip(shapes, steps)) # Points Tk draws
+        stats = simplifier.stats()
+        print(f"{tolerance:>9} {stats['points_kept']:>9,} {stats['kept_ratio'] * 100:>7.1f} "
+              f"{sum(steps) / len(steps):>6.1f} {vertices:>10,} {elapsed * 1e3 / len(strokes):>10.2f}")
+    print(f"Fixed splinesteps=12 on every sample: {(received - len(strokes)) * 12:,} vertices")
+
+
+def bench_raster_strokes(args):
+    """Shows that rasterizing a stroke costs the same however many strokes are already drawn (needs NumPy)."""
+    import paint_raster
+    from paint_document import Shape
+
+    points = synthetic_stroke(200)
+    raster = paint_raster.RasterCanvas(1000, 650)
+    print(f"{'strokes drawn':>14} {'ms / stroke':>12}")
+    drawn = 0
+    for checkpoint in (10, 100, 1000, args.strokes):
+        if checkpoint <= drawn:
+            continue
+        start = time.perf_counter()
+        for i in range(drawn, checkpoint):
+            offset = (i * 7) % 100 # Moves each stroke a little so they do not all overlap exactly
+            flat = [c + offset for point in points for c in point]
+            raster.draw_shape(Shape("stroke", "#336699", 3, flat))
+        elapsed = time.perf_counter() - start
+        print(f"{checkpoint:>14} {elapsed * 1e3 / (checkpoint - drawn):>12.2f}")
+        drawn = checkpoint
+    flat = [c for point in synthetic_stroke(args.points) for c in point]
+    start = time.perf_counter()
+    raster.draw_shape(Shape("stroke", "#336699", 3, flat)) # One long stroke, as baked when the mouse is released
+    print(f"One {args.points:,}-point stroke: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+
+def random_scribbles(count, world_size, rng, points_per_stroke=8):
+    """Returns count short random strokes scattered over a square world of the given size."""
+    shapes = []
+    for _ in range(count):
+        x, y = rng.uniform(0, world_size), rng.uniform(0, world_size)
+        points = []
+        for _ in range(points_per_stroke):
+            x += rng.uniform(-15, 15)
+            y += rng.uniform(-15, 15)
+            points.extend((int(x), int(y)))
+        shapes.append(Shape("stroke", "black", rng.randint(1, 8), points))
+    return shapes
+
+
+def percentile(sorted_values, fraction):
+    """Returns the value at the given fraction (0-1) of an already sorted list."""
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def bench_eraser_hit_test(args):
+    """Measures eraser hit-test latency with the grid index against a linear scan at 1k, 10k and 100k strokes."""
+    rng = random.Random(1)
+    print(f"{'strokes':>8} {'grid p50 us':>12} {'grid p99 us':>12} {'scan p50 us':>12} {'hits/query':>11}")
+    for count in (1000, 10000, 100000):
+        world_size = 1000 * math.sqrt(count / 1000) # Keeps the stroke density of 1k strokes on a 1000x1000 page
+        document = Document(index=GridIndex())
+        document.commit(random_scribbles(count, world_size, rng))
+        eraser = Eraser(document)
+        sweeps = []
+        for _ in range(args.queries):
+            x, y = rng.uniform(0, world_size), rng.uniform(0, world_size)
+            sweeps.append((x, y, x + rng.uniform(-20, 20), y + rng.uniform(-20, 20), 8))
+
+        grid_times = []
+        total_hits = 0
+        for sweep in sweeps:
+            start = time.perf_counter()
+            total_hits += len(eraser.find(*sweep))
+            grid_times.append(time.perf_counter() - start)
+        grid_times.sort()
+
+        boxes = list(document.index.boxes.items())
+        scan_times = []
+        for sweep in sweeps[:max(args.queries // 20, 5)]: # A linear scan is slow; a few queries are enough
+            x0, y0, x1, y1, radius = sweep
+            left, top = min(x0, x1) - radius, min(y0, y1) - radius
+            right, bottom = max(x0, x1) + radius, max(y0, y1) + radius
+            start = time.perf_counter()
+            [shape for shape, box in boxes # Checks every bounding box, then the exact outline
+             if box[0] <= right and box[2] >= left and box[1] <= bottom and box[3] >= top
+             and any(segment_hits(shape, *sweep))]
+            scan_times.append(time.perf_counter() - start)
+        scan_times.sort()
+
+        print(f"{count:>8} {percentile(grid_times, 0.5) * 1e6:>12.1f} {percentile(grid_times, 0.99) * 1e6:>12.1f} "
+              f"{percentile(scan_times, 0.5) * 1e6:>12.1f} {total_hits / len(sweeps):>11.2f}")
+
+
+def synthetic_drag(rng, steps, width=1000, height=650):
+    """Returns the positions of one drag: a press point followed by steps wandering motion positions."""
+    x, y = rng.randint(50, width // 2), rng.randint(50, height // 2)
+    positions = [(x, y)]
+    dx, dy = rng.uniform(1, 6), rng.uniform(1, 6)
+    for _ in range(steps):
+        x = min(max(x + dx + rng.uniform(-2, 2), 0), width)
+        y = min(max(y + dy + rng.uniform(-2, 2), 0), height)
+        positions.append((int(x), int(y)))
+    return positions
+
+
+def bench_preview_drag(args):
+    """Drives synthetic shape drags through PaintApp and reports per-event latency percentiles, redraw included."""
+    rng = random.Random(1)
+    drags = [synthetic_drag(rng, args.steps) for _ in range(args.strokes)]
+    print(f"{args.strokes} drags x {args.steps} motion events per shape mode")
+    print(f"{'mode':<10} {'p50 us':>9} {'p90 us':>9} {'p99 us':>9} {'max us':>9} {'items':>7}")
+    for mode, select in (("rectangle", "set_rectangle_mode"), ("circle", "set_oval_mode"), ("line", "set_line_mode")):
+        root, app = create_app(visible=True, input_rate=None) # Handlers run per event, as under a slow mouse
+        getattr(app, select)()
+        timings = []
+        for positions in drags:
+            app.start_action(FakeEvent(*positions[0]))
+            for x, y in positions[1:]:
+                start = time.perf_counter()
+                app.perform_action(FakeEvent(x, y))
+                root.update_idletasks() # Includes the canvas redraw caused by the event
+                timings.append(time.perf_counter() - start)
+            app.stop_action(FakeEvent(*positions[-1]))
+            root.update_idletasks()
+        timings.sort()
+        print(f"{mode:<10} {percentile(timings, 0.5) * 1e6:>9.1f} {percentile(timings, 0.9) * 1e6:>9.1f} "
+              f"{percentile(timings, 0.99) * 1e6:>9.1f} {timings[-1] * 1e6:>9.1f} "
+              f"{len(app.canvas.find_all()):>7}")
+        root.destroy()
+
+
+def save_json(path, shapes):
+    """The naive alternative to the binary format: one JSON object per shape with a list of points."""
+    with open(path, "w") as stream:
+        json.dump([{"kind": shape.kind, "color": shape.color, "width": shape.width,
+                    "points": shape.points.tolist()} for shape in shapes], stream)
+
+
+def load_json(path):
+    with open(path) as stream:
+        return [Shape(item["kind"], item["color"], item["width"], item["points"]) for item in json.load(stream)]
+
+
+def bench_format_io(args):
+    """Compares saving and loading the binary drawing format against a naive JSON dump."""
+    rng = random.Random(1)
+    shapes = random_scribbles(args.strokes, 1000, rng, points_per_stroke=args.points)
+    total_points = sum(shape.point_count() for shape in shapes)
+    print(f"{len(shapes)} strokes, {total_points:,} points")
+    print(f"{'format':<8} {'size KB':>10} {'save ms':>9} {'open ms':>9} {'load ms':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        binary_path = os.path.join(folder, "drawing" + paint_format.DRAWING_EXTENSION)
+        start = time.perf_counter()
+        paint_format.save_drawing(binary_path, shapes)
+        save_time = time.perf_counter() - start
+        start = time.perf_counter()
+        with paint_format.DrawingFile(binary_path): # Reads the header and tables only
+            open_time = time.perf_counter() - start
+        start = time.perf_counter()
+        paint_format.load_drawing(binary_path)
+        load_time = time.perf_counter() - start
+        print(f"{'binary':<8} {os.path.getsize(binary_path) / 1024:>10.1f} {save_time * 1e3:>9.1f} "
+              f"{open_time * 1e3:>9.2f} {load_time * 1e3:>9.1f}")
+
+        json_path = os.path.join(folder, "drawing.json")
+        start = time.perf_counter()
+        save_json(json_path, shapes)
+        save_time = time.perf_counter() - start
+        start = time.perf_counter()
+        load_json(json_path)
+        load_time = time.perf_counter() - start
+        print(f"{'json':<8} {os.path.getsize(json_path) / 1024:>10.1f} {save_time * 1e3:>9.1f} "
+              f"{'-':>9} {load_time * 1e3:>9.1f}") # JSON cannot be opened without parsing all of it
+
+
+def replay_target(args):
+    """Returns (target, cleanup) for the replay benchmark: a HeadlessSession or a real PaintApp."""
+    if args.target == "app":
+        root, app = create_app(visible=True, input_rate=None)
+        return app, root.destroy
+    session = paint_replay.HeadlessSession(history_steps=paint_app.DEFAULT_HISTORY_STEPS,
+                                           history_bytes=paint_app.DEFAULT_HISTORY_BYTES,
+                                           simplify_tolerance=paint_app.DEFAULT_SIMPLIFY_TOLERANCE)
+    return session, lambda: None
+
+
+def bench_replay(args):
+    """Replays canned input logs at full speed and reports throughput, handler latency and peak memory."""
+    names = sorted(paint_replay.WORKLOADS) if args.workload == "all" else [args.workload]
+    print(f"Target: {args.target}")
+    print(f"{'workload':<14} {'events':>8} {'events/s':>10} {'p50 us':>9} {'p99 us':>9} {'peak MB':>9}")
+    for name in names:
+        log = paint_replay.build_workload(name, scale=args.scale)
+        target, cleanup = replay_target(args)
+        timings = []
+        start = time.perf_counter()
+        count = paint_replay.replay(log, target, timings=timings)
+        elapsed = time.perf_counter() - start
+        cleanup()
+        timings.sort()
+
+        target, cleanup = replay_target(args) # A second, untimed run: tracemalloc slows everything down
+        tracemalloc.start()
+        paint_replay.replay(log, target)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        cleanup()
+        print(f"{name:<14} {count:>8} {count / elapsed:>10.0f} {percentile(timings, 0.5) * 1e6:>9.1f} "
+              f"{percentile(timings, 0.99) * 1e6:>9.1f} {peak / 2 ** 20:>9.1f}")
+
+
+def bench_startup(args):
+    """Launches the app with --bench-startup again and again and reports how long its window takes to appear."""
+    script = os.path.abspath(paint_app.__file__)
+    runs = {}
+    for _ in range(args.launches):
+        output = subprocess.run([sys.executable, script, "--bench-startup"], capture_output=True, text=True,
+                                check=True).stdout
+        for label, value in re.findall(r"([a-z ]+) ([\d.]+) ms", output):
+            runs.setdefault(label.strip(), []).append(float(value))
+    print(f"{'phase':<14} {'min ms':>8} {'p50 ms':>8} {'max ms':>8}")
+    for label, values in runs.items():
+        values.sort()
+        print(f"{label:<14} {values[0]:>8.1f} {percentile(values, 0.5):>8.1f} {values[-1]:>8.1f}")
+
+
+def bench_profile_overhead(args):
+    """Replays canned input logs with and without the Profiler installed and reports what its timers cost."""
+    names = sorted(paint_replay.WORKLOADS) if args.workload == "all" else [args.workload]
+    print(f"Target: {args.target}")
+    print(f"{'workload':<14} {'calls':>8} {'plain s':>9} {'profiled s':>11} {'overhead':>9} {'ns/call':>8}")
+    for name in names:
+        log = paint_replay.build_workload(name, scale=args.scale)
+        target, cleanup = replay_target(args)
+        start = time.perf_counter()
+        paint_replay.replay(log, target)
+        plain = time.perf_counter() - start
+        cleanup()
+
+        target, cleanup = replay_target(args)
+        profiler = Profiler(target).install()
+        start = time.perf_counter()
+        paint_replay.replay(log, target)
+        profiled = time.perf_counter() - start
+        profiler.uninstall()
+        cleanup()
+        calls = sum(stats.calls for stats in profiler.handlers.values())
+        print(f"{name:<14} {calls:>8} {plain:>9.3f} {profiled:>11.3f} {(profiled / plain - 1) * 100:>8.1f}% "
+              f"{(profiled - plain) / calls * 1e9:>8.0f}")
+
+
+def bench_tile_pan(args):
+    """Pans a window across a large drawing through the tile cache and compares it with redrawing the whole view (needs NumPy)."""
+    import paint_raster
+    import paint_tiles
+
+    rng = random.Random(1)
+    view_width, view_height = 1100, 750
+    world_size = 1000 * math.sqrt(args.strokes / 100) # About 100 strokes per 1000x1000 pixels
+    document = Document(index=GridIndex())
+    document.commit(random_scribbles(args.strokes, world_size, rng, points_per_stroke=30))
+    print(f"{args.strokes:,} strokes, {args.strokes * 29:,} segments over {world_size:.0f} x {world_size:.0f} px")
+    cache = paint_tiles.TileCache(document.shapes_in_box)
+    step = 40 # Pixels the view moves per frame
+    path = [(i * step, world_size / 3) for i in range(args.steps)]
+    path += path[::-1] # Pans back over the same tiles, which are now cached
+    timings = []
+    for x, y in path:
+        start = time.perf_counter()
+        keys = cache.visible_keys(1.0, x, y, x + view_width, y + view_height)
+        for key in keys:
+            tile = cache.get(key)
+            if tile.stale:
+                tile.raster.to_ppm() # What the app hands to the tile's PhotoImage
+                tile.stale = False
+        cache.trim(keep=keys)
+        timings.append(time.perf_counter() - start)
+    outward, back = sorted(timings[:args.steps]), sorted(timings[args.steps:])
+
+    full = []
+    raster = paint_raster.RasterCanvas(view_width, view_height)
+    for x, y in path[:args.steps:10]: # Every tenth frame is plenty: each one costs the same
+        start = time.perf_counter()
+        raster.origin = (x, y)
+        raster.render(document.shapes_in_box(x, y, x + view_width, y + view_height))
+        raster.to_ppm()
+        full.append(time.perf_counter() - start)
+    full.sort()
+    print(f"{'frames':<22} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for label, values in (("tiles, first pass", outward), ("tiles, panning back", back), ("full view redraw", full)):
+        print(f"{label:<22} {percentile(values, 0.5) * 1e3:>8.2f} {percentile(values, 0.99) * 1e3:>8.2f} "
+              f"{values[-1] * 1e3:>8.2f}")
+    print(cache.stats())
+
+
+def bench_export(args):
+    """Times a banded PNG export inline and on process pools of 1 to N workers (needs NumPy)."""
+    import paint_export
+
+    rng = random.Random(1)
+    world_size = 1000 * math.sqrt(args.strokes / 1000) # About 1000 strokes per 1000x1000 pixels
+    shapes = random_scribbles(args.strokes, world_size, rng, points_per_stroke=30)
+    box = (0, 0, int(world_size), int(world_size))
+    print(f"{args.strokes:,} strokes, {box[2]} x {box[3]} px export, {os.cpu_count()} CPUs")
+    start = time.perf_counter()
+    reference, thumbnails = paint_export.ExportJob(shapes, box).finish()
+    inline = time.perf_counter() - start
+    print(f"{'workers':<8} {'seconds':>8} {'speedup':>8}")
+    print(f"{'inline':<8} {inline:>8.2f} {1:>8.2f}")
+    counts = sorted({1, 2, 4, 8, 16, os.cpu_count()} & set(range(1, (args.workers or os.cpu_count()) + 1)))
+    for workers in counts:
+        pool = paint_export.create_pool(workers)
+        paint_export.ExportJob(shapes[:10], (0, 0, 64, 64 * workers), executor=pool, band_height=64).finish() # Starts every worker
+        start = time.perf_counter()
+        png, thumbnails = paint_export.ExportJob(shapes, box, executor=pool).finish()
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+        if png != reference:
+            raise SystemExit(f"export with {workers} workers differs from the inline export")
+        print(f"{workers:<8} {elapsed:>8.2f} {inline / elapsed:>8.2f}")
+
+
+BENCHMARKS = {
+    "export": bench_export,
+    "tile-pan": bench_tile_pan,
+    "replay": bench_replay,
+    "profile-overhead": bench_profile_overhead,
+    "startup": bench_startup,
+    "format-io": bench_format_io,
+    "preview-drag": bench_preview_drag,
+    "eraser-hit-test": bench_eraser_hit_test,
+    "raster-strokes": bench_raster_strokes,
+    "engine-strokes": bench_engine_strokes,
+    "stroke-simplify": bench_stroke_simplify,
+    "stroke-modes": bench_stroke_modes,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simple Paint App benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="which benchmark to run")
+    parser.add_argument("--points", type=int, default=10000, help="number of points in synthetic strokes")
+    parser.add_argument("--strokes", type=int, default=100, help="number of strokes in multi-stroke benchmarks")
+    parser.add_argument("--queries", type=int, default=1000, help="number of queries in lookup benchmarks")
+    parser.add_argument("--steps", type=int, default=200, help="motion events per synthetic drag")
+    parser.add_argument("--workload", choices=["all"] + sorted(paint_replay.WORKLOADS), default="all",
+                        help="canned input log for the replay benchmarks")
+    parser.add_argument("--scale", type=int, default=1, help="size multiplier for replay workloads")
+    parser.add_argument("--target", choices=["headless", "app"], default="headless",
+                        help="replay into the document model alone or into a real PaintApp (needs a display)")
+    parser.add_argument("--launches", type=int, default=10, help="app launches in the startup benchmark")
+    parser.add_argument("--workers", type=int, default=None, help="most worker processes in the export benchmark")
+    parser.add_argument("--xvfb", action="store_true", help="start a private Xvfb server if there is no display")
+    args = parser.parse_args()
+    if args.xvfb:
+        start_xvfb()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
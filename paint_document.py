@@ -0,0 +1,376 @@
+"""Headless drawing model for the Simple Paint App.
+
+Everything in this module is plain Python with no tkinter import, so drawings
+can be built, replayed, profiled and tested without a display. The Tk canvas in
+the main app only mirrors what this model holds.
+"""
+import sys
+from array import array
+
+# Kinds of shapes a document can hold
+KIND_STROKE = "stroke"       # A freehand pencil stroke through many points
+KIND_ERASE = "erase"         # A freehand eraser stroke through many points
+KIND_RECTANGLE = "rectangle" # An axis-aligned rectangle outline given by two corners
+KIND_OVAL = "oval"           # An oval outline inscribed in the box given by two corners
+KIND_LINE = "line"           # A straight line between two points
+
+FREEHAND_KINDS = (KIND_STROKE, KIND_ERASE)
+
+# Maps the app's drawing modes to the kind of shape each one produces
+MODE_KINDS = {
+    "draw": KIND_STROKE,
+    "erase": KIND_ERASE,
+    "rectangle": KIND_RECTANGLE,
+    "circle": KIND_OVAL,
+    "line": KIND_LINE,
+}
+
+POINT_TYPECODE = "i" # Points are stored as flat signed int arrays: x0, y0, x1, y1, ...
+
+
+class Shape:
+    """One stroke or shape: its kind, style and a compact flat buffer of points."""
+    __slots__ = ("kind", "color", "width", "points", "order")
+
+    def __init__(self, kind, color, width, points=()):
+        self.kind = kind                                # One of the KIND_* constants
+        self.color = color                              # Tk color string, e.g. "black" or "#ff0000"
+        self.width = width                              # Line thickness in pixels
+        self.points = array(POINT_TYPECODE, points)     # Flat x, y coordinate buffer
+        self.order = None                               # Painting-order key, assigned when committed
+
+    def __repr__(self):
+        return f"Shape({self.kind!r}, {self.color!r}, {self.width}, points={self.point_count()})"
+
+    def append_point(self, x, y):
+        """Adds a point to the end of a freehand shape."""
+        self.points.append(x)
+        self.points.append(y)
+
+    def set_last(self, x, y):
+        """Moves the last point of a freehand shape."""
+        self.points[-2] = x
+        self.points[-1] = y
+
+    def set_end(self, x, y):
+        """Moves the second point of a two-point shape (rectangle, oval or line)."""
+        self.points[2] = x
+        self.points[3] = y
+
+    def point_count(self):
+        """Returns the number of (x, y) points in the shape."""
+        return len(self.points) // 2
+
+    def bounds(self):
+        """Returns the (x1, y1, x2, y2) box covering the shape, including half its line width."""
+        xs = self.points[0::2]
+        ys = self.points[1::2]
+        pad = (self.width + 1) // 2 # Round caps and outlines stick out by half the width
+        return min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad
+
+    def nbytes(self):
+        """Returns the approximate memory held by the shape and its point buffer, in bytes."""
+        return sys.getsizeof(self) + sys.getsizeof(self.points)
+
+
+class Step:
+    """One undoable user action: the shapes it added and the shapes it removed."""
+    __slots__ = ("added", "removed", "nbytes")
+
+    def __init__(self, added=(), removed=()):
+        self.added = list(added)     # Shapes that become visible when the step is applied
+        self.removed = list(removed) # Shapes that become hidden when the step is applied
+        self.nbytes = 0              # Memory the step keeps alive, measured when it is recorded
+
+    def __repr__(self):
+        return f"Step(added={self.added!r}, removed={self.removed!r})"
+
+    def __bool__(self):
+        return bool(self.added or self.removed)
+
+
+class Document:
+    """An ordered drawing plus its undo/redo history.
+
+    Each history step records the shapes one user action added and removed.
+    Steps up to and including history_idx are applied; later steps are undone
+    and can be redone until a new action discards them.
+
+    History is bounded by max_steps and/or max_bytes. When a new step goes
+    over either budget, the oldest steps are flattened into the baked layer:
+    the shapes they added stay visible but can no longer be undone, and the
+    shapes they removed are forgotten. on_bake, if set, is called with each
+    flattened step so a view can free what it kept for undoing it.
+
+    An optional spatial index (see paint_spatial.GridIndex) is kept holding
+    exactly the visible shapes. Every shape gets an order key when committed;
+    sorting by it gives painting order, and pieces split from a shape sort
+    right where the shape was.
+    """
+
+    def __init__(self, background="white", index=None, max_steps=None, max_bytes=None):
+        self.background = background # Color that erasing paints with
+        self.index = index           # Optional spatial index of the visible shapes
+        self.history = []            # A list of Steps, one per user action
+        self.history_idx = -1        # Index of the last applied step
+        self.next_order = 0          # Order key for the next newly drawn shape
+        self.max_steps = max_steps   # Most steps kept in history, or None for no limit
+        self.max_bytes = max_bytes   # Most memory kept alive by history, or None for no limit
+        self.history_bytes = 0       # Memory currently kept alive by the steps in history
+        self.baked = {}              # Visible shapes whose steps were flattened, in insertion order
+        self.baked_bytes = 0         # Memory held by the baked shapes
+        self.on_bake = None          # Optional function called with each Step as it is flattened
+
+    def visible_shapes(self):
+        """Returns every currently drawn shape in painting order."""
+        if self.index is not None:
+            return sorted(self.index, key=shape_order)
+        visible = dict(self.baked)
+        for step in self.history[:self.history_idx + 1]:
+            for shape in step.removed:
+                visible.pop(shape, None)
+            for shape in step.added:
+                visible[shape] = True
+        return sorted(visible, key=shape_order)
+
+    def shapes_in_box(self, x1, y1, x2, y2):
+        """Returns the visible shapes whose bounds overlap the box, in painting order."""
+        if self.index is not None:
+            return sorted(self.index.query(x1, y1, x2, y2), key=shape_order)
+        return [shape for shape in self.visible_shapes()
+                if boxes_overlap(shape.bounds(), (x1, y1, x2, y2))]
+
+    def can_undo(self):
+        return self.history_idx >= 0
+
+    def can_redo(self):
+        return self.history_idx < len(self.history) - 1
+
+    def _show(self, shapes):
+        if self.index is not None:
+            for shape in shapes:
+                self.index.insert(shape)
+
+    def _hide(self, shapes):
+        if self.index is not None:
+            for shape in shapes:
+                self.index.remove(shape)
+
+    def discard_redo(self):
+        """Drops the undone steps and returns them so a view can delete their items."""
+        discarded = self.history[self.history_idx + 1:]
+        del self.history[self.history_idx + 1:]
+        for step in discarded:
+            self.history_bytes -= step.nbytes
+        return discarded
+
+    def commit(self, added, removed=()):
+        """Applies a new history step that adds and removes the given shapes, and returns it."""
+        for shape in added:
+            if shape.order is None:
+                shape.order = (self.next_order,) # New shapes are painted above everything so far
+                self.next_order += 1
+        step = Step(added, removed)
+        self._hide(step.removed)
+        self._show(step.added)
+        return self.record(step)
+
+    def record(self, step):
+        """Adds a step whose changes were already applied (see replace) to the history, and returns it."""
+        self.discard_redo()
+        step.nbytes = sum(shape.nbytes() for shape in step.added) + sum(shape.nbytes() for shape in step.removed)
+        self.history.append(step)
+        self.history_idx = len(self.history) - 1
+        self.history_bytes += step.nbytes
+        self.enforce_budget()
+        return step
+
+    def over_budget(self):
+        """Returns True if history holds more steps or bytes than its budget allows."""
+        return ((self.max_steps is not None and len(self.history) > self.max_steps)
+                or (self.max_bytes is not None and self.history_bytes > self.max_bytes))
+
+    def enforce_budget(self):
+        """Flattens the oldest steps into the baked layer until history fits its budget."""
+        while self.history_idx >= 0 and self.over_budget():
+            self.bake_oldest()
+
+    def bake_oldest(self):
+        """Flattens the oldest history step into the baked layer and returns it."""
+        step = self.history.pop(0)
+        self.history_idx -= 1
+        self.history_bytes -= step.nbytes
+        for shape in step.removed:
+            if self.baked.pop(shape, None) is not None: # Erased shapes can no longer come back
+                self.baked_bytes -= shape.nbytes()
+        for shape in step.added:
+            self.baked[shape] = True
+            self.baked_bytes += shape.nbytes()
+        if self.on_bake is not None:
+            self.on_bake(step)
+        return step
+
+    def memory_usage(self):
+        """Returns a dict describing how many steps and bytes the history and baked layer hold."""
+        return {
+            "undo_steps": self.history_idx + 1,
+            "redo_steps": len(self.history) - self.history_idx - 1,
+            "history_bytes": self.history_bytes,
+            "max_steps": self.max_steps,
+            "max_bytes": self.max_bytes,
+            "baked_shapes": len(self.baked),
+            "baked_bytes": self.baked_bytes,
+        }
+
+    def replace(self, shape, piece_points, kind=None):
+        """Swaps a visible shape for pieces with the same style, one per point list, and returns the pieces.
+
+        The pieces are of the given kind, or of the shape's own kind by default. The
+        change is applied immediately but not recorded; callers collect it in a Step
+        and pass that to record() when the user action ends.
+        """
+        pieces = []
+        for i, points in enumerate(piece_points):
+            piece = Shape(kind or shape.kind, shape.color, shape.width, points)
+            piece.order = shape.order + (i,) # Pieces stay at the split shape's place in painting order
+            pieces.append(piece)
+        self._hide([shape])
+        self._show(pieces)
+        return pieces
+
+    def undo(self):
+        """Moves back one step and returns the step that was reverted, or None."""
+        if not self.can_undo():
+            return None
+        step = self.history[self.history_idx]
+        self.history_idx -= 1
+        self._hide(step.added)
+        self._show(step.removed)
+        return step
+
+    def redo(self):
+        """Moves forward one step and returns the step that was reapplied, or None."""
+        if not self.can_redo():
+            return None
+        self.history_idx += 1
+        step = self.history[self.history_idx]
+        self._hide(step.removed)
+        self._show(step.added)
+        return step
+
+    def clear(self):
+        """Removes every shape and all history."""
+        self.history = []
+        self.history_idx = -1
+        self.history_bytes = 0
+        self.baked = {}
+        self.baked_bytes = 0
+        if self.index is not None:
+            self.index.clear()
+
+
+def shape_order(shape):
+    """Sort key that puts shapes in painting order."""
+    return shape.order
+
+
+def shapes_bounds(shapes):
+    """Returns the (x1, y1, x2, y2) box covering all the given shapes, or None if there are none."""
+    boxes = [shape.bounds() for shape in shapes]
+    if not boxes:
+        return None
+    return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+            max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+
+def boxes_overlap(a, b):
+    """Returns True if two (x1, y1, x2, y2) boxes overlap."""
+    return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
+
+
+class StrokeEngine:
+    """Turns press/drag/release pointer input into shapes in a Document.
+
+    The engine mirrors the app's start_action, perform_action and stop_action
+    handlers but knows nothing about how shapes are displayed.
+
+    Without an eraser, erase mode records KIND_ERASE strokes that paint over the
+    drawing. With an eraser object (see paint_spatial.Eraser), erase mode removes
+    and splits the shapes under the brush instead. With a simplifier object (see
+    paint_simplify.StrokeSimplifier), freehand strokes keep only the samples they need.
+    """
+
+    def __init__(self, document, eraser=None, simplifier=None):
+        self.document = document
+        self.eraser = eraser # Optional object that deletes and splits shapes under the brush
+        self.simplifier = simplifier # Optional object that drops redundant freehand samples
+        self.active = None   # The shape being drawn between press and release
+        self.moved = False   # Whether the pointer was dragged since the press
+        self.extended = False # Whether the last drag added a point, rather than moving the stroke's end
+        self.erasing = None  # The Step collecting an eraser drag's changes, while one is in progress
+        self.last_x = None   # The previous pointer position of an eraser drag
+        self.last_y = None
+        self.erase_radius = 0
+
+    def press(self, mode, x, y, color, width):
+        """Starts a new shape at (x, y) and returns the undone steps that were discarded."""
+        discarded = self.document.discard_redo() # Drawing after an undo discards the redo branch
+        kind = MODE_KINDS[mode]
+        self.moved = False
+        if kind == KIND_ERASE and self.eraser is not None:
+            self.erasing = Step()
+            self.last_x, self.last_y = x, y
+            self.erase_radius = width # Matches the eraser size indicator drawn around the pointer
+            return discarded
+        if kind == KIND_ERASE:
+            color = self.document.background # The eraser paints with the background color
+        if kind in FREEHAND_KINDS:
+            self.active = Shape(kind, color, width, (x, y))
+            if self.simplifier is not None:
+                self.simplifier.start(self.active)
+        else:
+            self.active = Shape(kind, color, width, (x, y, x, y)) # Both corners start at the press point
+        return discarded
+
+    def drag(self, x, y):
+        """Extends or reshapes the active shape and returns it, or None if nothing is being drawn."""
+        shape = self.active
+        if shape is None:
+            return None
+        if shape.kind not in FREEHAND_KINDS:
+            shape.set_end(x, y)
+        elif self.simplifier is not None:
+            self.extended = self.simplifier.add(shape, x, y)
+        else:
+            shape.append_point(x, y)
+            self.extended = True
+        self.moved = True
+        return shape
+
+    def erase_to(self, x, y):
+        """Erases along the brush sweep to (x, y) and returns this event's (shape, pieces) replacements."""
+        changes = self.eraser.sweep(self.last_x, self.last_y, x, y, self.erase_radius)
+        step = self.erasing
+        for shape, pieces in changes:
+            if shape in step.added:
+                step.added.remove(shape) # A piece made earlier in this drag was never committed
+            else:
+                step.removed.append(shape)
+            step.added.extend(pieces)
+        self.last_x, self.last_y = x, y
+        self.moved = True
+        return changes
+
+    def release(self, x, y):
+        """Finishes the active shape or eraser drag and returns its committed Step, or None if nothing changed."""
+        if self.erasing is not None:
+            step = self.erasing
+            self.erasing = None
+            return self.document.record(step) if step else None
+        shape = self.active
+        self.active = None
+        if shape is None or not self.moved: # A click without a drag draws nothing
+            return None
+        if shape.kind not in FREEHAND_KINDS:
+            shape.set_end(x, y)
+        return self.document.commit([shape])
@@ -0,0 +1,221 @@
+"""Background PNG export for the Simple Paint App.
+
+An export starts by snapshotting the visible shapes into an immutable list,
+so the user can keep drawing while it runs. The export area is cut into
+horizontal bands; each band is rasterized, deflate-compressed and summed
+into thumbnail blocks on its own, in a concurrent.futures process pool when
+one is given. The parent only stitches the small results: the compressed
+bands are joined into a single PNG data stream, the way pigz compresses in
+parallel, and the block sums are added up into the thumbnails. Jobs never
+call Tk; the app polls them with root.after(). Needs NumPy, like paint_raster.
+"""
+import multiprocessing
+import os
+import struct
+import zlib
+from array import array
+from collections import namedtuple
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor # BrokenExecutor: a worker process died
+
+import numpy as np
+
+from paint_document import POINT_TYPECODE, Shape
+from paint_raster import RasterCanvas, encode_png, png_chunk, png_header, png_scanlines
+
+DEFAULT_BAND_HEIGHT = 128    # Rows rasterized and compressed per task
+DEFAULT_COMPRESSION = 6      # zlib level of the PNG data
+THUMBNAIL_SIZES = (256, 64)  # Longest side, in pixels, of each thumbnail written next to an export
+ADLER_BASE = 65521
+
+
+# An immutable copy of a shape that can be sent to a worker process; points are the raw point buffer
+ShapeRecord = namedtuple("ShapeRecord", "kind color width bounds points")
+
+
+def snapshot(shapes):
+    """Returns an immutable copy of shapes, in painting order, that later edits cannot change."""
+    return tuple(ShapeRecord(shape.kind, shape.color, shape.width, shape.bounds(), shape.points.tobytes())
+                 for shape in shapes)
+
+
+def to_shape(record):
+    """Rebuilds a Shape from a ShapeRecord."""
+    shape = Shape(record.kind, record.color, record.width)
+    shape.points = array(POINT_TYPECODE)
+    shape.points.frombytes(record.points)
+    return shape
+
+
+def adler32_combine(adler1, adler2, length2):
+    """Returns the Adler-32 of two byte strings joined, from their checksums and the second one's length."""
+    remainder = length2 % ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (remainder * sum1) % ADLER_BASE
+    sum1 = (sum1 + (adler2 & 0xFFFF) + ADLER_BASE - 1) % ADLER_BASE
+    sum2 = (sum2 + (adler1 >> 16) + (adler2 >> 16) + ADLER_BASE - remainder) % ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+def render_band(records, left, top, width, height, background, transparent, compression,
+                first_row, image_height, factors):
+    """Rasterizes one band of the export and compresses its scanlines; runs in a worker process.
+
+    Returns (compressed data, Adler-32 of the raw data, length of the raw data, thumbnail sums).
+    The compressed data is a raw deflate stream ended with a sync flush, so bands can be
+    joined end to end. The thumbnail sums hold block_sums() for each shrink factor in
+    factors; first_row is the band's first row in an image image_height rows tall.
+    """
+    raster = RasterCanvas(width, height, background=background)
+    raster.origin = (left, top)
+    for record in records:
+        raster.draw_shape(to_shape(record))
+    pixels = raster.pixels if transparent else raster.composite()
+    data = png_scanlines(pixels)
+    compressor = zlib.compressobj(compression, zlib.DEFLATED, -15) # Raw deflate: the zlib header is written once
+    compressed = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    sums = [block_sums(pixels, first_row, image_height, factor) for factor in factors]
+    return compressed, zlib.adler32(data), len(data), sums
+
+
+def shrink_factor(width, height, size):
+    """Returns the block edge that shrinks a width x height image so its longest side is at most size."""
+    return max(1, -(-max(height, width) // size)) # Ceiling division
+
+
+def thumbnail(pixels, size):
+    """Shrinks an (height, width, channels) image so its longest side is at most size, averaging pixel blocks."""
+    height, width, channels = pixels.shape
+    factor = shrink_factor(width, height, size)
+    rows, columns = -(-height // factor), -(-width // factor)
+    padded = np.empty((rows * factor, columns * factor, channels), dtype=np.uint16)
+    padded[:height, :width] = pixels
+    padded[height:, :width] = pixels[-1:] # Repeats the edge so partial blocks are not darkened
+    padded[:, width:] = padded[:, width - 1:width]
+    blocks = padded.reshape(rows, factor, columns, factor, channels)
+    return ((blocks.sum(axis=(1, 3)) + factor * factor // 2) // (factor * factor)).astype(np.uint8)
+
+
+def block_sums(pixels, first_row, image_height, factor):
+    """Sums one band of an image over the factor x factor blocks that thumbnail() averages.
+
+    first_row is the band's first row in the image. Returns (index of the first block row,
+    sums); a block row shared with a neighbouring band holds only this band's part. Edge
+    pixels are repeated into partial blocks the way thumbnail() does: the right column in
+    every band and the bottom row in the last one.
+    """
+    height, width, channels = pixels.shape
+    columns = -(-width // factor)
+    first_block = first_row // factor
+    above = first_row - first_block * factor # Rows of the first block that belong to the band above
+    if first_row + height == image_height: # The last band fills the image's last block row
+        rows = -(-image_height // factor) - first_block
+    else:
+        rows = -(-(above + height) // factor)
+    padded = np.zeros((rows * factor, columns * factor, channels), dtype=np.uint32)
+    padded[above:above + height, :width] = pixels
+    if first_row + height == image_height:
+        padded[above + height:, :width] = pixels[-1:]
+    padded[:, width:] = padded[:, width - 1:width]
+    return first_block, padded.reshape(rows, factor, columns, factor, channels).sum(axis=(1, 3), dtype=np.uint32)
+
+
+def thumbnail_path(path, size):
+    """Returns the file name of a thumbnail saved next to path, e.g. drawing.thumb256.png."""
+    root, extension = os.path.splitext(path)
+    return f"{root}.thumb{size}{extension or '.png'}"
+
+
+def create_pool(workers=None):
+    """Returns a process pool for export jobs; workers defaults to the number of CPUs.
+
+    Workers are spawned rather than forked, so they never inherit the app's Tk connection.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+class ExportJob:
+    """One PNG export of the area box, rendered band by band, in a process pool or inline."""
+
+    def __init__(self, shapes, box, executor=None, background="white", transparent=False,
+                 band_height=DEFAULT_BAND_HEIGHT, compression=DEFAULT_COMPRESSION, thumbnail_sizes=THUMBNAIL_SIZES):
+        self.records = snapshot(shapes)
+        self.left, self.top, right, bottom = (int(value) for value in box)
+        self.width = right - self.left
+        self.height = bottom - self.top
+        self.channels = 4 if transparent else 3
+        self.compression = compression
+        self.thumbnail_sizes = thumbnail_sizes
+        self.factors = [shrink_factor(self.width, self.height, size) for size in thumbnail_sizes]
+        self.results = [] # One entry per band: a Future, or the finished tuple when run inline
+        band_records = [[] for _ in range(0, self.height, band_height)] # The shapes each band has to draw
+        for record in self.records:
+            x1, y1, x2, y2 = record.bounds
+            if x2 < self.left or x1 > right:
+                continue
+            first = max(0, (y1 - self.top) // band_height)
+            last = min(len(band_records) - 1, (y2 - self.top) // band_height)
+            for index in range(first, last + 1):
+                band_records[index].append(record)
+        for index, records in enumerate(band_records):
+            band_top = self.top + index * band_height
+            band_height_here = min(band_height, bottom - band_top)
+            args = (records, self.left, band_top, self.width, band_height_here, background, transparent, compression,
+                    band_top - self.top, self.height, self.factors)
+            if executor is None:
+                self.results.append(render_band(*args))
+            else:
+                self.results.append(executor.submit(render_band, *args))
+
+    def progress(self):
+        """Returns the fraction of bands finished, from 0 to 1."""
+        finished = sum(1 for result in self.results if isinstance(result, tuple) or result.done())
+        return finished / len(self.results) if self.results else 1.0
+
+    def done(self):
+        return self.progress() == 1.0
+
+    def cancel(self):
+        """Cancels the bands that have not started; the job cannot be finished afterwards."""
+        for result in self.results:
+            if not isinstance(result, tuple):
+                result.cancel()
+
+    def bands(self):
+        """Returns the finished band tuples in order, waiting for any still running."""
+        return [result if isinstance(result, tuple) else result.result() for result in self.results]
+
+    def finish(self):
+        """Stitches the bands and returns (PNG bytes, {size: thumbnail PNG bytes}).
+
+        Only joins and adds up what the bands returned, so it is cheap enough to run on the UI thread.
+        """
+        bands = self.bands()
+        adler = 1 # Adler-32 of no data
+        for compressed, band_adler, length, sums in bands:
+            adler = adler32_combine(adler, band_adler, length)
+        stream = (b"\x78\x9c" # zlib header: deflate with a 32K window
+                  + b"".join(compressed for compressed, band_adler, length, sums in bands)
+                  + zlib.compressobj(self.compression, zlib.DEFLATED, -15).flush() # An empty final block
+                  + struct.pack(">I", adler))
+        png = png_header(self.width, self.height, self.channels) + png_chunk(b"IDAT", stream) + png_chunk(b"IEND", b"")
+        thumbnails = {}
+        for index, (size, factor) in enumerate(zip(self.thumbnail_sizes, self.factors)):
+            totals = np.zeros((-(-self.height // factor), -(-self.width // factor), self.channels), dtype=np.uint32)
+            for compressed, band_adler, length, sums in bands:
+                first_block, band_sums = sums[index]
+                totals[first_block:first_block + len(band_sums)] += band_sums
+            area = factor * factor
+            thumbnails[size] = encode_png(((totals + area // 2) // area).astype(np.uint8), self.compression)
+        return png, thumbnails
+
+
+def write_export(path, png, thumbnails):
+    """Writes an export's PNG to path and each thumbnail next to it; returns the paths written."""
+    written = [path]
+    with open(path, "wb") as png_file:
+        png_file.write(png)
+    for size, data in thumbnails.items():
+        written.append(thumbnail_path(path, size))
+        with open(written[-1], "wb") as png_file:
+            png_file.write(data)
+    return written
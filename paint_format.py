@@ -0,0 +1,191 @@
+"""Compact binary drawing files for the Simple Paint App.
+
+Layout of a version 1 file (all numbers little-endian):
+
+    header       magic b"SPDR", version, flags, shape count,
+                 color table offset, shape table offset
+    point data   one packed block per shape, written as the shape is saved
+    color table  every distinct color once, as length-prefixed UTF-8
+    shape table  one fixed-size record per shape: kind, encoding, width,
+                 color index, point count and offset of its point block
+
+Point blocks are int16 when every coordinate fits, float32 otherwise. Shapes
+are written one at a time and the tables are appended at the end, so saving
+never holds a second copy of the drawing in memory. DrawingFile opens a file
+with mmap and reads only the header and tables up front; point blocks are
+decoded when a shape is asked for.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from paint_document import KIND_ERASE, KIND_LINE, KIND_OVAL, KIND_RECTANGLE, KIND_STROKE, Shape
+
+MAGIC = b"SPDR"
+VERSION = 1
+DRAWING_EXTENSION = ".spdr"
+
+HEADER = struct.Struct("<4sHHIQQ")   # magic, version, flags, shape count, color table offset, shape table offset
+RECORD = struct.Struct("<BBHIIQ")    # kind, encoding, width, color index, point count, point data offset
+COLOR_LENGTH = struct.Struct("<H")
+
+KIND_CODES = {KIND_STROKE: 0, KIND_ERASE: 1, KIND_RECTANGLE: 2, KIND_OVAL: 3, KIND_LINE: 4}
+CODE_KINDS = {code: kind for kind, code in KIND_CODES.items()}
+
+ENCODING_INT16 = 0
+ENCODING_FLOAT32 = 1
+ENCODING_TYPECODES = {ENCODING_INT16: "h", ENCODING_FLOAT32: "f"}
+ENCODING_ITEMSIZES = {encoding: array(typecode).itemsize for encoding, typecode in ENCODING_TYPECODES.items()}
+
+SWAP_BYTES = sys.byteorder != "little" # The file is little-endian; arrays use the machine's byte order
+
+
+class DrawingFormatError(ValueError):
+    """Raised when a file is not a drawing this version can read."""
+
+
+def pack_points(points):
+    """Returns (encoding, bytes) for a flat point buffer, using int16 when every coordinate fits."""
+    try:
+        packed = array("h", points)
+        encoding = ENCODING_INT16
+    except OverflowError: # A coordinate is outside the int16 range
+        packed = array("f", points)
+        encoding = ENCODING_FLOAT32
+    if SWAP_BYTES:
+        packed.byteswap()
+    return encoding, packed.tobytes()
+
+
+def save_drawing(path, shapes, flags=0):
+    """Streams shapes to a drawing file at path, shape by shape, and returns the number written.
+
+    The file is written next to path and moved into place at the end, so a failed
+    save never leaves a half-written drawing behind.
+    """
+    temp_path = path + ".tmp"
+    records = []
+    colors = {} # Maps each color to its index in the color table
+    try:
+        with open(temp_path, "wb") as stream:
+            stream.write(HEADER.pack(MAGIC, VERSION, flags, 0, 0, 0)) # Patched once the tables are written
+            for shape in shapes:
+                encoding, data = pack_points(shape.points)
+                color_index = colors.setdefault(shape.color, len(colors))
+                records.append(RECORD.pack(KIND_CODES[shape.kind], encoding, shape.width, color_index,
+                                           shape.point_count(), stream.tell()))
+                stream.write(data)
+            color_offset = stream.tell()
+            for color in colors: # Dicts keep insertion order, which matches the indexes handed out
+                encoded = color.encode("utf-8")
+                stream.write(COLOR_LENGTH.pack(len(encoded)))
+                stream.write(encoded)
+            table_offset = stream.tell()
+            stream.write(b"".join(records))
+            stream.seek(0)
+            stream.write(HEADER.pack(MAGIC, VERSION, flags, len(records), color_offset, table_offset))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path): # Never leave the partial file behind
+            os.remove(temp_path)
+        raise
+    return len(records)
+
+
+class DrawingFile:
+    """A drawing file opened with mmap; shapes are decoded only when asked for."""
+
+    def __init__(self, path):
+        with open(path, "rb") as stream:
+            size = os.fstat(stream.fileno()).st_size
+            if size < HEADER.size:
+                raise DrawingFormatError(f"{path} is too small to be a drawing")
+            self.data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) # Stays valid after close
+        self.path = path
+        try:
+            self._read_header()
+        except BaseException:
+            self.close() # Nothing else holds the mapping
+            raise
+
+    def _read_header(self):
+        magic, version, self.flags, count, color_offset, table_offset = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise DrawingFormatError(f"{self.path} is not a Simple Paint drawing")
+        if version > VERSION:
+            raise DrawingFormatError(f"{self.path} was saved by a newer version (format {version})")
+        if not HEADER.size <= color_offset <= table_offset <= table_offset + count * RECORD.size <= len(self.data):
+            raise DrawingFormatError(f"{self.path} is truncated or corrupt: its tables do not fit in the file")
+        self.version = version
+        self.colors = self._read_colors(color_offset, table_offset)
+        self.color_offset = color_offset
+        self.table_offset = table_offset
+        self.count = count
+
+    def _read_colors(self, start, end):
+        colors = []
+        offset = start
+        while offset < end:
+            if offset + COLOR_LENGTH.size > end:
+                raise DrawingFormatError(f"{self.path} is corrupt: a color name is cut short")
+            (length,) = COLOR_LENGTH.unpack_from(self.data, offset)
+            offset += COLOR_LENGTH.size
+            if offset + length > end:
+                raise DrawingFormatError(f"{self.path} is corrupt: a color name is cut short")
+            try:
+                colors.append(bytes(self.data[offset:offset + length]).decode("utf-8"))
+            except UnicodeDecodeError:
+                raise DrawingFormatError(f"{self.path} is corrupt: a color name is not UTF-8") from None
+            offset += length
+        return colors
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.data.close()
+
+    def record(self, i):
+        """Returns (kind, encoding, width, color, point count, point data offset) of shape i."""
+        if not 0 <= i < self.count:
+            raise IndexError(f"shape {i} out of range")
+        code, encoding, width, color_index, point_count, offset = RECORD.unpack_from(
+            self.data, self.table_offset + i * RECORD.size)
+        if code not in CODE_KINDS or encoding not in ENCODING_TYPECODES or color_index >= len(self.colors):
+            raise DrawingFormatError(f"{self.path} is corrupt: shape {i} has an unknown kind, encoding or color")
+        if offset < HEADER.size or offset + point_count * 2 * ENCODING_ITEMSIZES[encoding] > self.color_offset:
+            raise DrawingFormatError(f"{self.path} is corrupt: the points of shape {i} are outside the point data")
+        return CODE_KINDS[code], encoding, width, self.colors[color_index], point_count, offset
+
+    def shape(self, i):
+        """Decodes shape i from its point block."""
+        kind, encoding, width, color, point_count, offset = self.record(i)
+        points = array(ENCODING_TYPECODES[encoding])
+        points.frombytes(self.data[offset:offset + point_count * 2 * points.itemsize])
+        if SWAP_BYTES:
+            points.byteswap()
+        try:
+            if encoding == ENCODING_FLOAT32:
+                points = [round(value) for value in points] # Shapes hold integer pixel coordinates
+            return Shape(kind, color, width, points)
+        except (ValueError, OverflowError): # NaN, infinite or out-of-range coordinates
+            raise DrawingFormatError(f"{self.path} is corrupt: shape {i} has invalid coordinates") from None
+
+    def shapes(self):
+        """Yields every shape in painting order."""
+        for i in range(self.count):
+            yield self.shape(i)
+
+
+def load_drawing(path):
+    """Reads every shape from a drawing file and returns them as a list, in painting order."""
+    with DrawingFile(path) as drawing:
+        return list(drawing.shapes())
@@ -0,0 +1,116 @@
+"""Frame-paced input pipeline for the Simple Paint App.
+
+High-rate mice and tablets can send far more motion events than the screen
+can show. InputPipeline queues drag positions and keeps only the latest hover
+position, then hands them to the app in one batch per frame, driven by the Tk
+root's after() timer. Presses and releases are delivered at once, after any
+queued motion, so strokes always start and end exactly where the user did.
+"""
+import time
+
+DEFAULT_RATE_HZ = 120     # Frames per second at which queued samples are flushed
+DEFAULT_MAX_DEPTH = 256   # Queued drag samples that force an early flush
+
+
+class InputPipeline:
+    """Queues pointer samples and flushes them to handlers on a fixed frame tick."""
+
+    def __init__(self, root, on_press, on_drag, on_release, on_hover,
+                 rate_hz=DEFAULT_RATE_HZ, max_depth=DEFAULT_MAX_DEPTH):
+        self.root = root             # Anything with Tk's after() and after_cancel()
+        self.on_press = on_press     # Called with the press event
+        self.on_drag = on_drag       # Called with a list of queued (x, y) drag positions
+        self.on_release = on_release # Called with the release event
+        self.on_hover = on_hover     # Called with the latest hover event
+        self.rate_hz = rate_hz
+        self.max_depth = max_depth
+        self.interval_ms = max(1, round(1000 / rate_hz))
+        self.drag_queue = []         # Drag positions waiting for the next frame
+        self.hover_event = None      # The latest hover event waiting for the next frame
+        self.timer_id = None         # The pending after() call, if a frame is scheduled
+
+        # Statistics
+        self.samples_received = 0    # Drag and hover events pushed into the pipeline
+        self.samples_coalesced = 0   # Hover events replaced by a newer one before being shown
+        self.frames = 0              # Frame ticks that delivered something
+        self.batches = 0             # Drag batches delivered
+        self.drag_samples = 0        # Drag positions delivered
+        self.forced_flushes = 0      # Flushes caused by the queue reaching max_depth
+        self.peak_depth = 0          # Largest number of drag positions queued at once
+        self.flush_time = 0.0        # Seconds spent inside handlers during flushes
+
+    # Event entry points: bind these to the canvas
+    def press(self, event):
+        self.flush()
+        self.hover_event = None # A press replaces any hover position still waiting
+        self.on_press(event)
+
+    def drag(self, event):
+        self.samples_received += 1
+        self.drag_queue.append((event.x, event.y))
+        depth = len(self.drag_queue)
+        if depth > self.peak_depth:
+            self.peak_depth = depth
+        if depth >= self.max_depth:
+            self.forced_flushes += 1
+            self.flush()
+        else:
+            self.schedule()
+
+    def release(self, event):
+        self.flush() # Delivers the last drag positions before the stroke ends
+        self.on_release(event)
+
+    def hover(self, event):
+        self.samples_received += 1
+        if self.hover_event is not None:
+            self.samples_coalesced += 1
+        self.hover_event = event
+        self.schedule()
+
+    # Frame clock
+    def schedule(self):
+        """Makes sure a frame tick is pending; the timer only runs while samples are waiting."""
+        if self.timer_id is None:
+            self.timer_id = self.root.after(self.interval_ms, self.tick)
+
+    def tick(self):
+        self.timer_id = None
+        self.flush()
+
+    def flush(self):
+        """Delivers everything queued right now."""
+        if self.timer_id is not None:
+            self.root.after_cancel(self.timer_id)
+            self.timer_id = None
+        if not self.drag_queue and self.hover_event is None:
+            return
+        start = time.perf_counter()
+        if self.drag_queue:
+            batch = self.drag_queue
+            self.drag_queue = []
+            self.batches += 1
+            self.drag_samples += len(batch)
+            self.on_drag(batch)
+        if self.hover_event is not None:
+            event = self.hover_event
+            self.hover_event = None
+            self.on_hover(event)
+        self.frames += 1
+        self.flush_time += time.perf_counter() - start
+
+    def stats(self):
+        """Returns a dict with the pipeline's configuration and counters."""
+        return {
+            "rate_hz": self.rate_hz,
+            "max_depth": self.max_depth,
+            "queue_depth": len(self.drag_queue),
+            "peak_depth": self.peak_depth,
+            "samples_received": self.samples_received,
+            "samples_coalesced": self.samples_coalesced,
+            "frames": self.frames,
+            "drag_samples": self.drag_samples,
+            "mean_batch": self.drag_samples / self.batches if self.batches else 0.0,
+            "forced_flushes": self.forced_flushes,
+            "mean_flush_ms": self.flush_time * 1000 / self.frames if self.frames else 0.0,
+        }
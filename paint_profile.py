@@ -0,0 +1,221 @@
+"""Opt-in instrumentation for the Simple Paint App.
+
+Profiler wraps the app's event handlers on the app instance with timers and
+counters, the same way paint_replay.Recorder does, so an app that is not
+being profiled runs its handlers untouched and pays nothing. It samples the
+live canvas item count and the undo history size, can show everything in an
+on-canvas HUD (toggled with F3), and writes the numbers as JSON.
+"""
+import json
+import time
+
+SAMPLES_KEPT = 2048   # Most recent durations kept per handler for percentiles
+HUD_REFRESH_MS = 250  # How often the HUD is redrawn while it is shown
+HUD_KEY = "<F3>"
+HUD_FONT = ("Courier", 9)
+
+
+class HandlerStats:
+    """Call count, total and worst duration of one handler, plus its most recent durations."""
+    __slots__ = ("calls", "total", "worst", "samples", "next_sample", "points")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.samples = []     # A ring of the last SAMPLES_KEPT durations, in seconds
+        self.next_sample = 0  # Where the ring is written next once it is full
+        self.points = 0       # Drag positions handled, for perform_batch
+
+    def add(self, duration):
+        self.calls += 1
+        self.total += duration
+        if duration > self.worst:
+            self.worst = duration
+        if len(self.samples) < SAMPLES_KEPT:
+            self.samples.append(duration)
+        else:
+            self.samples[self.next_sample] = duration
+            self.next_sample = (self.next_sample + 1) % SAMPLES_KEPT
+
+    def summary(self):
+        """Returns a dict of the handler's counters, with durations in microseconds."""
+        ordered = sorted(self.samples)
+
+        def percentile(fraction):
+            return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1e6 if ordered else 0.0
+
+        summary = {
+            "calls": self.calls,
+            "total_ms": self.total * 1e3,
+            "mean_us": self.total * 1e6 / self.calls if self.calls else 0.0,
+            "p50_us": percentile(0.5),
+            "p99_us": percentile(0.99),
+            "max_us": self.worst * 1e6,
+        }
+        if self.points:
+            summary["points"] = self.points
+        return summary
+
+
+class Profiler:
+    """Times the handlers of a PaintApp (or a paint_replay.HeadlessSession) by wrapping them on the instance."""
+
+    HANDLERS = ("start_action", "perform_action", "perform_batch", "stop_action", "update_indicator",
+                "undo_action", "redo_action", "clear_canvas")
+
+    def __init__(self, app, clock=time.perf_counter):
+        self.app = app
+        self.clock = clock
+        self.handlers = {} # Maps each wrapped handler's name to its HandlerStats
+        self.originals = {}
+        self.started = None
+        self.sampled_max_items = 0   # Most canvas items seen by sample(), which runs only for the HUD and report
+        self.peak_history_bytes = 0  # Largest undo history, checked after every handler that can grow it
+        self.hud_items = None # (background, text) canvas item IDs while the HUD is shown
+        self.hud_timer = None
+
+    def install(self):
+        app = self.app
+        clock = self.clock
+        for name in self.HANDLERS:
+            if not hasattr(app, name):
+                continue # A headless session has no indicator to update
+            original = self.originals[name] = getattr(app, name)
+            stats = self.handlers[name] = HandlerStats()
+            setattr(app, name, self.wrap(name, original, stats, clock))
+        if hasattr(app, "root"):
+            app.root.bind(HUD_KEY, self.toggle_hud)
+        self.started = clock()
+        return self
+
+    def wrap(self, name, handler, stats, clock):
+        """Returns handler wrapped with a timer that adds to stats."""
+        if name == "perform_batch":
+            def timed(points):
+                start = clock()
+                try:
+                    return handler(points)
+                finally:
+                    stats.add(clock() - start)
+                    stats.points += len(points)
+        elif name == "stop_action":
+            document = self.app.document
+
+            def timed(*args):
+                start = clock()
+                try:
+                    return handler(*args)
+                finally:
+                    stats.add(clock() - start)
+                    if document.history_bytes > self.peak_history_bytes: # Releasing is what commits a step
+                        self.peak_history_bytes = document.history_bytes
+        elif name == "clear_canvas":
+            def timed(*args):
+                shown = self.hud_items is not None
+                self.hide_hud() # Keeps the HUD out of the timing, and out of the way of deleting everything
+                start = clock()
+                try:
+                    return handler(*args)
+                finally:
+                    stats.add(clock() - start)
+                    if shown:
+                        self.show_hud()
+        else:
+            def timed(*args):
+                start = clock()
+                try:
+                    return handler(*args)
+                finally:
+                    stats.add(clock() - start)
+        return timed
+
+    def uninstall(self):
+        self.hide_hud()
+        for name, original in self.originals.items():
+            setattr(self.app, name, original)
+        self.originals = {}
+        if hasattr(self.app, "root"):
+            self.app.root.unbind(HUD_KEY)
+
+    def sample(self):
+        """Reads the live canvas item count and history size, keeping their peaks, and returns the history usage."""
+        app = self.app
+        if hasattr(app, "history_memory"):
+            usage = app.history_memory()
+            if self.hud_items is not None:
+                usage["canvas_items"] -= len(self.hud_items) # Counts only the drawing's items
+        else:
+            usage = app.document.memory_usage()
+            usage["canvas_items"] = 0
+        self.sampled_max_items = max(self.sampled_max_items, usage["canvas_items"])
+        self.peak_history_bytes = max(self.peak_history_bytes, usage["history_bytes"])
+        return usage
+
+    def report(self):
+        """Returns every counter as a JSON-ready dict."""
+        app = self.app
+        usage = self.sample()
+        report = {
+            "elapsed_s": self.clock() - self.started if self.started is not None else 0.0,
+            "handlers": {name: stats.summary() for name, stats in self.handlers.items() if stats.calls},
+            "canvas_items": usage.pop("canvas_items"),
+            "canvas_items_sampled_max": self.sampled_max_items,
+            "history": usage,
+            "peak_history_bytes": self.peak_history_bytes,
+        }
+        for name in ("input_stats", "simplify_stats", "tile_stats"):
+            if hasattr(app, name):
+                report[name[:-len("_stats")]] = getattr(app, name)()
+        return report
+
+    def save(self, path):
+        """Writes report() to path as JSON; needs the app's canvas, so call it before the window is destroyed."""
+        report = self.report() # Built first, so a failure leaves no empty file behind
+        with open(path, "w") as stream:
+            json.dump(report, stream, indent=2)
+
+    # HUD: a text overlay in the top-left corner of the view
+    def hud_text(self):
+        usage = self.sample()
+        lines = [f"{'handler':<17}{'calls':>7}{'mean us':>9}{'p99 us':>9}"]
+        for name, stats in self.handlers.items():
+            if stats.calls:
+                summary = stats.summary()
+                lines.append(f"{name:<17}{stats.calls:>7}{summary['mean_us']:>9.0f}{summary['p99_us']:>9.0f}")
+        lines.append(f"canvas items {usage['canvas_items']} (most seen {self.sampled_max_items})")
+        lines.append(f"history {usage['undo_steps']} undo / {usage['redo_steps']} redo, "
+                     f"{usage['history_bytes'] / 1024:.0f} KB")
+        return "\n".join(lines)
+
+    def toggle_hud(self, event=None):
+        if self.hud_items is None:
+            self.show_hud()
+        else:
+            self.hide_hud()
+
+    def show_hud(self):
+        canvas = self.app.canvas
+        if self.hud_items is None:
+            background = canvas.create_rectangle(0, 0, 0, 0, fill="white", outline="gray", stipple="gray50")
+            text = canvas.create_text(0, 0, anchor="nw", font=HUD_FONT, fill="black")
+            self.hud_items = (background, text)
+        background, text = self.hud_items
+        left, top = canvas.canvasx(0) + 8, canvas.canvasy(0) + 8 # Follows the view when it pans
+        canvas.coords(text, left, top)
+        canvas.itemconfigure(text, text=self.hud_text())
+        box = canvas.bbox(text)
+        if box:
+            canvas.coords(background, box[0] - 4, box[1] - 4, box[2] + 4, box[3] + 4)
+        canvas.tag_raise(background)
+        canvas.tag_raise(text) # Stays above anything drawn since the last refresh
+        self.hud_timer = self.app.root.after(HUD_REFRESH_MS, self.show_hud)
+
+    def hide_hud(self):
+        if self.hud_timer is not None:
+            self.app.root.after_cancel(self.hud_timer)
+            self.hud_timer = None
+        if self.hud_items is not None:
+            for item_id in self.hud_items:
+                self.app.canvas.delete(item_id)
+            self.hud_items = None
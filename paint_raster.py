@@ -0,0 +1,311 @@
+"""NumPy raster backend for the Simple Paint App.
+
+A RasterCanvas holds the drawing as an RGBA pixel array. Shapes from
+paint_document are rasterized with vectorized NumPy operations that only touch
+the pixels under each shape, so the cost of drawing does not grow with the
+number of shapes already on the page. Eraser strokes clear pixels to
+transparent instead of painting over them.
+
+NumPy is an optional dependency: importing this module raises ImportError when
+it is not installed.
+"""
+import math
+import struct
+import zlib
+
+import numpy as np
+
+from paint_document import KIND_ERASE, KIND_LINE, KIND_OVAL, KIND_RECTANGLE
+
+# Common Tk color names, for colors that are not given as "#rrggbb"
+NAMED_COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "green": (0, 128, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "orange": (255, 165, 0),
+    "purple": (160, 32, 240),
+    "gray": (190, 190, 190),
+    "grey": (190, 190, 190),
+    "lightgray": (211, 211, 211),
+    "lightblue": (173, 216, 230),
+}
+
+TRANSPARENT = (0, 0, 0, 0)
+POLYLINE_CHUNK_CELLS = 1 << 15 # Pixels tested per NumPy pass when rasterizing a polyline's segments together
+SEGMENT_ALONE_CELLS = 4096     # Polyline segments whose box covers more pixels are rasterized one by one
+
+
+def parse_color(color):
+    """Converts a Tk color string ("#rgb", "#rrggbb", "#rrrrggggbbbb" or a common name) to an RGBA tuple."""
+    if isinstance(color, tuple):
+        return color if len(color) == 4 else tuple(color) + (255,)
+    if color.startswith("#"):
+        digits = len(color) - 1
+        if digits % 3 != 0 or digits == 0:
+            raise ValueError(f"unknown color {color!r}")
+        step = digits // 3
+        channels = [int(color[1 + i * step:1 + (i + 1) * step], 16) for i in range(3)]
+        scale = 255 / (16 ** step - 1) # Scales 4, 8, 12 or 16 bit channels down to 8 bits
+        return tuple(round(c * scale) for c in channels) + (255,)
+    try:
+        return NAMED_COLORS[color.lower()] + (255,)
+    except KeyError:
+        raise ValueError(f"unknown color {color!r}") from None
+
+
+class RasterCanvas:
+    """An offscreen RGBA bitmap that document shapes can be drawn into."""
+
+    def __init__(self, width, height, background="white"):
+        self.width = width
+        self.height = height
+        self.background = parse_color(background) # Shown wherever no pixels are drawn or after erasing
+        self.pixels = np.zeros((height, width, 4), dtype=np.uint8) # Starts fully transparent
+        self.clip = None # Optional (left, top, right, bottom) box that limits all drawing
+        self.origin = (0, 0) # Pixel position, in the zoomed drawing, of the bitmap's top-left corner
+        self.zoom = 1.0      # Bitmap pixels per drawing pixel
+
+    def clear(self):
+        """Erases every pixel back to transparent."""
+        self.pixels[:] = 0
+
+    # Bounding boxes: every rasterizer works only inside the clipped box of its shape
+    def clip_box(self, x1, y1, x2, y2):
+        """Clips a float box to the bitmap and returns integer (left, top, right, bottom), or None if empty."""
+        left = max(int(math.floor(x1)), 0)
+        top = max(int(math.floor(y1)), 0)
+        right = min(int(math.ceil(x2)) + 1, self.width)
+        bottom = min(int(math.ceil(y2)) + 1, self.height)
+        if self.clip is not None:
+            left, top = max(left, self.clip[0]), max(top, self.clip[1])
+            right, bottom = min(right, self.clip[2]), min(bottom, self.clip[3])
+        if left >= right or top >= bottom:
+            return None
+        return left, top, right, bottom
+
+    def clip_boxes(self, low, high):
+        """Does clip_box for many boxes at once: takes (n, 2) arrays of corners and returns an (n, 4) int array.
+
+        Empty boxes come back with no area (right == left or bottom == top).
+        """
+        left, top, right, bottom = 0, 0, self.width, self.height
+        if self.clip is not None:
+            left, top = max(left, self.clip[0]), max(top, self.clip[1])
+            right, bottom = min(right, self.clip[2]), min(bottom, self.clip[3])
+        boxes = np.empty((len(low), 4), dtype=np.int64)
+        boxes[:, :2] = np.maximum(np.floor(low), (left, top))
+        boxes[:, 2:] = np.maximum(np.minimum(np.ceil(high) + 1, (right, bottom)), boxes[:, :2])
+        return boxes
+
+    def _paint(self, box, mask, rgba):
+        """Sets the masked pixels inside box to rgba."""
+        left, top, right, bottom = box
+        self.pixels[top:bottom, left:right][mask] = rgba
+
+    # Rasterizers
+    def _segment(self, x0, y0, x1, y1, width, rgba):
+        radius = max(width / 2, 0.5) # Even the thinnest line covers the pixels it passes through
+        box = self.clip_box(min(x0, x1) - radius, min(y0, y1) - radius,
+                            max(x0, x1) + radius, max(y0, y1) + radius)
+        if box is None:
+            return
+        left, top, right, bottom = box
+        px = np.arange(left, right, dtype=np.float32)[None, :] - x0 # Pixel columns in the box, relative to the start
+        py = np.arange(top, bottom, dtype=np.float32)[:, None] - y0 # Pixel rows, so tiles and full renders agree exactly
+        dx = x1 - x0
+        dy = y1 - y0
+        length2 = dx * dx + dy * dy
+        if length2 == 0:
+            t = 0.0 # A zero-length segment is a round dot
+        else:
+            t = np.clip((px * dx + py * dy) / length2, 0.0, 1.0) # Nearest point on the segment
+        dist2 = (px - t * dx) ** 2 + (py - t * dy) ** 2
+        self._paint(box, dist2 <= radius * radius, rgba)
+
+    def _polyline(self, points, width, rgba):
+        if len(points) == 2:
+            self._segment(points[0], points[1], points[0], points[1], width, rgba)
+            return
+        radius = max(width / 2, 0.5)
+        coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        starts, ends = coords[:-1], coords[1:]
+        boxes = self.clip_boxes(np.minimum(starts, ends) - radius, np.maximum(starts, ends) + radius)
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        large = areas > SEGMENT_ALONE_CELLS
+        for i in np.flatnonzero(large).tolist(): # Big boxes are cheapest on their own, as a row times a column
+            self._segment(*points[2 * i:2 * i + 4], width, rgba)
+        small = np.flatnonzero(~large & (areas > 0))
+        cells = np.cumsum(areas[small]) # Pixels covered up to each small segment
+        first = 0
+        while first < len(small):
+            done = cells[first - 1] if first else 0
+            stop = max(first + 1, int(np.searchsorted(cells, done + POLYLINE_CHUNK_CELLS, side="right")))
+            chunk = small[first:stop]
+            self._segments(starts[chunk], ends[chunk], boxes[chunk], radius, rgba)
+            first = stop
+
+    def _segments(self, starts, ends, boxes, radius, rgba):
+        """Draws many polyline segments in one NumPy pass over the pixels of all their boxes.
+
+        Each pixel's distance to its segment is worked out exactly as _segment does,
+        so chunked and single-segment drawing agree pixel for pixel.
+        """
+        widths = boxes[:, 2] - boxes[:, 0]
+        heights = boxes[:, 3] - boxes[:, 1]
+        deltas = ends - starts
+        length2 = (deltas * deltas).sum(axis=1)
+        length2[length2 == 0] = 1 # A zero-length segment gets t = 0 either way: a round dot
+        # One entry per pixel row of every box, then one per pixel, spread out with np.repeat
+        line = np.repeat(np.arange(len(boxes)), heights) # The segment each row belongs to
+        rows = boxes[line, 1] + np.arange(len(line)) - np.repeat(np.cumsum(heights) - heights, heights)
+        line_py = rows.astype(np.float32) - starts[line, 1].astype(np.float32)
+        line_widths = widths[line]
+        total = int(line_widths.sum())
+        if total == 0:
+            return
+        line_starts = np.cumsum(line_widths) - line_widths
+        columns = np.arange(total) + np.repeat(boxes[line, 0] - line_starts, line_widths)
+        rows = np.repeat(rows, line_widths)
+        px = columns.astype(np.float32) - np.repeat(starts[line, 0].astype(np.float32), line_widths)
+        py = np.repeat(line_py, line_widths)
+        dx = np.repeat(deltas[line, 0].astype(np.float32), line_widths)
+        dy = np.repeat(deltas[line, 1].astype(np.float32), line_widths)
+        t = np.clip((px * dx + py * dy) / np.repeat(length2.astype(np.float32)[line], line_widths), 0.0, 1.0)
+        hit = (px - t * dx) ** 2 + (py - t * dy) ** 2 <= radius * radius
+        self.pixels[rows[hit], columns[hit]] = rgba
+
+    def _rectangle(self, x0, y0, x1, y1, width, rgba):
+        half = width / 2
+        left, right = min(x0, x1), max(x0, x1)
+        top, bottom = min(y0, y1), max(y0, y1)
+        box = self.clip_box(left - half, top - half, right + half, bottom + half)
+        if box is None:
+            return
+        px = np.arange(box[0], box[2])[None, :]
+        py = np.arange(box[1], box[3])[:, None]
+        outer = (px >= left - half) & (px <= right + half) & (py >= top - half) & (py <= bottom + half)
+        inner = (px > left + half) & (px < right - half) & (py > top + half) & (py < bottom - half)
+        self._paint(box, outer & ~inner, rgba)
+
+    def _oval(self, x0, y0, x1, y1, width, rgba):
+        half = max(width / 2, 0.5)
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        a, b = abs(x1 - x0) / 2, abs(y1 - y0) / 2 # Semi-axes of the oval's centre line
+        box = self.clip_box(cx - a - half, cy - b - half, cx + a + half, cy + b + half)
+        if box is None:
+            return
+        px = np.arange(box[0], box[2], dtype=np.float32)[None, :] - cx
+        py = np.arange(box[1], box[3], dtype=np.float32)[:, None] - cy
+        mask = (px / (a + half)) ** 2 + (py / (b + half)) ** 2 <= 1.0 # Inside the outer edge
+        if a > half and b > half:
+            mask &= (px / (a - half)) ** 2 + (py / (b - half)) ** 2 > 1.0 # Outside the inner edge
+        self._paint(box, mask, rgba)
+
+    def place(self, shape):
+        """Returns the shape's points and line width in bitmap pixels, after the origin and zoom."""
+        if self.zoom == 1 and self.origin == (0, 0):
+            return shape.points, shape.width
+        zoom = self.zoom
+        left, top = self.origin
+        placed = np.asarray(shape.points, dtype=np.float64).reshape(-1, 2) * zoom - (left, top)
+        return placed.ravel().tolist(), shape.width * zoom
+
+    def draw_shape(self, shape):
+        """Rasterizes one paint_document shape; eraser strokes clear pixels to transparent."""
+        points, width = self.place(shape)
+        if shape.kind == KIND_RECTANGLE:
+            self._rectangle(*points, width, parse_color(shape.color))
+        elif shape.kind == KIND_OVAL:
+            self._oval(*points, width, parse_color(shape.color))
+        elif shape.kind == KIND_LINE:
+            self._segment(*points, width, parse_color(shape.color))
+        elif shape.kind == KIND_ERASE:
+            self._polyline(points, width, TRANSPARENT) # A true eraser: pixels become empty again
+        else:
+            self._polyline(points, width, parse_color(shape.color))
+
+    def render(self, shapes):
+        """Clears the bitmap and draws the given shapes in order."""
+        self.clear()
+        for shape in shapes:
+            self.draw_shape(shape)
+
+    def redraw_region(self, box, shapes):
+        """Clears only the pixels inside box and redraws the given shapes clipped to it."""
+        self.clip = box
+        try:
+            left, top, right, bottom = box
+            self.pixels[top:bottom, left:right] = 0
+            for shape in shapes:
+                self.draw_shape(shape)
+        finally:
+            self.clip = None
+
+    def shift(self, dx, dy):
+        """Moves the origin by (dx, dy) bitmap pixels, keeping the pixels still covered, and returns the boxes uncovered.
+
+        The uncovered boxes are left empty for the caller to redraw, e.g. with redraw_region.
+        """
+        left, top = self.origin
+        self.origin = (left + dx, top + dy)
+        width, height = self.width, self.height
+        if abs(dx) >= width or abs(dy) >= height: # Nothing stays in view
+            self.clear()
+            return [(0, 0, width, height)]
+        self.pixels[max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)] = \
+            self.pixels[max(0, dy):height - max(0, -dy), max(0, dx):width - max(0, -dx)] # NumPy copies overlapping slices safely
+        uncovered = []
+        if dx:
+            uncovered.append((width - dx, 0, width, height) if dx > 0 else (0, 0, -dx, height))
+        if dy:
+            uncovered.append((0, height - dy, width, height) if dy > 0 else (0, 0, width, -dy))
+        for box_left, box_top, box_right, box_bottom in uncovered:
+            self.pixels[box_top:box_bottom, box_left:box_right] = 0
+        return uncovered
+
+    # Output
+    def composite(self, box=None):
+        """Returns an RGB array of the drawing (or the part inside box) flattened over the background."""
+        left, top, right, bottom = box or (0, 0, self.width, self.height)
+        region = self.pixels[top:bottom, left:right]
+        alpha = region[..., 3:4].astype(np.uint16)
+        background = np.array(self.background[:3], dtype=np.uint16)
+        rgb = (region[..., :3] * alpha + background * (255 - alpha) + 127) // 255
+        return rgb.astype(np.uint8)
+
+    def to_ppm(self, box=None):
+        """Encodes the composited drawing (or the part inside box) as binary PPM data for Tk's PhotoImage."""
+        rgb = self.composite(box)
+        header = f"P6 {rgb.shape[1]} {rgb.shape[0]} 255\n".encode("ascii")
+        return header + rgb.tobytes()
+
+
+def png_scanlines(pixels):
+    """Returns the raw PNG scanline data for an (height, width, channels) uint8 array, using filter type None."""
+    height, width, channels = pixels.shape
+    rows = np.empty((height, 1 + width * channels), dtype=np.uint8)
+    rows[:, 0] = 0 # Filter type "None" at the start of every scanline
+    rows[:, 1:] = pixels.reshape(height, width * channels)
+    return rows.tobytes()
+
+
+def png_chunk(tag, data):
+    """Returns one PNG chunk: length, tag, data and CRC."""
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def png_header(width, height, channels):
+    """Returns the PNG signature and IHDR chunk for an 8-bit RGB (3 channels) or RGBA (4 channels) image."""
+    color_type = {3: 2, 4: 6}[channels] # PNG color types for RGB and RGBA
+    return b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+
+
+def encode_png(pixels, compression=6):
+    """Encodes an (height, width, 3 or 4) uint8 array as PNG bytes using only the standard library."""
+    height, width, channels = pixels.shape
+    return (png_header(width, height, channels)
+            + png_chunk(b"IDAT", zlib.compress(png_scanlines(pixels), compression))
+            + png_chunk(b"IEND", b""))
@@ -0,0 +1,407 @@
+"""Input recording and deterministic replay for the Simple Paint App.
+
+An InputLog stores the stream of events that reach the app's handlers
+(start_action, perform_batch, stop_action, undo_action, redo_action and
+clear_canvas) as compact packed records. Positions are logged in drawing
+coordinates, so a replay lands where the user drew however the view was
+panned or zoomed at the time. Recorder captures it from a running
+PaintApp; replay() feeds it back at full speed into either a PaintApp or a
+HeadlessSession, which runs the same drawing logic with no window at all.
+The workload functions at the bottom build canned logs for benchmarks.
+"""
+import math
+import random
+import struct
+import time
+
+from paint_document import Document, StrokeEngine
+from paint_simplify import StrokeSimplifier
+from paint_spatial import Eraser, GridIndex
+
+MAGIC = b"SPLG"
+VERSION = 1
+LOG_EXTENSION = ".splg"
+
+# Record types
+OP_PRESS = 0   # Mouse button pressed: position plus the mode, color and brush size in use
+OP_DRAG = 1    # Mouse dragged to a position
+OP_RELEASE = 2 # Mouse button released at a position
+OP_UNDO = 3
+OP_REDO = 4
+OP_CLEAR = 5
+OP_COLOR = 6   # Defines the next color index; written the first time a color is used
+
+MODES = ("draw", "erase", "rectangle", "circle", "line")
+MODE_CODES = {mode: code for code, mode in enumerate(MODES)}
+
+FILE_HEADER = struct.Struct("<4sH")
+OP = struct.Struct("<B")
+POINT = struct.Struct("<Bhh")
+PRESS = struct.Struct("<BhhBHH")   # op, x, y, mode, width, color index
+COLOR = struct.Struct("<BH")       # op, length of the UTF-8 color name that follows
+
+INT16_MIN, INT16_MAX = -32768, 32767
+
+
+def clamp16(value):
+    return max(INT16_MIN, min(INT16_MAX, int(value)))
+
+
+def check_length(data, offset, size):
+    """Raises ValueError unless size bytes are left in data at offset."""
+    if offset + size > len(data):
+        raise ValueError(f"corrupt input log: truncated record at byte {offset}")
+
+
+class PointerEvent:
+    """The part of a Tkinter mouse event the handlers use."""
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class InputLog:
+    """A compact, append-only log of input events, kept packed in a bytearray."""
+
+    def __init__(self, data=b""):
+        self.data = bytearray(data)
+        self.colors = {}       # Maps each color already defined in the log to its index
+        self.event_count = 0
+        if data:
+            for _ in self: # Rebuilds the color table and event count from existing data
+                pass
+
+    def __len__(self):
+        return self.event_count
+
+    def press(self, mode, color, width, x, y):
+        index = self.colors.get(color)
+        if index is None:
+            index = self.colors[color] = len(self.colors)
+            encoded = color.encode("utf-8")
+            self.data += COLOR.pack(OP_COLOR, len(encoded))
+            self.data += encoded
+        self.data += PRESS.pack(OP_PRESS, clamp16(x), clamp16(y), MODE_CODES[mode], width, index)
+        self.event_count += 1
+
+    def drag(self, x, y):
+        self.data += POINT.pack(OP_DRAG, clamp16(x), clamp16(y))
+        self.event_count += 1
+
+    def release(self, x, y):
+        self.data += POINT.pack(OP_RELEASE, clamp16(x), clamp16(y))
+        self.event_count += 1
+
+    def undo(self):
+        self.data += OP.pack(OP_UNDO)
+        self.event_count += 1
+
+    def redo(self):
+        self.data += OP.pack(OP_REDO)
+        self.event_count += 1
+
+    def clear(self):
+        self.data += OP.pack(OP_CLEAR)
+        self.event_count += 1
+
+    def __iter__(self):
+        """Yields events as tuples: (OP_PRESS, x, y, mode, color, width), (OP_DRAG/OP_RELEASE, x, y) or (op,).
+
+        Raises ValueError if the log is truncated or damaged.
+        """
+        data = self.data
+        colors = []
+        offset = 0
+        count = 0
+        while offset < len(data):
+            op = data[offset]
+            if op == OP_DRAG or op == OP_RELEASE:
+                check_length(data, offset, POINT.size)
+                _, x, y = POINT.unpack_from(data, offset)
+                offset += POINT.size
+                yield op, x, y
+            elif op == OP_PRESS:
+                check_length(data, offset, PRESS.size)
+                _, x, y, mode, width, index = PRESS.unpack_from(data, offset)
+                if mode >= len(MODES) or index >= len(colors):
+                    raise ValueError(f"corrupt input log: bad mode or color index at byte {offset}")
+                offset += PRESS.size
+                yield op, x, y, MODES[mode], colors[index], width
+            elif op == OP_COLOR:
+                check_length(data, offset, COLOR.size)
+                _, length = COLOR.unpack_from(data, offset)
+                offset += COLOR.size
+                check_length(data, offset, length)
+                try:
+                    colors.append(bytes(data[offset:offset + length]).decode("utf-8"))
+                except UnicodeDecodeError:
+                    raise ValueError(f"corrupt input log: bad color name at byte {offset}") from None
+                offset += length
+                continue # Not an event
+            elif op in (OP_UNDO, OP_REDO, OP_CLEAR):
+                offset += OP.size
+                yield (op,)
+            else:
+                raise ValueError(f"corrupt input log: unknown record type {op} at byte {offset}")
+            count += 1
+        self.colors = {color: index for index, color in enumerate(colors)}
+        self.event_count = count
+
+    def save(self, path):
+        with open(path, "wb") as stream:
+            stream.write(FILE_HEADER.pack(MAGIC, VERSION))
+            stream.write(self.data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as stream:
+            data = stream.read()
+        if len(data) < FILE_HEADER.size:
+            raise ValueError(f"{path} is too small to be an input log")
+        magic, version = FILE_HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version > VERSION:
+            raise ValueError(f"{path} is not an input log this version can read")
+        return cls(data[FILE_HEADER.size:])
+
+
+class Recorder:
+    """Records the events reaching a PaintApp's handlers by wrapping them on the app instance.
+
+    Pointer positions are converted from the window to the drawing with the app's
+    to_document(), so the log does not depend on where the view was.
+    """
+
+    HANDLERS = ("start_action", "perform_batch", "stop_action", "undo_action", "redo_action", "clear_canvas")
+
+    def __init__(self, app, log=None):
+        self.app = app
+        self.log = log if log is not None else InputLog()
+        self.originals = {}
+
+    def install(self):
+        app = self.app
+        log = self.log
+        for name in self.HANDLERS:
+            self.originals[name] = getattr(app, name)
+        start_action = self.originals["start_action"]
+        perform_batch = self.originals["perform_batch"]
+        stop_action = self.originals["stop_action"]
+        undo_action = self.originals["undo_action"]
+        redo_action = self.originals["redo_action"]
+        clear_canvas = self.originals["clear_canvas"]
+        to_document = getattr(app, "to_document", lambda x, y: (x, y)) # A HeadlessSession has no view
+
+        def record_start(event):
+            log.press(app.drawing_mode, app.drawing_color, app.brush_size, *to_document(event.x, event.y))
+            return start_action(event)
+
+        def record_batch(points):
+            for x, y in points:
+                log.drag(*to_document(x, y))
+            return perform_batch(points)
+
+        def record_stop(event):
+            log.release(*to_document(event.x, event.y))
+            return stop_action(event)
+
+        def record_undo():
+            log.undo()
+            return undo_action()
+
+        def record_redo():
+            log.redo()
+            return redo_action()
+
+        def record_clear():
+            log.clear()
+            return clear_canvas()
+
+        app.start_action = record_start
+        app.perform_batch = record_batch
+        app.stop_action = record_stop
+        app.undo_action = record_undo
+        app.redo_action = record_redo
+        app.clear_canvas = record_clear
+        return self
+
+    def uninstall(self):
+        for name, original in self.originals.items():
+            setattr(self.app, name, original)
+        self.originals = {}
+
+
+class HeadlessSession:
+    """The app's drawing logic with no window: the same handlers, driving only the document.
+
+    There is no view to pan or zoom; event positions are drawing coordinates, as logged.
+    """
+
+    def __init__(self, history_steps=None, history_bytes=None, simplify_tolerance=0):
+        self.document = Document(index=GridIndex(), max_steps=history_steps, max_bytes=history_bytes)
+        self.simplifier = StrokeSimplifier(simplify_tolerance)
+        self.engine = StrokeEngine(self.document, eraser=Eraser(self.document), simplifier=self.simplifier)
+        self.drawing_mode = "draw"
+        self.drawing_color = "black"
+        self.brush_size = 3
+
+    def start_action(self, event):
+        self.engine.press(self.drawing_mode, event.x, event.y, self.drawing_color, self.brush_size)
+
+    def perform_action(self, event):
+        self.perform_batch([(event.x, event.y)])
+
+    def perform_batch(self, points):
+        if self.engine.erasing is not None:
+            for x, y in points:
+                self.engine.erase_to(x, y)
+        else:
+            for x, y in points:
+                self.engine.drag(x, y)
+
+    def stop_action(self, event):
+        self.engine.release(event.x, event.y)
+
+    def undo_action(self):
+        self.document.undo()
+
+    def redo_action(self):
+        self.document.redo()
+
+    def clear_canvas(self):
+        self.document.clear()
+
+
+def replay(log, target, timings=None, batch_drags=False, clock=time.perf_counter):
+    """Feeds every event in log to target (a PaintApp or HeadlessSession) as fast as possible.
+
+    Logged positions are in drawing coordinates, so a PaintApp target should have
+    its view at the origin with no zoom, as it is when the app starts.
+
+    If timings is a list, the duration of each handler call, measured with clock,
+    is appended to it. With batch_drags, runs of drag events are delivered as one
+    perform_batch call, the way the app's input pipeline delivers a frame.
+    Returns the number of events replayed.
+    """
+    pending = [] # Drag positions waiting to be delivered as one batch
+    count = 0
+
+    def deliver(handler, *args):
+        if timings is None:
+            handler(*args)
+        else:
+            start = clock()
+            handler(*args)
+            timings.append(clock() - start)
+
+    for event in log:
+        op = event[0]
+        count += 1
+        if op == OP_DRAG:
+            if batch_drags:
+                pending.append((event[1], event[2]))
+            else:
+                deliver(target.perform_batch, [(event[1], event[2])])
+            continue
+        if pending:
+            deliver(target.perform_batch, pending)
+            pending = []
+        if op == OP_PRESS:
+            _, x, y, mode, color, width = event
+            target.drawing_mode = mode
+            target.drawing_color = color
+            target.brush_size = width
+            deliver(target.start_action, PointerEvent(x, y))
+        elif op == OP_RELEASE:
+            deliver(target.stop_action, PointerEvent(event[1], event[2]))
+        elif op == OP_UNDO:
+            deliver(target.undo_action)
+        elif op == OP_REDO:
+            deliver(target.redo_action)
+        elif op == OP_CLEAR:
+            deliver(target.clear_canvas)
+    if pending:
+        deliver(target.perform_batch, pending)
+    return count
+
+
+# Canned workloads for benchmarks
+def add_stroke(log, points, mode="draw", color="black", width=3):
+    """Appends one press-drag-release gesture through the given points."""
+    log.press(mode, color, width, *points[0])
+    for x, y in points[1:]:
+        log.drag(x, y)
+    log.release(*points[-1])
+
+
+def spiral(rng, num_points, width=1000, height=650):
+    """Returns the points of a wandering spiral stroke inside the page."""
+    cx, cy = rng.uniform(200, width - 200), rng.uniform(150, height - 150)
+    turns = rng.uniform(3, 10)
+    points = []
+    for i in range(num_points):
+        t = i / num_points
+        angle = t * turns * 2 * math.pi
+        radius = 20 + 150 * t
+        points.append((int(cx + radius * math.cos(angle)), int(cy + radius * math.sin(angle))))
+    return points
+
+
+def workload_long_strokes(rng, scale=1):
+    """A few very long freehand strokes."""
+    log = InputLog()
+    for _ in range(20 * scale):
+        add_stroke(log, spiral(rng, 2000), color=rng.choice(["black", "#cc3300", "#0055aa"]))
+    return log
+
+
+def workload_many_shapes(rng, scale=1):
+    """Thousands of short rectangle, oval and line drags."""
+    log = InputLog()
+    for _ in range(2000 * scale):
+        x, y = rng.randint(0, 950), rng.randint(0, 600)
+        drag = [(x + i * 5, y + i * 4) for i in range(10)]
+        add_stroke(log, drag, mode=rng.choice(["rectangle", "circle", "line"]), width=rng.randint(1, 8))
+    return log
+
+
+def workload_eraser_storm(rng, scale=1):
+    """Hundreds of strokes followed by long eraser drags back and forth across them."""
+    log = InputLog()
+    for _ in range(200 * scale):
+        add_stroke(log, spiral(rng, 60))
+    for i in range(10 * scale):
+        y = (i * 61) % 650
+        sweep = [(x, y + int(30 * math.sin(x / 40))) for x in range(0, 1000, 10)]
+        add_stroke(log, sweep, mode="erase", width=rng.randint(4, 15))
+    return log
+
+
+def workload_deep_undo(rng, scale=1):
+    """A long chain of strokes undone and redone all the way, then a new branch that discards the redo steps."""
+    log = InputLog()
+    count = 500 * scale
+    for _ in range(count):
+        add_stroke(log, spiral(rng, 40))
+    for _ in range(count):
+        log.undo()
+    for _ in range(count):
+        log.redo()
+    for _ in range(count // 2):
+        log.undo()
+    add_stroke(log, spiral(rng, 40))
+    return log
+
+
+WORKLOADS = {
+    "long-strokes": workload_long_strokes,
+    "many-shapes": workload_many_shapes,
+    "eraser-storm": workload_eraser_storm,
+    "deep-undo": workload_deep_undo,
+}
+
+
+def build_workload(name, seed=1, scale=1):
+    """Builds the named canned workload; the same seed always gives the same log."""
+    return WORKLOADS[name](random.Random(seed), scale)
@@ -0,0 +1,111 @@
+"""Stroke simplification and adaptive smoothing for the Simple Paint App.
+
+A mouse or tablet reports far more positions than a stroke needs to keep its
+shape. StrokeSimplifier decides, sample by sample while a stroke is drawn,
+whether the newest position adds a point or only moves the stroke's end: the
+end may move as long as every sample it skipped stays within the tolerance of
+the straightened segment. spline_steps then picks Tk's splinesteps from how
+sharply a stroke turns, instead of always tessellating each segment 12 times.
+"""
+import math
+
+from paint_spatial import point_segment_distance2
+
+DEFAULT_TOLERANCE = 1.0 # Largest distance in pixels a skipped sample may be from the simplified stroke
+MAX_SKIPPED = 64        # Samples checked before the stroke's end is kept regardless, bounding the cost per sample
+MAX_SPLINE_STEPS = 12   # Tk's usual number of sub-steps per smoothed segment
+SPLINE_ERROR = 0.5      # Largest distance in pixels a sub-step may cut across the true curve
+
+
+def turn_steps(ax, ay, bx, by, cx, cy):
+    """Returns the spline sub-steps needed where the segments A-B and B-C meet."""
+    ux, uy = bx - ax, by - ay
+    vx, vy = cx - bx, cy - by
+    shorter = min(math.hypot(ux, uy), math.hypot(vx, vy))
+    if shorter == 0:
+        return 1
+    angle = abs(math.atan2(ux * vy - uy * vx, ux * vx + uy * vy)) # Turning angle at B, 0 to pi
+    bulge = shorter * angle / 8 # Roughly how far one chord cuts across the curve through B
+    return max(1, min(MAX_SPLINE_STEPS, math.ceil(math.sqrt(bulge / SPLINE_ERROR))))
+
+
+def spline_steps(points):
+    """Returns the splinesteps a smoothed line through a flat point buffer needs, from its sharpest turn."""
+    steps = 1
+    for i in range(0, len(points) - 5, 2):
+        steps = max(steps, turn_steps(*points[i:i + 6]))
+        if steps == MAX_SPLINE_STEPS:
+            break
+    return steps
+
+
+class StrokeSimplifier:
+    """Drops redundant samples from freehand strokes as they are drawn.
+
+    With a tolerance of 0 every sample is kept, which is the original behaviour.
+    """
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE):
+        self.tolerance = tolerance
+        self.tolerance2 = tolerance * tolerance
+        self.skipped = []  # Samples replaced by the stroke's end since the last kept point
+        self.steps = 1     # Spline steps the active stroke needs so far
+
+        # Statistics
+        self.samples_received = 0 # Positions given to the simplifier, press points included
+        self.points_kept = 0      # Positions that are points of a stroke
+        self.strokes = 0
+
+    def start(self, shape):
+        """Begins a new freehand stroke, which holds only its press point."""
+        self.skipped = []
+        self.steps = 1
+        self.samples_received += 1
+        self.points_kept += 1
+        self.strokes += 1
+
+    def add(self, shape, x, y):
+        """Adds a sample to the stroke and returns True if it became a new point, False if it moved the end."""
+        self.samples_received += 1
+        points = shape.points
+        if self.tolerance > 0 and len(points) >= 4:
+            ax, ay, ex, ey = points[-4:] # The last kept point and the stroke's current end
+            skipped = self.skipped
+            if len(skipped) < MAX_SKIPPED and self.fits(skipped, ex, ey, ax, ay, x, y):
+                skipped.append((ex, ey))
+                shape.set_last(x, y)
+                return False
+            self.skipped = []
+        if len(points) >= 4: # The end becomes a kept point with a known turn
+            self.steps = max(self.steps, turn_steps(points[-4], points[-3], points[-2], points[-1], x, y))
+        shape.append_point(x, y)
+        self.points_kept += 1
+        return True
+
+    def fits(self, skipped, ex, ey, ax, ay, bx, by):
+        """Returns True if the end (ex, ey) and every skipped sample are within the tolerance of segment A-B."""
+        limit2 = self.tolerance2
+        dx = bx - ax
+        dy = by - ay
+        length2 = dx * dx + dy * dy
+        if length2 == 0: # The pointer came back to the last kept point
+            return point_segment_distance2(ex, ey, ax, ay, bx, by) <= limit2 and all(
+                point_segment_distance2(px, py, ax, ay, bx, by) <= limit2 for px, py in skipped)
+        for px, py in [(ex, ey)] + skipped: # Same math as point_segment_distance2, with the segment set up once
+            t = ((px - ax) * dx + (py - ay) * dy) / length2
+            t = 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+            qx = ax + t * dx - px
+            qy = ay + t * dy - py
+            if qx * qx + qy * qy > limit2:
+                return False
+        return True
+
+    def stats(self):
+        """Returns a dict with the tolerance and the points kept against the samples received."""
+        return {
+            "tolerance": self.tolerance,
+            "strokes": self.strokes,
+            "samples_received": self.samples_received,
+            "points_kept": self.points_kept,
+            "kept_ratio": self.points_kept / self.samples_received if self.samples_received else 1.0,
+        }
@@ -0,0 +1,307 @@
+"""Spatial index and eraser geometry for the Simple Paint App.
+
+GridIndex buckets shapes by the grid cells their bounding boxes cover, so
+"which shapes are near this point?" only looks at a few cells instead of every
+shape in the drawing. Eraser uses it to find exactly which shapes a brush
+sweep touches, then cuts the part under the brush out of each one's outline
+and keeps the rest as pieces, instead of painting over them.
+"""
+import math
+
+from paint_document import FREEHAND_KINDS, KIND_LINE, KIND_OVAL, KIND_RECTANGLE, KIND_STROKE, shape_order
+
+DEFAULT_CELL_SIZE = 64 # Grid cell size in pixels; about the size of a large brush
+OVAL_MIN_SEGMENTS = 32 # Fewest straight segments used to approximate an oval outline
+OVAL_SAG = 0.5         # Largest distance in pixels an oval's straight segments may cut inside the curve
+
+
+class GridIndex:
+    """A uniform grid over shape bounding boxes."""
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {} # Maps (column, row) to the set of shapes whose box overlaps that cell
+        self.boxes = {} # Maps each indexed shape to its (x1, y1, x2, y2) bounding box
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __contains__(self, shape):
+        return shape in self.boxes
+
+    def __iter__(self):
+        return iter(self.boxes)
+
+    def _cell_keys(self, x1, y1, x2, y2):
+        """Yields the (column, row) keys of every cell overlapping the box."""
+        size = self.cell_size
+        for column in range(math.floor(x1 / size), math.floor(x2 / size) + 1):
+            for row in range(math.floor(y1 / size), math.floor(y2 / size) + 1):
+                yield column, row
+
+    def insert(self, shape):
+        """Adds a shape to the index using its current bounds."""
+        box = shape.bounds()
+        self.boxes[shape] = box
+        cells = self.cells
+        for key in self._cell_keys(*box):
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = bucket = set()
+            bucket.add(shape)
+
+    def remove(self, shape):
+        """Removes a shape from the index; shapes that are not indexed are ignored."""
+        box = self.boxes.pop(shape, None)
+        if box is None:
+            return
+        cells = self.cells
+        for key in self._cell_keys(*box):
+            bucket = cells.get(key)
+            if bucket is not None:
+                bucket.discard(shape)
+                if not bucket:
+                    del cells[key] # Keeps the grid as sparse as the drawing
+
+    def clear(self):
+        self.cells.clear()
+        self.boxes.clear()
+
+    def query(self, x1, y1, x2, y2):
+        """Returns the shapes whose bounding boxes overlap the box x1, y1, x2, y2."""
+        found = set()
+        cells = self.cells
+        for key in self._cell_keys(x1, y1, x2, y2):
+            bucket = cells.get(key)
+            if bucket:
+                found.update(bucket)
+        boxes = self.boxes
+        return [shape for shape in found
+                if boxes[shape][0] <= x2 and boxes[shape][2] >= x1
+                and boxes[shape][1] <= y2 and boxes[shape][3] >= y1]
+
+
+# Eraser geometry: distances between the eraser's sweep and shape outlines
+def point_segment_distance2(px, py, ax, ay, bx, by):
+    """Returns the squared distance from point P to segment AB."""
+    dx = bx - ax
+    dy = by - ay
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        t = 0.0
+    else:
+        t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length2))
+    qx = ax + t * dx - px
+    qy = ay + t * dy - py
+    return qx * qx + qy * qy
+
+
+def segments_cross(ax, ay, bx, by, cx, cy, dx, dy):
+    """Returns True if segments AB and CD properly intersect."""
+    d1 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    d2 = (bx - ax) * (dy - ay) - (by - ay) * (dx - ax)
+    d3 = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx)
+    d4 = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx)
+    return ((d1 > 0) != (d2 > 0)) and ((d3 > 0) != (d4 > 0)) and d1 * d2 != 0 and d3 * d4 != 0
+
+
+def segment_distance2(ax, ay, bx, by, cx, cy, dx, dy):
+    """Returns the squared distance between segments AB and CD."""
+    if segments_cross(ax, ay, bx, by, cx, cy, dx, dy):
+        return 0.0
+    return min(point_segment_distance2(ax, ay, cx, cy, dx, dy),
+               point_segment_distance2(bx, by, cx, cy, dx, dy),
+               point_segment_distance2(cx, cy, ax, ay, bx, by),
+               point_segment_distance2(dx, dy, ax, ay, bx, by))
+
+
+def outline_points(shape):
+    """Returns the flat point list of the polyline that traces a shape's outline, and whether it is closed.
+
+    Oval outlines are approximated by enough straight segments to stay within OVAL_SAG of the curve.
+    """
+    points = shape.points
+    if shape.kind in FREEHAND_KINDS or shape.kind == KIND_LINE:
+        return list(points), False
+    x0, y0, x1, y1 = points
+    if shape.kind == KIND_RECTANGLE:
+        return [x0, y0, x1, y0, x1, y1, x0, y1, x0, y0], True
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    a, b = abs(x1 - x0) / 2, abs(y1 - y0) / 2
+    count = OVAL_MIN_SEGMENTS
+    if max(a, b) > OVAL_SAG:
+        count = max(count, math.ceil(math.pi / math.acos(1 - OVAL_SAG / max(a, b))))
+    ring = []
+    for i in range(count):
+        angle = 2 * math.pi * i / count
+        ring += [round(cx + a * math.cos(angle)), round(cy + b * math.sin(angle))]
+    return ring + ring[:2], True
+
+
+def outline_segments(shape):
+    """Returns the straight segments (x0, y0, x1, y1) that approximate a shape's outline."""
+    points, closed = outline_points(shape)
+    if len(points) == 2:
+        return [(points[0], points[1], points[0], points[1])] # A single dot
+    return [tuple(points[i:i + 4]) for i in range(0, len(points) - 2, 2)]
+
+
+def circle_span(ax, ay, vx, vy, px, py, reach2):
+    """Returns the (t0, t1) range where A + t * V is within reach of P, clipped to 0..1, or None."""
+    wx, wy = ax - px, ay - py
+    a = vx * vx + vy * vy
+    c = wx * wx + wy * wy - reach2
+    if a == 0:
+        return (0.0, 1.0) if c <= 0 else None
+    b = vx * wx + vy * wy
+    discriminant = b * b - a * c
+    if discriminant < 0:
+        return None
+    root = math.sqrt(discriminant)
+    return clip_span((-b - root) / a, (-b + root) / a)
+
+
+def band_span(value, rate, low, high, t0, t1):
+    """Narrows (t0, t1) to where value + t * rate lies between low and high; returns None when nothing is left."""
+    if rate == 0:
+        return (t0, t1) if low <= value <= high else None
+    ta, tb = (low - value) / rate, (high - value) / rate
+    if ta > tb:
+        ta, tb = tb, ta
+    t0, t1 = max(t0, ta), min(t1, tb)
+    return (t0, t1) if t0 <= t1 else None
+
+
+def clip_span(t0, t1):
+    t0, t1 = max(t0, 0.0), min(t1, 1.0)
+    return (t0, t1) if t0 <= t1 else None
+
+
+def segment_cut(ax, ay, bx, by, cx, cy, dx, dy, reach):
+    """Returns the (t0, t1) part of segment AB, as fractions of its length, within reach of segment CD, or None.
+
+    The points within reach of CD form a capsule, which is convex, so the part of AB
+    inside it is a single range: the union of its ranges in the two end circles and
+    in the straight band between them.
+    """
+    if (max(ax, bx) < min(cx, dx) - reach or min(ax, bx) > max(cx, dx) + reach
+            or max(ay, by) < min(cy, dy) - reach or min(ay, by) > max(cy, dy) + reach):
+        return None # Quick rejection by bounding boxes
+    vx, vy = bx - ax, by - ay
+    reach2 = reach * reach
+    spans = [circle_span(ax, ay, vx, vy, cx, cy, reach2), circle_span(ax, ay, vx, vy, dx, dy, reach2)]
+    ux, uy = dx - cx, dy - cy
+    length = math.hypot(ux, uy)
+    if length > 0:
+        ux, uy = ux / length, uy / length # Unit vector along the sweep
+        span = band_span((ax - cx) * ux + (ay - cy) * uy, vx * ux + vy * uy, 0, length, 0.0, 1.0)
+        if span is not None:
+            span = band_span((cx - ax) * uy - (cy - ay) * ux, vy * ux - vx * uy, -reach, reach, *span)
+        spans.append(span)
+    spans = [span for span in spans if span is not None]
+    if not spans:
+        return None
+    t0, t1 = min(span[0] for span in spans), max(span[1] for span in spans)
+    if t0 == t1 and vx * vx + vy * vy > 0:
+        return None # The brush only grazes the segment at one point
+    return t0, t1
+
+
+def segment_cuts(shape, x0, y0, x1, y1, radius):
+    """Returns one entry per outline segment: None, or the (t0, t1) part the sweep from (x0, y0) to (x1, y1) erases."""
+    reach = radius + shape.width / 2 # The eraser touches a shape as soon as it reaches the edge of its line
+    return [segment_cut(ax, ay, bx, by, x0, y0, x1, y1, reach) for ax, ay, bx, by in outline_segments(shape)]
+
+
+def segment_hits(shape, x0, y0, x1, y1, radius):
+    """Returns one True/False per outline segment: whether the eraser sweep from (x0, y0) to (x1, y1) touches it."""
+    return [cut is not None for cut in segment_cuts(shape, x0, y0, x1, y1, radius)]
+
+
+def cut_polyline(points, cuts, closed=False):
+    """Returns the point lists left after cutting the erased range of each segment out of a flat polyline.
+
+    Cut points become new piece endpoints, rounded to whole pixels. Pieces that
+    shrink to a single point are dropped. On a closed outline the pieces on both
+    sides of its starting point are joined into one.
+    """
+    pieces = []
+    piece = None # The piece being built, as a flat point list
+    for i, cut in enumerate(cuts):
+        ax, ay, bx, by = points[2 * i:2 * i + 4]
+        if cut is None:
+            if piece is None:
+                piece = [ax, ay]
+            piece += [bx, by]
+            continue
+        t0, t1 = cut
+        if t0 > 0:
+            if piece is None:
+                piece = [ax, ay]
+            end = [round(ax + t0 * (bx - ax)), round(ay + t0 * (by - ay))]
+            if piece[-2:] != end:
+                piece += end
+        if piece is not None and len(piece) >= 4:
+            pieces.append(piece)
+        piece = None
+        if t1 < 1:
+            piece = [round(ax + t1 * (bx - ax)), round(ay + t1 * (by - ay))]
+            if piece != [bx, by]:
+                piece += [bx, by]
+    if piece is not None and len(piece) >= 4:
+        pieces.append(piece)
+    if closed and len(pieces) > 1 and pieces[0][:2] == points[:2] and pieces[-1][-2:] == points[-2:]:
+        pieces[0] = pieces.pop() + pieces[0][2:] # The outline's start is not a real end
+    return pieces
+
+
+def split_stroke(shape, cuts):
+    """Returns the point lists of the pieces of a freehand stroke left after removing the erased part of each segment."""
+    points = shape.points
+    if len(points) == 2:
+        return [] if cuts[0] else [list(points)]
+    return cut_polyline(list(points), cuts)
+
+
+def cut_shape(shape, cuts):
+    """Returns (kind, point lists) of the pieces left of any shape after removing the erased part of its outline.
+
+    Pieces of lines and rectangles are straight lines; pieces of ovals are strokes
+    through the points of their outline.
+    """
+    if shape.kind in FREEHAND_KINDS:
+        return shape.kind, split_stroke(shape, cuts)
+    points, closed = outline_points(shape)
+    pieces = cut_polyline(points, cuts, closed)
+    if shape.kind == KIND_OVAL:
+        return KIND_STROKE, pieces
+    return KIND_LINE, [piece[i:i + 4] for piece in pieces for i in range(0, len(piece) - 2, 2)] # One line per edge
+
+
+class Eraser:
+    """Deletes or splits the visible shapes of a Document that an eraser sweep touches.
+
+    The document must have been created with a GridIndex.
+    """
+
+    def __init__(self, document):
+        self.document = document
+
+    def find(self, x0, y0, x1, y1, radius):
+        """Returns (shape, segment cuts) for every visible shape touched by the sweep, in painting order."""
+        candidates = self.document.index.query(min(x0, x1) - radius, min(y0, y1) - radius,
+                                               max(x0, x1) + radius, max(y0, y1) + radius)
+        found = []
+        for shape in sorted(candidates, key=shape_order):
+            cuts = segment_cuts(shape, x0, y0, x1, y1, radius)
+            if any(cut is not None for cut in cuts):
+                found.append((shape, cuts))
+        return found
+
+    def sweep(self, x0, y0, x1, y1, radius):
+        """Erases along the sweep and returns a list of (removed shape, pieces that replaced it)."""
+        changes = []
+        for shape, cuts in self.find(x0, y0, x1, y1, radius):
+            kind, piece_points = cut_shape(shape, cuts) # Keeps the parts of the outline the brush missed
+            changes.append((shape, self.document.replace(shape, piece_points, kind)))
+        return changes
@@ -0,0 +1,149 @@
+"""Tiled raster cache for the Simple Paint App.
+
+The drawing is cut into fixed-size square tiles, each rasterized at one zoom
+level into its own RasterCanvas. TileCache keeps the most recently used tiles
+up to a memory cap, so panning back over a part of the drawing costs nothing
+and a drawing of any size only ever holds the tiles that were looked at.
+Edits touch only the tiles under the changed shapes: a new shape is drawn on
+top of the tiles already rendered, while undo and erase mark tiles dirty so
+they are rendered again from the document the next time they are shown.
+
+Tiles know nothing about Tk; each carries an opaque image slot that the app
+fills with a PhotoImage. Needs NumPy, like paint_raster.
+"""
+import math
+from collections import OrderedDict
+
+from paint_document import boxes_overlap
+from paint_raster import RasterCanvas
+
+DEFAULT_TILE_SIZE = 256                 # Tile edge in screen pixels
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024   # Memory the cached tiles may use, bitmaps and images together
+ZOOM_LEVELS = (0.125, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0) # Fixed steps, so zoomed tiles can be reused
+
+
+class Tile:
+    """One rendered square of the drawing at one zoom level."""
+    __slots__ = ("key", "raster", "image", "dirty", "stale")
+
+    def __init__(self, key, raster):
+        self.key = key         # (zoom, column, row)
+        self.raster = raster   # The RasterCanvas holding the tile's pixels
+        self.image = None      # Whatever the app displays the tile with, e.g. a Tk PhotoImage
+        self.dirty = False     # The pixels are out of date and must be rendered again from the document
+        self.stale = True      # The pixels changed since the image was last updated
+
+
+class TileCache:
+    """An LRU cache of rendered tiles with a memory cap."""
+
+    def __init__(self, shapes_in_box, background="white", tile_size=DEFAULT_TILE_SIZE,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.shapes_in_box = shapes_in_box # Returns the visible shapes overlapping a drawing box, in painting order
+        self.background = background
+        self.tile_size = tile_size
+        self.max_bytes = max_bytes
+        self.tile_bytes = tile_size * tile_size * 4 * 2 # RGBA bitmap plus the displayed image of about the same size
+        self.tiles = OrderedDict() # Maps (zoom, column, row) to its Tile, least recently used first
+
+        # Statistics
+        self.hits = 0      # Tiles shown straight from the cache
+        self.renders = 0   # Tiles rendered from the document, new or dirty
+        self.evictions = 0 # Tiles dropped to stay under max_bytes
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def nbytes(self):
+        return len(self.tiles) * self.tile_bytes
+
+    def tile_box(self, key):
+        """Returns the drawing-coordinate (x1, y1, x2, y2) box a tile covers."""
+        zoom, column, row = key
+        span = self.tile_size / zoom
+        return column * span, row * span, (column + 1) * span, (row + 1) * span
+
+    def visible_keys(self, zoom, x1, y1, x2, y2):
+        """Returns the keys of the tiles covering a box given in zoomed (screen) pixels."""
+        size = self.tile_size
+        return [(zoom, column, row)
+                for row in range(math.floor(y1 / size), math.floor((y2 - 1) / size) + 1)
+                for column in range(math.floor(x1 / size), math.floor((x2 - 1) / size) + 1)]
+
+    def render(self, tile):
+        """Draws every visible shape that overlaps the tile into it from scratch."""
+        zoom, column, row = tile.key
+        raster = tile.raster
+        raster.clear()
+        box = self.tile_box(tile.key)
+        pad = 1 / zoom # Catches shapes whose edge pixels spill into the tile
+        for shape in self.shapes_in_box(box[0] - pad, box[1] - pad, box[2] + pad, box[3] + pad):
+            raster.draw_shape(shape)
+        tile.dirty = False
+        tile.stale = True
+        self.renders += 1
+
+    def get(self, key):
+        """Returns the tile for key, rendering it if it is missing or dirty, and marks it recently used."""
+        tile = self.tiles.get(key)
+        if tile is None:
+            zoom, column, row = key
+            raster = RasterCanvas(self.tile_size, self.tile_size, background=self.background)
+            raster.zoom = zoom
+            raster.origin = (column * self.tile_size, row * self.tile_size)
+            tile = self.tiles[key] = Tile(key, raster)
+            self.render(tile)
+        else:
+            self.tiles.move_to_end(key)
+            if tile.dirty:
+                self.render(tile)
+            else:
+                self.hits += 1
+        return tile
+
+    def trim(self, keep=()):
+        """Drops least recently used tiles until the cache fits max_bytes and returns them.
+
+        Tiles whose keys are in keep (usually the visible ones) are never dropped.
+        """
+        dropped = []
+        keep = set(keep)
+        for key in list(self.tiles):
+            if len(self.tiles) * self.tile_bytes <= self.max_bytes:
+                break
+            if key not in keep:
+                dropped.append(self.tiles.pop(key))
+        self.evictions += len(dropped)
+        return dropped
+
+    def draw(self, shape):
+        """Draws a new shape on top of every cached tile it overlaps and returns those tiles."""
+        bounds = shape.bounds()
+        touched = []
+        for tile in self.tiles.values():
+            if not tile.dirty and boxes_overlap(bounds, self.tile_box(tile.key)):
+                tile.raster.draw_shape(shape)
+                tile.stale = True
+                touched.append(tile)
+        return touched
+
+    def invalidate(self, bounds=None):
+        """Marks the cached tiles overlapping bounds (or all of them) to be rendered again when next shown."""
+        for tile in self.tiles.values():
+            if bounds is None or boxes_overlap(bounds, self.tile_box(tile.key)):
+                tile.dirty = True
+
+    def clear(self):
+        self.tiles.clear()
+
+    def stats(self):
+        """Returns a dict with the cache's size and counters."""
+        return {
+            "tile_size": self.tile_size,
+            "tiles": len(self.tiles),
+            "bytes": self.nbytes(),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "renders": self.renders,
+            "evictions": self.evictions,
+        }
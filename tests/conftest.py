@@ -0,0 +1,167 @@
+"""Shared fixtures for the Simple Paint App tests.
+
+The drawing modules are tested directly. PaintApp needs Tk, so app tests run it
+against FakeCanvas, a small in-memory canvas that records every item with its
+coordinates and options, with stand-ins for the other widgets; no display is needed.
+"""
+import itertools
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The app's modules live at the top level
+
+import SimplePaintAppFornewComerstopyhtoncanvas as paint_app
+
+
+class FakeWidget:
+    """Accepts any widget call and ignores it."""
+
+    def __init__(self, *args, **options):
+        self.options = dict(options)
+        self.tk = types.SimpleNamespace(call=lambda *args: None)
+
+    def config(self, **options):
+        self.options.update(options)
+
+    configure = config
+
+    def __getitem__(self, key):
+        return self.options.get(key)
+
+    def __getattr__(self, name):
+        return lambda *args, **options: 0
+
+
+class FakeRoot(FakeWidget):
+    """A root window whose after() callbacks run only when the test calls run_after()."""
+
+    def __init__(self):
+        super().__init__()
+        self.callbacks = {}
+        self.ids = itertools.count(1)
+
+    def after(self, delay, function=None, *args):
+        timer_id = next(self.ids)
+        self.callbacks[timer_id] = (function, args)
+        return timer_id
+
+    def after_cancel(self, timer_id):
+        self.callbacks.pop(timer_id, None)
+
+    def run_after(self):
+        callbacks = list(self.callbacks.values())
+        self.callbacks.clear()
+        for function, args in callbacks:
+            function(*args)
+
+
+class FakeCanvas(FakeWidget):
+    """Keeps canvas items as dicts of kind, coords and options, in stacking order."""
+
+    def __init__(self, *args, **options):
+        super().__init__(*args, **options)
+        self.options.setdefault("bg", "white")
+        self.items = {} # Maps each item ID to {"kind", "coords", "options"}
+        self.ids = itertools.count(1)
+        self.view = (0, 0) # Canvas coordinates of the window's top-left corner
+        self.size = (1000, 650) # Window size in pixels
+        self.mark = None
+
+    def create(self, kind, coords, options):
+        if len(coords) == 1:
+            coords = tuple(coords[0])
+        item_id = next(self.ids)
+        self.items[item_id] = {"kind": kind, "coords": list(coords), "options": dict(options)}
+        return item_id
+
+    def create_line(self, *coords, **options):
+        return self.create("line", coords, options)
+
+    def create_rectangle(self, *coords, **options):
+        return self.create("rectangle", coords, options)
+
+    def create_oval(self, *coords, **options):
+        return self.create("oval", coords, options)
+
+    def create_image(self, *coords, **options):
+        return self.create("image", coords, options)
+
+    def create_text(self, *coords, **options):
+        return self.create("text", coords, options)
+
+    def coords(self, item_id, *coords):
+        if not coords:
+            return self.items[item_id]["coords"]
+        if len(coords) == 1:
+            coords = tuple(coords[0])
+        self.items[item_id]["coords"] = list(coords)
+
+    def itemconfigure(self, item_id, **options):
+        self.items[item_id]["options"].update(options)
+
+    def itemcget(self, item_id, option):
+        return self.items[item_id]["options"].get(option, "")
+
+    def delete(self, *item_ids):
+        for item_id in item_ids:
+            if item_id == "all":
+                self.items.clear()
+            else:
+                self.items.pop(item_id, None)
+
+    def find_all(self):
+        return tuple(self.items)
+
+    def state(self, item_id):
+        return self.items[item_id]["options"].get("state") or "normal"
+
+    def canvasx(self, x):
+        return x + self.view[0]
+
+    def canvasy(self, y):
+        return y + self.view[1]
+
+    def scan_mark(self, x, y):
+        self.mark = (x, y, self.view)
+
+    def scan_dragto(self, x, y, gain=10):
+        mark_x, mark_y, (view_x, view_y) = self.mark
+        self.view = (view_x - gain * (x - mark_x), view_y - gain * (y - mark_y))
+
+    def winfo_width(self):
+        return self.size[0]
+
+    def winfo_height(self):
+        return self.size[1]
+
+
+class PointerEvent:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+@pytest.fixture
+def make_app(monkeypatch):
+    """Returns a function that builds a PaintApp on a FakeCanvas; its options go to PaintApp."""
+    fake_tk = types.SimpleNamespace(Tk=FakeRoot, Frame=FakeWidget, Button=FakeWidget, Label=FakeWidget,
+                                    Scale=FakeWidget, Toplevel=FakeWidget, PhotoImage=FakeWidget,
+                                    Canvas=FakeCanvas, ROUND="round", TRUE=1, FALSE=0)
+    monkeypatch.setattr(paint_app, "tk", fake_tk)
+
+    def make(**options):
+        options.setdefault("input_rate", None) # Handlers run as soon as an event arrives
+        return paint_app.PaintApp(FakeRoot(), **options)
+    return make
+
+
+def drag(app, points, mode="draw"):
+    """Feeds one press-drag-release gesture through the points to the app's handlers."""
+    app.drawing_mode = mode
+    app.start_action(PointerEvent(*points[0]))
+    for x, y in points[1:]:
+        app.perform_action(PointerEvent(x, y))
+    app.stop_action(PointerEvent(*points[-1]))
@@ -0,0 +1,49 @@
+"""PaintApp's canvas items must always show exactly the document's visible shapes."""
+import random
+
+import pytest
+
+from conftest import drag
+import SimplePaintAppFornewComerstopyhtoncanvas as paint_app
+
+
+def shown_shapes(app):
+    """Returns the shapes that have at least one canvas item that is not hidden."""
+    canvas = app.canvas
+    return {shape for shape, items in app.shape_items.items()
+            if any(item_id in canvas.items and canvas.state(item_id) != "hidden" for item_id in items)}
+
+
+def bent_stroke(rng):
+    x, y = rng.randint(50, 900), rng.randint(50, 550)
+    return [(x + i * 6, y + (i * i) % 40) for i in range(12)]
+
+
+def test_compacted_stroke_stays_hidden_after_erase(make_app):
+    app = make_app(stroke_mode=paint_app.STROKE_MODE_SEGMENTS, history_steps=2, simplify_tolerance=0)
+    drag(app, [(100, 100), (150, 130), (200, 100), (250, 130)])
+    app.brush_size = 60 # Wide enough to erase the whole stroke in one sweep
+    drag(app, [(x, 115) for x in range(60, 300, 4)], mode="erase")
+    drag(app, [(400, 400), (450, 420)]) # Flattens the first step, compacting the stroke's segments
+    assert shown_shapes(app) == set(app.document.visible_shapes())
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("stroke_mode", [paint_app.STROKE_MODE_SEGMENTS, paint_app.STROKE_MODE_POLYLINE])
+def test_random_session_items_match_document(make_app, seed, stroke_mode):
+    rng = random.Random(seed)
+    app = make_app(stroke_mode=stroke_mode, history_steps=3, simplify_tolerance=rng.choice([0, 1.0]))
+    for _ in range(60):
+        action = rng.random()
+        if action < 0.4:
+            drag(app, bent_stroke(rng))
+        elif action < 0.55:
+            app.brush_size = rng.randint(3, 30)
+            drag(app, bent_stroke(rng), mode="erase")
+        elif action < 0.7:
+            drag(app, bent_stroke(rng)[:4], mode=rng.choice(["rectangle", "circle", "line"]))
+        elif action < 0.85:
+            app.undo_action()
+        else:
+            app.redo_action()
+        assert shown_shapes(app) == set(app.document.visible_shapes())
@@ -0,0 +1,121 @@
+"""Document history: undo, redo, discarding the redo branch and flattening old steps within the budget."""
+import random
+
+import pytest
+
+from paint_document import KIND_RECTANGLE, KIND_STROKE, Document, Shape, StrokeEngine
+from paint_spatial import GridIndex
+
+
+def stroke(x, y, length=5):
+    return Shape(KIND_STROKE, "black", 3, [value for i in range(length) for value in (x + i * 10, y + i * 3)])
+
+
+def test_undo_and_redo_move_through_history():
+    document = Document(index=GridIndex())
+    first, second = stroke(0, 0), stroke(100, 100)
+    document.commit([first])
+    document.commit([second])
+    assert document.visible_shapes() == [first, second]
+    assert document.undo().added == [second]
+    assert document.visible_shapes() == [first]
+    assert document.undo().added == [first]
+    assert document.undo() is None
+    assert document.visible_shapes() == []
+    assert document.redo().added == [first]
+    assert document.visible_shapes() == [first]
+    assert document.can_redo()
+
+
+def test_new_step_discards_the_redo_branch():
+    document = Document()
+    document.commit([stroke(0, 0)])
+    document.commit([stroke(50, 50)])
+    document.undo()
+    replacement = stroke(200, 0)
+    document.commit([replacement])
+    assert not document.can_redo()
+    assert len(document.history) == 2
+    assert document.visible_shapes()[-1] is replacement
+
+
+def test_step_budget_bakes_oldest_steps():
+    document = Document(index=GridIndex(), max_steps=3)
+    baked = []
+    document.on_bake = baked.append
+    shapes = [stroke(i * 20, 0) for i in range(5)]
+    for shape in shapes:
+        document.commit([shape])
+    assert [step.added[0] for step in baked] == shapes[:2]
+    assert len(document.history) == 3
+    for _ in range(5):
+        document.undo()
+    assert document.visible_shapes() == shapes[:2] # Baked shapes can no longer be undone
+    assert document.memory_usage()["baked_shapes"] == 2
+
+
+def test_byte_budget_bounds_history():
+    document = Document(max_bytes=2000)
+    for i in range(50):
+        document.commit([stroke(i, i, length=20)])
+    assert 0 < document.history_bytes <= 2000
+    assert document.history_bytes == sum(step.nbytes for step in document.history)
+    assert len(document.visible_shapes()) == 50
+
+
+def test_baking_an_erase_forgets_the_erased_shape():
+    document = Document(index=GridIndex(), max_steps=1)
+    shape = stroke(0, 0)
+    document.commit([shape])
+    document.commit([], removed=[shape])
+    document.commit([stroke(100, 0)]) # Flattens the erase step
+    assert shape not in document.baked
+    assert shape not in document.visible_shapes()
+
+
+def test_split_pieces_keep_the_stroke_place_in_painting_order():
+    document = Document(index=GridIndex())
+    below, middle, above = stroke(0, 0), stroke(0, 10), stroke(0, 20)
+    document.commit([below])
+    document.commit([middle])
+    document.commit([above])
+    pieces = document.replace(middle, [[0, 10, 10, 13], [30, 19, 40, 22]])
+    assert document.visible_shapes() == [below] + pieces + [above]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_index_and_history_agree(seed):
+    """A document with a spatial index and one without must always show the same shapes."""
+    rng = random.Random(seed)
+    indexed, plain = Document(index=GridIndex(), max_steps=4), Document(max_steps=4)
+    for _ in range(200):
+        action = rng.random()
+        if action < 0.5:
+            shape = stroke(rng.randint(0, 500), rng.randint(0, 500))
+            twin = Shape(shape.kind, shape.color, shape.width, shape.points)
+            indexed.commit([shape])
+            plain.commit([twin])
+        elif action < 0.6 and indexed.visible_shapes():
+            position = rng.randrange(len(indexed.visible_shapes()))
+            indexed.commit([], removed=[indexed.visible_shapes()[position]])
+            plain.commit([], removed=[plain.visible_shapes()[position]])
+        elif action < 0.8:
+            indexed.undo()
+            plain.undo()
+        else:
+            indexed.redo()
+            plain.redo()
+        assert [list(shape.points) for shape in indexed.visible_shapes()] == \
+            [list(shape.points) for shape in plain.visible_shapes()]
+
+
+def test_engine_click_without_drag_draws_nothing():
+    document = Document()
+    engine = StrokeEngine(document)
+    engine.press("draw", 10, 10, "black", 3)
+    assert engine.release(10, 10) is None
+    engine.press("rectangle", 10, 10, "black", 3)
+    engine.drag(50, 40)
+    step = engine.release(60, 45)
+    assert step.added[0].kind == KIND_RECTANGLE
+    assert list(step.added[0].points) == [10, 10, 60, 45]
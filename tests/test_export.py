@@ -0,0 +1,105 @@
+"""Banded PNG export must match rendering the whole area in one RasterCanvas."""
+import random
+import struct
+import threading
+import types
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import paint_export
+import paint_raster
+from paint_document import KIND_LINE, KIND_OVAL, KIND_RECTANGLE, KIND_STROKE, Shape
+
+
+def decode_png(data):
+    """Returns the (height, width, channels) pixels of a PNG written with filter type None."""
+    offset = 8
+    idat = b""
+    while offset < len(data):
+        (length,) = struct.unpack_from(">I", data, offset)
+        tag = data[offset + 4:offset + 8]
+        if tag == b"IHDR":
+            width, height, depth, color_type = struct.unpack_from(">IIBB", data, offset + 8)
+        elif tag == b"IDAT":
+            idat += data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+    channels = 4 if color_type == 6 else 3
+    rows = np.frombuffer(zlib.decompress(idat), dtype=np.uint8).reshape(height, 1 + width * channels)
+    assert not rows[:, 0].any() # Every scanline uses filter type None
+    return rows[:, 1:].reshape(height, width, channels)
+
+
+def random_shapes(rng, count, size):
+    shapes = []
+    for _ in range(count):
+        kind = rng.choice([KIND_STROKE, KIND_RECTANGLE, KIND_OVAL, KIND_LINE])
+        points = [rng.randint(-20, size + 20) for _ in range(8 if kind == KIND_STROKE else 4)]
+        shapes.append(Shape(kind, rng.choice(["black", "#cc3300", "#0055aa"]), rng.randint(1, 9), points))
+    return shapes
+
+
+def full_render(shapes, box):
+    left, top, right, bottom = box
+    raster = paint_raster.RasterCanvas(right - left, bottom - top)
+    raster.origin = (left, top)
+    raster.render(shapes)
+    return raster.composite()
+
+
+@pytest.mark.parametrize("box, band_height", [((0, 0, 300, 200), 64), ((-30, -10, 257, 311), 37), ((5, 7, 90, 40), 128)])
+def test_banded_export_matches_a_full_render(box, band_height):
+    shapes = random_shapes(random.Random(band_height), 60, 300)
+    png, thumbnails = paint_export.ExportJob(shapes, box, band_height=band_height,
+                                             thumbnail_sizes=(64, 25)).finish()
+    image = full_render(shapes, box)
+    assert np.array_equal(decode_png(png), image)
+    for size, data in thumbnails.items():
+        assert np.array_equal(decode_png(data), paint_export.thumbnail(image, size))
+
+
+def test_transparent_export_keeps_alpha():
+    shapes = random_shapes(random.Random(2), 20, 100)
+    png, thumbnails = paint_export.ExportJob(shapes, (0, 0, 100, 100), transparent=True, band_height=30).finish()
+    raster = paint_raster.RasterCanvas(100, 100)
+    raster.render(shapes)
+    assert np.array_equal(decode_png(png), raster.pixels)
+
+
+def test_adler32_combine_matches_zlib():
+    rng = random.Random(3)
+    for _ in range(50):
+        first = bytes(rng.randrange(256) for _ in range(rng.randint(0, 300)))
+        second = bytes(rng.randrange(256) for _ in range(rng.randint(0, 300)))
+        assert paint_export.adler32_combine(zlib.adler32(first), zlib.adler32(second), len(second)) == \
+            zlib.adler32(first + second)
+
+
+def test_snapshot_ignores_later_edits():
+    shape = Shape(KIND_STROKE, "black", 3, [0, 0, 10, 10])
+    (record,) = paint_export.snapshot([shape])
+    shape.append_point(50, 50)
+    assert list(paint_export.to_shape(record).points) == [0, 0, 10, 10]
+
+
+def test_cancel_drops_bands_not_started():
+    gate = threading.Event()
+    with ThreadPoolExecutor(1) as executor:
+        executor.submit(gate.wait) # Keeps the only worker busy
+        shapes = random_shapes(random.Random(4), 10, 100)
+        job = paint_export.ExportJob(shapes, (0, 0, 100, 100), executor=executor, band_height=20)
+        job.cancel()
+        gate.set()
+    assert all(result.cancelled() for result in job.results)
+
+
+def test_closing_the_app_cancels_its_export(make_app):
+    app = make_app()
+    cancelled = []
+    app.export_job = types.SimpleNamespace(cancel=lambda: cancelled.append(True))
+    app.close_export_pool()
+    assert cancelled == [True] and app.export_job is None
+    app.poll_export() # A poll still scheduled does nothing
@@ -0,0 +1,99 @@
+"""Round trips and corrupt input for the binary drawing format."""
+import os
+import random
+
+import pytest
+
+import paint_format
+from paint_document import KIND_LINE, KIND_OVAL, KIND_RECTANGLE, KIND_STROKE, Shape
+
+
+def sample_shapes():
+    return [
+        Shape(KIND_STROKE, "black", 3, [10, 10, 20, 25, 30, 5]),
+        Shape(KIND_RECTANGLE, "#cc3300", 1, [-5, -5, 100, 80]),
+        Shape(KIND_OVAL, "grün", 8, [0, 0, 40, 40]),                # Non-ASCII color names survive
+        Shape(KIND_LINE, "black", 2, [0, 0, 70000, -70000]),          # Outside int16: stored as float32
+    ]
+
+
+def same(a, b):
+    return (a.kind, a.color, a.width, list(a.points)) == (b.kind, b.color, b.width, list(b.points))
+
+
+@pytest.fixture
+def saved(tmp_path):
+    path = str(tmp_path / ("drawing" + paint_format.DRAWING_EXTENSION))
+    paint_format.save_drawing(path, sample_shapes())
+    return path
+
+
+def test_round_trip(saved):
+    loaded = paint_format.load_drawing(saved)
+    assert len(loaded) == 4
+    assert all(same(a, b) for a, b in zip(sample_shapes(), loaded))
+
+
+def test_shapes_are_decoded_on_demand(saved):
+    with paint_format.DrawingFile(saved) as drawing:
+        assert len(drawing) == 4
+        assert same(drawing.shape(2), sample_shapes()[2])
+        with pytest.raises(IndexError):
+            drawing.shape(4)
+
+
+def test_empty_drawing(tmp_path):
+    path = str(tmp_path / "empty.spdr")
+    assert paint_format.save_drawing(path, []) == 0
+    assert paint_format.load_drawing(path) == []
+
+
+def test_not_a_drawing(tmp_path):
+    path = tmp_path / "notes.spdr"
+    path.write_bytes(b"hello, this is not a drawing at all")
+    with pytest.raises(paint_format.DrawingFormatError):
+        paint_format.load_drawing(str(path))
+
+
+def test_every_truncation_is_a_format_error(saved, tmp_path):
+    data = open(saved, "rb").read()
+    path = tmp_path / "cut.spdr"
+    for size in range(len(data)):
+        path.write_bytes(data[:size])
+        with pytest.raises(paint_format.DrawingFormatError):
+            paint_format.load_drawing(str(path))
+
+
+def test_corrupt_bytes_never_escape_as_other_errors(saved, tmp_path):
+    data = open(saved, "rb").read()
+    path = tmp_path / "corrupt.spdr"
+    rng = random.Random(1)
+    for _ in range(500):
+        corrupt = bytearray(data)
+        for _ in range(rng.randint(1, 4)):
+            corrupt[rng.randrange(len(corrupt))] = rng.randrange(256)
+        path.write_bytes(bytes(corrupt))
+        try:
+            paint_format.load_drawing(str(path))
+        except paint_format.DrawingFormatError:
+            pass
+
+
+def test_failed_open_closes_the_mapping(saved, monkeypatch):
+    data = open(saved, "rb").read()
+    with open(saved, "wb") as stream:
+        stream.write(data[:-3])
+    closed = []
+    close = paint_format.DrawingFile.close
+    monkeypatch.setattr(paint_format.DrawingFile, "close", lambda self: (closed.append(self), close(self)))
+    with pytest.raises(paint_format.DrawingFormatError):
+        paint_format.DrawingFile(saved)
+    assert len(closed) == 1 and closed[0].data.closed
+
+
+def test_failed_save_removes_the_temp_file(saved):
+    broken = sample_shapes() + [Shape("sparkle", "black", 1, [0, 0])] # No kind code: fails mid-write
+    with pytest.raises(KeyError):
+        paint_format.save_drawing(saved, broken)
+    assert not os.path.exists(saved + ".tmp")
+    assert len(paint_format.load_drawing(saved)) == len(sample_shapes()) # The old drawing is untouched
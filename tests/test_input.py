@@ -0,0 +1,82 @@
+"""The frame-paced input pipeline, on its own and driving the app."""
+from conftest import FakeRoot, PointerEvent
+from paint_input import InputPipeline
+
+
+class Handlers:
+    """Records every call the pipeline makes, in order."""
+
+    def __init__(self):
+        self.calls = []
+
+    def pipeline(self, root, **options):
+        return InputPipeline(root, lambda event: self.calls.append(("press", event.x, event.y)),
+                             lambda batch: self.calls.append(("drag", list(batch))),
+                             lambda event: self.calls.append(("release", event.x, event.y)),
+                             lambda event: self.calls.append(("hover", event.x, event.y)), **options)
+
+
+def test_drags_wait_for_the_frame_tick():
+    root, handlers = FakeRoot(), Handlers()
+    pipeline = handlers.pipeline(root, rate_hz=100)
+    pipeline.press(PointerEvent(0, 0))
+    for x in range(1, 6):
+        pipeline.drag(PointerEvent(x, x))
+    assert handlers.calls == [("press", 0, 0)]
+    assert len(root.callbacks) == 1 # One timer per frame, however many samples arrive
+    assert next(iter(root.callbacks.values()))[0] == pipeline.tick
+    root.run_after()
+    assert handlers.calls[1:] == [("drag", [(x, x) for x in range(1, 6)])]
+    assert pipeline.timer_id is None and not root.callbacks # The timer only runs while samples wait
+    stats = pipeline.stats()
+    assert stats["frames"] == 1 and stats["drag_samples"] == 5 and stats["mean_batch"] == 5
+
+
+def test_full_queue_flushes_early():
+    root, handlers = FakeRoot(), Handlers()
+    pipeline = handlers.pipeline(root, max_depth=4)
+    for x in range(10):
+        pipeline.drag(PointerEvent(x, 0))
+    assert handlers.calls == [("drag", [(x, 0) for x in range(4)]), ("drag", [(x, 0) for x in range(4, 8)])]
+    assert pipeline.drag_queue == [(8, 0), (9, 0)]
+    assert pipeline.stats()["forced_flushes"] == 2
+    assert pipeline.stats()["peak_depth"] == 4
+
+
+def test_hover_keeps_only_the_latest_position():
+    root, handlers = FakeRoot(), Handlers()
+    pipeline = handlers.pipeline(root)
+    for x in range(5):
+        pipeline.hover(PointerEvent(x, 7))
+    root.run_after()
+    assert handlers.calls == [("hover", 4, 7)]
+    assert pipeline.stats()["samples_coalesced"] == 4
+
+
+def test_press_and_release_flush_queued_motion_first():
+    root, handlers = FakeRoot(), Handlers()
+    pipeline = handlers.pipeline(root)
+    pipeline.hover(PointerEvent(1, 1))
+    pipeline.press(PointerEvent(2, 2)) # The waiting hover is shown before the press
+    pipeline.drag(PointerEvent(3, 3))
+    pipeline.drag(PointerEvent(4, 4))
+    pipeline.release(PointerEvent(4, 4))
+    assert handlers.calls == [("hover", 1, 1), ("press", 2, 2), ("drag", [(3, 3), (4, 4)]), ("release", 4, 4)]
+    assert not root.callbacks # The release cancelled the pending frame
+    root.run_after()
+    assert len(handlers.calls) == 4
+
+
+def test_paced_app_draws_the_same_stroke(make_app):
+    points = [(10 + i * 7, 20 + (i * i) % 50) for i in range(40)]
+    paced = make_app(input_rate=120, simplify_tolerance=0)
+    pipeline = paced.input_pipeline
+    pipeline.press(PointerEvent(*points[0]))
+    for x, y in points[1:]:
+        pipeline.drag(PointerEvent(x, y))
+    assert not paced.document.visible_shapes() # Nothing is drawn before the frame tick
+    paced.root.run_after()
+    pipeline.release(PointerEvent(*points[-1]))
+    (shape,) = paced.document.visible_shapes()
+    assert list(shape.points) == [value for point in points for value in point]
+    assert pipeline.stats()["frames"] == 1
@@ -0,0 +1,70 @@
+"""The opt-in Profiler: handler counters, history peaks, the HUD and the JSON report."""
+import json
+
+import pytest
+
+from conftest import drag
+import paint_replay
+from paint_profile import Profiler
+
+
+def test_counts_handlers_and_restores_them(make_app):
+    app = make_app()
+    original = app.start_action
+    profiler = Profiler(app).install()
+    drag(app, [(10, 10), (40, 30), (80, 20)])
+    app.undo_action()
+    report = profiler.report()
+    assert report["handlers"]["start_action"]["calls"] == 1
+    assert report["handlers"]["perform_batch"]["points"] == 2
+    assert report["handlers"]["undo_action"]["calls"] == 1
+    profiler.uninstall()
+    assert app.start_action == original
+
+
+def test_history_peak_survives_clear(make_app):
+    app = make_app()
+    profiler = Profiler(app).install()
+    for i in range(5):
+        drag(app, [(10, 10 + i), (300, 200 + i), (500, 20)])
+    app.clear_canvas()
+    report = profiler.report()
+    assert report["history"]["history_bytes"] == 0
+    assert report["peak_history_bytes"] > 0
+
+
+def test_hud_is_not_counted_and_survives_clear(make_app):
+    app = make_app()
+    profiler = Profiler(app).install()
+    drag(app, [(10, 10), (40, 30)])
+    profiler.toggle_hud()
+    assert profiler.report()["canvas_items"] == 1
+    app.clear_canvas()
+    assert all(item_id in app.canvas.items for item_id in profiler.hud_items)
+    profiler.toggle_hud()
+    assert profiler.hud_items is None and not app.root.callbacks
+
+
+def test_failed_save_leaves_no_file(make_app, tmp_path, monkeypatch):
+    app = make_app()
+    profiler = Profiler(app).install()
+    path = tmp_path / "profile.json"
+    profiler.save(str(path))
+    assert json.loads(path.read_text())["handlers"] == {}
+    path.unlink()
+
+    def destroyed():
+        raise RuntimeError("the canvas is gone")
+    monkeypatch.setattr(app.canvas, "find_all", destroyed)
+    with pytest.raises(RuntimeError):
+        profiler.save(str(path))
+    assert not path.exists()
+
+
+def test_profiles_a_headless_session():
+    session = paint_replay.HeadlessSession()
+    profiler = Profiler(session).install()
+    paint_replay.replay(paint_replay.build_workload("deep-undo"), session)
+    report = profiler.report()
+    assert report["handlers"]["undo_action"]["calls"] == 750 # 500 undone, then half of them again
+    assert "update_indicator" not in profiler.handlers
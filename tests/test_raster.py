@@ -0,0 +1,48 @@
+"""Polyline rasterizing must match drawing each segment on its own, pixel for pixel."""
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import paint_raster
+from paint_document import KIND_STROKE, Shape
+
+
+def segment_by_segment(raster, shape):
+    """Draws a stroke the slow way, one _segment call per segment."""
+    points, width = raster.place(shape)
+    rgba = paint_raster.parse_color(shape.color)
+    if len(points) == 2:
+        raster._segment(points[0], points[1], points[0], points[1], width, rgba)
+    for i in range(0, len(points) - 2, 2):
+        raster._segment(*points[i:i + 4], width, rgba)
+
+
+def random_stroke(rng):
+    x, y = rng.randint(-50, 350), rng.randint(-50, 250)
+    points = []
+    for _ in range(rng.randint(1, 120)):
+        jump = 80 if rng.random() < 0.2 else 4 # Mostly short segments, with some long enough to be drawn alone
+        x += rng.randint(-jump, jump)
+        y += rng.randint(-jump, jump)
+        points += [x, y]
+    if rng.random() < 0.1:
+        points = points[:2] * 3 # Zero-length segments draw a dot
+    return Shape(KIND_STROKE, "black", rng.randint(1, 40), points)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_chunked_polyline_matches_single_segments(seed, monkeypatch):
+    rng = random.Random(seed)
+    monkeypatch.setattr(paint_raster, "POLYLINE_CHUNK_CELLS", rng.choice([1, 500, 1 << 15])) # Many or few chunks
+    for _ in range(50):
+        shape = random_stroke(rng)
+        zoom, origin = rng.choice([1, 1, 0.5, 1.37]), (rng.randint(-40, 40), rng.randint(-40, 40))
+        clip = rng.choice([None, (30, 20, 250, 150)])
+        fast, slow = paint_raster.RasterCanvas(300, 200), paint_raster.RasterCanvas(300, 200)
+        for raster in (fast, slow):
+            raster.zoom, raster.origin, raster.clip = zoom, origin, clip
+        fast.draw_shape(shape)
+        segment_by_segment(slow, shape)
+        assert np.array_equal(fast.pixels, slow.pixels)
@@ -0,0 +1,61 @@
+"""The raster backend's bitmap must keep showing the drawing wherever the view is panned or resized."""
+import random
+
+import numpy as np
+import pytest
+
+from conftest import drag
+import SimplePaintAppFornewComerstopyhtoncanvas as paint_app
+import paint_raster
+
+pytestmark = pytest.mark.skipif(paint_app.optional_module("paint_raster") is None, reason="needs NumPy")
+
+
+def expected_pixels(app):
+    """Renders the document from scratch into a bitmap at the app raster's size and origin."""
+    raster = paint_raster.RasterCanvas(app.raster.width, app.raster.height)
+    raster.origin = app.raster.origin
+    raster.render(app.document.visible_shapes())
+    return raster.pixels
+
+
+def test_stroke_drawn_after_panning_is_baked(make_app):
+    app = make_app(render_backend=paint_app.RENDER_BACKEND_RASTER)
+    app.scroll_view(600, 0)
+    drag(app, [(100, 100), (200, 150), (300, 100)]) # Window positions; the stroke lands at x 700 to 900
+    assert app.raster.origin == (600, 0)
+    assert np.count_nonzero(app.raster.pixels[..., 3])
+    assert np.array_equal(app.raster.pixels, expected_pixels(app))
+    assert app.canvas.coords(app.raster_image_id) == [600, 0]
+
+
+def test_raster_grows_with_the_window(make_app):
+    app = make_app(render_backend=paint_app.RENDER_BACKEND_RASTER)
+    drag(app, [(1000, 600), (1300, 900)])
+    app.canvas.size = (1500, 1000)
+    app.view_changed() # What the <Configure> binding does
+    assert (app.raster.width, app.raster.height) == (1500, 1000)
+    assert np.array_equal(app.raster.pixels, expected_pixels(app))
+
+
+def test_random_pans_match_a_full_render(make_app):
+    rng = random.Random(1)
+    app = make_app(render_backend=paint_app.RENDER_BACKEND_RASTER)
+    for _ in range(30):
+        x, y = rng.randint(0, 900), rng.randint(0, 600)
+        drag(app, [(x, y), (x + rng.randint(-200, 200), y + rng.randint(-200, 200)), (x + 40, y + 90)])
+        app.scroll_view(rng.randint(-700, 700), rng.randint(-500, 500))
+        if rng.random() < 0.3:
+            app.undo_action()
+    assert np.array_equal(app.raster.pixels, expected_pixels(app))
+
+
+def test_shift_keeps_covered_pixels():
+    raster = paint_raster.RasterCanvas(40, 30)
+    raster.pixels[...] = np.arange(40 * 30 * 4, dtype=np.uint32).reshape(30, 40, 4).astype(np.uint8)
+    before = raster.pixels.copy()
+    uncovered = raster.shift(5, -3)
+    assert raster.origin == (5, -3)
+    assert np.array_equal(raster.pixels[3:, :35], before[:27, 5:])
+    assert sorted(uncovered) == [(0, 0, 40, 3), (35, 0, 40, 30)]
+    assert not raster.pixels[:3].any() and not raster.pixels[:, 35:].any()
@@ -0,0 +1,119 @@
+"""Input logs: encoding round trips, files and deterministic headless replay."""
+import pytest
+
+from conftest import drag
+import SimplePaintAppFornewComerstopyhtoncanvas as paint_app
+import paint_replay
+from paint_replay import OP_CLEAR, OP_DRAG, OP_PRESS, OP_REDO, OP_RELEASE, OP_UNDO, InputLog
+
+
+def sample_log():
+    log = InputLog()
+    log.press("draw", "black", 3, 10, 20)
+    log.drag(15, 25)
+    log.drag(-40000, 40000) # Clamped to int16
+    log.release(15, 25)
+    log.press("rectangle", "#ff8800", 7, 1, 2)
+    log.release(30, 40)
+    log.undo()
+    log.redo()
+    log.press("erase", "black", 12, 0, 0) # A color seen before is not defined again
+    log.release(5, 5)
+    log.clear()
+    return log
+
+
+EXPECTED = [
+    (OP_PRESS, 10, 20, "draw", "black", 3), (OP_DRAG, 15, 25), (OP_DRAG, -32768, 32767), (OP_RELEASE, 15, 25),
+    (OP_PRESS, 1, 2, "rectangle", "#ff8800", 7), (OP_RELEASE, 30, 40), (OP_UNDO,), (OP_REDO,),
+    (OP_PRESS, 0, 0, "erase", "black", 12), (OP_RELEASE, 5, 5), (OP_CLEAR,),
+]
+
+
+def test_events_round_trip():
+    log = sample_log()
+    assert len(log) == len(EXPECTED)
+    assert list(log) == EXPECTED
+    copy = InputLog(bytes(log.data))
+    assert list(copy) == EXPECTED
+    assert len(copy) == len(EXPECTED)
+    assert copy.colors == {"black": 0, "#ff8800": 1}
+
+
+def test_file_round_trip(tmp_path):
+    path = str(tmp_path / ("session" + paint_replay.LOG_EXTENSION))
+    sample_log().save(path)
+    assert list(InputLog.load(path)) == EXPECTED
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "notes.splg"
+    path.write_bytes(b"NOPE\x01\x00")
+    with pytest.raises(ValueError):
+        InputLog.load(str(path))
+
+
+def test_unknown_record_is_an_error():
+    with pytest.raises(ValueError):
+        list(InputLog(b"\x63"))
+
+
+@pytest.mark.parametrize("data", [b"SP", b"SPLG\x01\x00\x01", b"SPLG\x01\x00\x06\x05\x00bl"])
+def test_load_rejects_truncated_logs(tmp_path, data):
+    path = tmp_path / "short.splg"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        InputLog.load(str(path))
+
+
+def test_press_needs_a_defined_color():
+    with pytest.raises(ValueError):
+        InputLog(paint_replay.PRESS.pack(OP_PRESS, 0, 0, 0, 3, 0))
+    with pytest.raises(ValueError):
+        InputLog(paint_replay.COLOR.pack(paint_replay.OP_COLOR, 1) + b"k" + paint_replay.PRESS.pack(OP_PRESS, 0, 0, 99, 3, 0))
+
+
+def test_every_truncation_is_a_value_error():
+    data = bytes(sample_log().data)
+    for end in range(len(data)):
+        try:
+            InputLog(data[:end])
+        except ValueError:
+            pass
+
+
+@pytest.mark.parametrize("name", sorted(paint_replay.WORKLOADS))
+def test_replay_is_deterministic(name):
+    log = paint_replay.build_workload(name)
+    results = []
+    for _ in range(2):
+        session = paint_replay.HeadlessSession(history_steps=50)
+        assert paint_replay.replay(log, session, batch_drags=True) == len(log)
+        results.append([(shape.kind, list(shape.points)) for shape in session.document.visible_shapes()])
+    assert results[0] == results[1]
+    assert results[0] or name == "eraser-storm"
+
+
+def drawn(target):
+    return [(shape.kind, list(shape.points)) for shape in target.document.visible_shapes()]
+
+
+@pytest.mark.parametrize("backend", [paint_app.RENDER_BACKEND_VECTOR, paint_app.RENDER_BACKEND_TILED])
+def test_replay_follows_the_view(make_app, backend):
+    if backend == paint_app.RENDER_BACKEND_TILED and paint_app.optional_module("paint_tiles") is None:
+        pytest.skip("needs NumPy")
+    app = make_app(render_backend=backend, simplify_tolerance=0)
+    recorder = paint_replay.Recorder(app).install()
+    drag(app, [(100, 100), (150, 120), (200, 100)])
+    app.scroll_view(500, 0)
+    drag(app, [(100, 100), (150, 120), (200, 100)]) # The same window positions, 500 px further right in the drawing
+    app.zoom_at(0, 0, 1) # Only the tiled backend zooms
+    drag(app, [(300, 300), (350, 320)], mode="rectangle")
+    recorder.uninstall()
+    assert drawn(app)[1][1] == [600, 100, 650, 120, 700, 100]
+    session = paint_replay.HeadlessSession()
+    paint_replay.replay(recorder.log, session)
+    assert drawn(session) == drawn(app)
+    replayed = make_app(render_backend=backend, simplify_tolerance=0)
+    paint_replay.replay(recorder.log, replayed)
+    assert drawn(replayed) == drawn(app)
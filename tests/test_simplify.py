@@ -0,0 +1,64 @@
+"""StrokeSimplifier and the adaptive spline steps."""
+import math
+import random
+
+import pytest
+
+from paint_document import KIND_STROKE, Shape
+from paint_simplify import MAX_SPLINE_STEPS, StrokeSimplifier, spline_steps, turn_steps
+from paint_spatial import point_segment_distance2
+
+
+def simplify(samples, tolerance):
+    simplifier = StrokeSimplifier(tolerance)
+    shape = Shape(KIND_STROKE, "black", 3, list(samples[0]))
+    simplifier.start(shape)
+    for x, y in samples[1:]:
+        simplifier.add(shape, x, y)
+    return simplifier, shape
+
+
+def jittery_curve(seed, count=500):
+    rng = random.Random(seed)
+    return [(round(200 + 150 * math.cos(i / 40)) + rng.randint(-1, 1), round(200 + 100 * math.sin(i / 25)) + rng.randint(-1, 1))
+            for i in range(count)]
+
+
+@pytest.mark.parametrize("tolerance", [0.5, 1, 2, 4])
+@pytest.mark.parametrize("seed", range(3))
+def test_dropped_samples_stay_within_tolerance(tolerance, seed):
+    samples = jittery_curve(seed)
+    _, shape = simplify(samples, tolerance)
+    points = list(shape.points)
+    assert points[:2] == list(samples[0]) and points[-2:] == list(samples[-1]) # The ends are never moved
+    segments = [points[i:i + 4] for i in range(0, len(points) - 2, 2)]
+    for x, y in samples:
+        nearest = min(point_segment_distance2(x, y, *segment) for segment in segments)
+        assert nearest <= tolerance * tolerance + 1e-9
+
+
+def test_zero_tolerance_keeps_every_sample():
+    samples = jittery_curve(1, count=50)
+    _, shape = simplify(samples, 0)
+    assert list(shape.points) == [value for point in samples for value in point]
+
+
+def test_stats_count_samples_and_points():
+    samples = [(x, 100) for x in range(0, 90, 3)] # Fewer than MAX_SKIPPED samples
+    simplifier, shape = simplify(samples, 1)
+    turned = simplifier.add(shape, 90, 200) # A turn keeps the old end as a point
+    stats = simplifier.stats()
+    assert turned
+    assert stats["samples_received"] == len(samples) + 1
+    assert stats["points_kept"] == shape.point_count() == 3
+    assert stats["strokes"] == 1
+    assert stats["kept_ratio"] == pytest.approx(3 / (len(samples) + 1))
+
+
+def test_straight_runs_need_one_step_and_sharp_turns_the_most():
+    assert turn_steps(0, 0, 100, 0, 200, 0) == 1
+    assert turn_steps(0, 0, 0, 0, 50, 50) == 1 # A repeated point has no turn
+    assert turn_steps(0, 0, 200, 0, 0, 1) == MAX_SPLINE_STEPS == 12
+    assert spline_steps([x for i in range(10) for x in (i * 20, i * 20)]) == 1
+    assert spline_steps([0, 0, 400, 0, 400, 400, 800, 400]) == 12
+    assert spline_steps([0, 0, 100, 0]) == 1 # No turns at all
@@ -0,0 +1,161 @@
+"""The spatial index and the eraser that cuts the part under the brush out of shapes."""
+import math
+import random
+
+import pytest
+
+from paint_document import KIND_LINE, KIND_OVAL, KIND_RECTANGLE, KIND_STROKE, Document, Shape, StrokeEngine
+from paint_simplify import StrokeSimplifier
+from paint_spatial import (Eraser, GridIndex, point_segment_distance2, segment_cuts, segment_distance2, segment_hits,
+                           split_stroke)
+
+
+def horizontal_stroke(y=100, count=11, width=2):
+    return Shape(KIND_STROKE, "black", width, [value for i in range(count) for value in (i * 10, y)])
+
+
+def test_split_stroke_cuts_out_the_erased_ranges():
+    shape = horizontal_stroke(count=6) # Five segments
+    assert split_stroke(shape, [None, None, (0.3, 0.6), None, None]) == [[0, 100, 10, 100, 20, 100, 23, 100],
+                                                                       [26, 100, 30, 100, 40, 100, 50, 100]]
+    assert split_stroke(shape, [(0, 1), None, None, None, (0.5, 1)]) == [[10, 100, 20, 100, 30, 100, 40, 100, 45, 100]]
+    assert split_stroke(shape, [(0, 1)] * 5) == []
+    assert split_stroke(shape, [None] * 5) == [list(shape.points)]
+    assert split_stroke(shape, [None, None, None, None, (0.02, 1)]) == [[0, 100, 10, 100, 20, 100, 30, 100, 40, 100]]
+
+
+def test_split_single_point_stroke():
+    dot = Shape(KIND_STROKE, "black", 3, [5, 5])
+    assert split_stroke(dot, [(0, 1)]) == []
+    assert split_stroke(dot, [None]) == [[5, 5]]
+
+
+def test_segment_hits_include_line_width():
+    shape = horizontal_stroke(width=10, count=2)
+    assert segment_hits(shape, 5, 107, 5, 120, 3) == [True]   # 7 px away: within 3 + 5
+    assert segment_hits(shape, 5, 109, 5, 120, 3) == [False]
+
+
+def test_cut_ranges_follow_the_brush():
+    shape = horizontal_stroke(count=2, width=2) # (0, 100) to (10, 100)
+    (t0, t1), = segment_cuts(shape, 5, 0, 5, 300, 2) # A vertical sweep, reaching 3 px either side
+    assert (t0, t1) == pytest.approx((0.2, 0.8))
+    (t0, t1), = segment_cuts(shape, 4, 100, 4, 100, 2) # A click: only the round brush
+    assert (t0, t1) == pytest.approx((0.1, 0.7))
+    (t0, t1), = segment_cuts(shape, -20, 90, 20, 110, 0) # A diagonal sweep crossing the stroke at x = 0
+    assert t0 == 0 and t1 == pytest.approx(math.hypot(2, 1) / 10, abs=0.05)
+
+
+def test_sweep_cuts_only_the_part_under_the_brush():
+    document = Document(index=GridIndex())
+    line = horizontal_stroke()
+    oval = Shape(KIND_OVAL, "red", 2, [200, 80, 240, 120])
+    document.commit([line])
+    document.commit([oval])
+    changes = Eraser(document).sweep(50, 0, 50, 300, 2) # A vertical cut through the middle of the stroke
+    assert [shape for shape, pieces in changes] == [line]
+    pieces = changes[0][1]
+    assert [list(piece.points) for piece in pieces] == [[0, 100, 10, 100, 20, 100, 30, 100, 40, 100, 47, 100],
+                                                        [53, 100, 60, 100, 70, 100, 80, 100, 90, 100, 100, 100]]
+    assert document.visible_shapes() == pieces + [oval]
+    (removed, arcs), = Eraser(document).sweep(238, 60, 238, 140, 2) # Shaves off the oval's right side
+    assert removed is oval
+    assert len(arcs) == 1 and arcs[0].kind == KIND_STROKE and arcs[0].color == "red"
+    xs = arcs[0].points[0::2]
+    assert min(xs) == 200 and 233 <= max(xs) <= 235 # Everything left of the brush's reach is kept
+    assert document.visible_shapes() == pieces + arcs
+
+
+def test_long_simplified_stroke_loses_only_the_brush_width():
+    document = Document(index=GridIndex())
+    engine = StrokeEngine(document, eraser=Eraser(document), simplifier=StrokeSimplifier())
+    engine.press("draw", 0, 300, "black", 4)
+    for x in range(3, 603, 3):
+        engine.drag(x, 300)
+    engine.release(600, 300)
+    (stroke,) = document.visible_shapes()
+    assert stroke.point_count() < 20 # Segments are far longer than the brush
+    engine.press("erase", 300, 300, "black", 5)
+    engine.erase_to(300, 300)
+    engine.release(300, 300)
+    left, right = document.visible_shapes()
+    assert left.points[-2:].tolist() == [293, 300] and right.points[:2].tolist() == [307, 300] # 5 + 4 / 2 either side
+    assert left.points[:2].tolist() == [0, 300] and right.points[-2:].tolist() == [600, 300]
+
+
+def test_lines_and_rectangles_are_cut_into_lines():
+    document = Document(index=GridIndex())
+    line = Shape(KIND_LINE, "blue", 2, [0, 0, 100, 0])
+    box = Shape(KIND_RECTANGLE, "green", 2, [200, 0, 300, 100])
+    document.commit([line, box])
+    eraser = Eraser(document)
+    (_, halves), = eraser.sweep(50, -20, 50, 20, 4)
+    assert [(piece.kind, list(piece.points)) for piece in halves] == [(KIND_LINE, [0, 0, 45, 0]),
+                                                                      (KIND_LINE, [55, 0, 100, 0])]
+    (_, edges), = eraser.sweep(250, -20, 250, 20, 4) # Through the middle of the top edge
+    assert all(piece.kind == KIND_LINE for piece in edges)
+    assert [list(piece.points) for piece in edges] == [[255, 0, 300, 0], [300, 0, 300, 100],
+                                                       [300, 100, 200, 100], [200, 100, 200, 0], [200, 0, 245, 0]]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_pieces_keep_everything_outside_the_brush(seed):
+    """Every stroke point clear of the brush survives, and no piece reaches into it by more than rounding."""
+    rng = random.Random(seed)
+    for _ in range(100):
+        x, y = rng.randint(0, 200), rng.randint(0, 200)
+        points = []
+        for _ in range(rng.randint(1, 15)):
+            x, y = x + rng.randint(-60, 60), y + rng.randint(-60, 60)
+            points += [x, y]
+        shape = Shape(KIND_STROKE, "black", rng.randint(1, 9), points)
+        sweep = (rng.randint(0, 200), rng.randint(0, 200), rng.randint(0, 200), rng.randint(0, 200), rng.randint(1, 20))
+        reach = sweep[4] + shape.width / 2
+        pieces = split_stroke(shape, segment_cuts(shape, *sweep))
+        kept = {(piece[i], piece[i + 1]) for piece in pieces for i in range(0, len(piece), 2)}
+        for i in range(0, len(points), 2):
+            if point_segment_distance2(points[i], points[i + 1], *sweep[:4]) > (reach + 1) ** 2:
+                assert (points[i], points[i + 1]) in kept
+        for piece in pieces:
+            for i in range(0, len(piece) - 2, 2):
+                assert segment_distance2(*piece[i:i + 4], *sweep[:4]) >= (reach - 1) ** 2
+
+
+def test_eraser_drag_is_one_undoable_step():
+    document = Document(index=GridIndex())
+    engine = StrokeEngine(document, eraser=Eraser(document))
+    line = horizontal_stroke()
+    document.commit([line])
+    engine.press("erase", 25, 0, "black", 2)
+    engine.erase_to(25, 300)
+    engine.erase_to(75, 300) # Cuts a piece made earlier in the same drag
+    engine.erase_to(75, 0)
+    step = engine.release(75, 0)
+    assert step.removed == [line] # The intermediate piece never reaches history
+    assert len(step.added) == 3
+    document.undo()
+    assert document.visible_shapes() == [line]
+    document.redo()
+    assert document.visible_shapes() == step.added
+
+
+def test_grid_query_matches_brute_force():
+    rng = random.Random(1)
+    index = GridIndex(cell_size=64)
+    shapes = []
+    for _ in range(300):
+        x, y = rng.randint(-500, 1500), rng.randint(-500, 1500)
+        shape = Shape(KIND_STROKE, "black", rng.randint(1, 9), [x, y, x + rng.randint(-200, 200), y + rng.randint(-200, 200)])
+        shapes.append(shape)
+        index.insert(shape)
+    for shape in shapes[::3]:
+        index.remove(shape)
+    remaining = set(shapes) - set(shapes[::3])
+    assert set(index) == remaining
+    for _ in range(100):
+        x1, y1 = rng.randint(-600, 1500), rng.randint(-600, 1500)
+        x2, y2 = x1 + rng.randint(0, 400), y1 + rng.randint(0, 400)
+        expected = {shape for shape in remaining
+                    if not (shape.bounds()[2] < x1 or shape.bounds()[0] > x2
+                            or shape.bounds()[3] < y1 or shape.bounds()[1] > y2)}
+        assert set(index.query(x1, y1, x2, y2)) == expected
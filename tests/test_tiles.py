@@ -0,0 +1,165 @@
+"""The tiled backend: cached tiles must always match a fresh render, and only visible tiles stay on the canvas."""
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from conftest import drag
+import SimplePaintAppFornewComerstopyhtoncanvas as paint_app
+import paint_raster
+import paint_tiles
+from paint_document import KIND_RECTANGLE, KIND_STROKE, Document, Shape
+from paint_spatial import GridIndex
+
+TILE_BYTES = paint_tiles.DEFAULT_TILE_SIZE ** 2 * 4 * 2 # What TileCache charges for one tile
+
+
+def fresh_render(tile, shapes):
+    """Renders the tile's square of the drawing from scratch into a new RasterCanvas."""
+    raster = paint_raster.RasterCanvas(tile.raster.width, tile.raster.height)
+    raster.zoom = tile.raster.zoom
+    raster.origin = tile.raster.origin
+    raster.render(shapes)
+    return raster.pixels
+
+
+def check_tiles(app):
+    """Every up-to-date cached tile matches a fresh render; exactly the visible tiles are on the canvas."""
+    shapes = app.document.visible_shapes()
+    for tile in app.tiles.tiles.values():
+        if not tile.dirty: # Dirty tiles are rendered again before they are shown
+            assert np.array_equal(tile.raster.pixels, fresh_render(tile, shapes)), tile.key
+    width, height = app.canvas.size
+    visible = app.tiles.visible_keys(app.zoom, app.view_x, app.view_y, app.view_x + width, app.view_y + height)
+    assert set(app.tile_items) == set(visible)
+    size = app.tiles.tile_size
+    for (zoom, column, row), item_id in app.tile_items.items():
+        assert zoom == app.zoom
+        assert app.canvas.coords(item_id) == [column * size, row * size]
+        tile = app.tiles.tiles[(zoom, column, row)]
+        assert not tile.dirty and not tile.stale # Shown tiles are rendered and copied to their images
+    assert set(app.canvas.items) >= set(app.tile_items.values())
+    assert len([item for item in app.canvas.items.values() if item["kind"] == "image"]) == len(visible)
+
+
+def tiled_app(make_app, **options):
+    if paint_app.optional_module("paint_tiles") is None:
+        pytest.skip("needs NumPy")
+    app = make_app(render_backend=paint_app.RENDER_BACKEND_TILED, simplify_tolerance=0, **options)
+    app.view_changed() # As the window's first <Configure> event would
+    return app
+
+
+def test_draw_erase_undo_and_redo_keep_tiles_current(make_app):
+    app = tiled_app(make_app)
+    check_tiles(app)
+    drag(app, [(100, 100), (300, 200), (600, 240)]) # Crosses tile edges
+    check_tiles(app)
+    drag(app, [(240, 240), (520, 400)], mode="rectangle")
+    drag(app, [(700, 100), (900, 500)], mode="circle")
+    check_tiles(app)
+    drag(app, [(256, 0), (256, 640)], mode="erase") # Along a tile edge
+    check_tiles(app)
+    app.undo_action()
+    check_tiles(app)
+    app.undo_action()
+    check_tiles(app)
+    app.redo_action()
+    check_tiles(app)
+    app.redo_action()
+    check_tiles(app)
+    assert app.tiles.hits > 0 # Edits redraw tiles in place instead of dropping them
+
+
+def test_zoom_renders_each_level_from_the_document(make_app):
+    app = tiled_app(make_app)
+    drag(app, [(50, 50), (400, 300), (950, 600)])
+    drag(app, [(500, 100), (700, 300)], mode="rectangle")
+    for steps in (1, 1, -3, -1, 2):
+        app.zoom_at(500, 300, steps)
+        check_tiles(app)
+    drag(app, [(100, 500), (400, 520)], mode="line") # Drawn at zoom 1.5 onto the cached tiles of every level
+    check_tiles(app)
+    app.zoom_at(0, 0, -2)
+    check_tiles(app)
+    assert {key[0] for key in app.tiles.tiles} >= {0.5, 1.0, 1.5}
+
+
+def test_trim_keeps_visible_tiles_and_renders_evicted_ones_again(make_app):
+    app = tiled_app(make_app, tile_cache_bytes=16 * TILE_BYTES)
+    drag(app, [(0, 0), (990, 640)])
+    for _ in range(4):
+        app.scroll_view(700, 0)
+        drag(app, [(0, 600), (990, 40)])
+        check_tiles(app)
+        assert len(app.tiles) <= 16
+    assert app.tiles.evictions > 0
+    renders = app.tiles.renders
+    app.scroll_view(-2800, 0) # Back to the start, whose tiles were dropped
+    check_tiles(app)
+    assert app.tiles.renders > renders
+
+
+def test_cache_smaller_than_the_window_still_shows_every_visible_tile(make_app):
+    app = tiled_app(make_app, tile_cache_bytes=2 * TILE_BYTES)
+    drag(app, [(10, 10), (980, 630)])
+    check_tiles(app)
+    app.scroll_view(300, 300)
+    check_tiles(app)
+    assert len(app.tiles) == len(app.tile_items) # Only the visible tiles are kept
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_sessions_keep_tiles_current(make_app, seed):
+    rng = random.Random(seed)
+    app = tiled_app(make_app, tile_cache_bytes=20 * TILE_BYTES)
+
+    def point():
+        return rng.randint(0, 999), rng.randint(0, 649)
+
+    for _ in range(40):
+        action = rng.random()
+        if action < 0.3:
+            app.brush_size = rng.randint(1, 15)
+            drag(app, [point() for _ in range(rng.randint(2, 8))])
+        elif action < 0.45:
+            drag(app, [point(), point()], mode=rng.choice(["rectangle", "circle", "line"]))
+        elif action < 0.55:
+            app.brush_size = rng.randint(5, 15)
+            drag(app, [point() for _ in range(rng.randint(2, 5))], mode="erase")
+        elif action < 0.65:
+            app.undo_action()
+        elif action < 0.72:
+            app.redo_action()
+        elif action < 0.87:
+            app.scroll_view(rng.randint(-600, 600), rng.randint(-400, 400))
+        else:
+            app.zoom_at(*point(), rng.choice([-1, 1]))
+        check_tiles(app)
+
+
+def test_tile_cache_on_its_own():
+    document = Document(index=GridIndex())
+    cache = paint_tiles.TileCache(document.shapes_in_box, tile_size=64, max_bytes=3 * 64 * 64 * 8)
+    stroke = Shape(KIND_STROKE, "black", 5, [10, 10, 120, 40, 60, 100])
+    document.commit([stroke])
+    assert cache.tile_box((2.0, 1, 3)) == (32, 96, 64, 128)
+    assert cache.visible_keys(1.0, 32, 0, 160, 64) == [(1.0, 0, 0), (1.0, 1, 0), (1.0, 2, 0)]
+    tiles = [cache.get(key) for key in cache.visible_keys(1.0, 0, 0, 128, 64)]
+    assert cache.renders == 2 and cache.get((1.0, 0, 0)) is tiles[0] and cache.hits == 1
+    box = Shape(KIND_RECTANGLE, "red", 3, [20, 20, 100, 50])
+    document.commit([box])
+    assert set(cache.draw(box)) == set(tiles)
+    for tile in tiles:
+        assert np.array_equal(tile.raster.pixels, fresh_render(tile, document.visible_shapes()))
+    document.undo()
+    cache.invalidate(box.bounds())
+    assert all(tile.dirty for tile in tiles)
+    cache.get((1.0, 1, 0))
+    assert np.array_equal(tiles[1].raster.pixels, fresh_render(tiles[1], document.visible_shapes()))
+    for key in [(1.0, 0, 1), (1.0, 1, 1)]:
+        cache.get(key)
+    assert [tile.key for tile in cache.trim(keep=[(1.0, 0, 0)])] == [(1.0, 1, 0)] # The least recently used one
+    assert len(cache) == 3 and cache.evictions == 1
+    assert cache.stats()["bytes"] <= cache.max_bytes